@@ -0,0 +1,177 @@
+"""
+ASGI config for ticketstore project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+ for serving the project with an ASGI server, e.g.:
+
+    uvicorn ticketstore.asgi:application
+
+The pinned Django and Django REST Framework versions have no async views or async
+ ORM, so the views still run synchronously.  The ASGI server's event loop holds
+ every open connection, and a request only takes a thread from a bounded pool
+ while Django is handling it, rather than for the whole life of the connection.
+"""
+
+#pylint: disable=C0103
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ticketstore.settings')
+
+
+class WSGIBridge(object):
+    """
+     ASGI application that runs a WSGI application in a thread pool.
+     Each request runs in one worker thread from start to finish, including
+      iterating a streaming response, so Django's per-thread database connections
+      are opened and closed by the thread that uses them.
+    """
+
+    def __init__(self, wsgi_application, max_workers=32):
+        """
+        :param wsgi_application: WSGI callable to run.
+        :param max_workers: Number of requests Django handles at the same time.
+        """
+
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def __call__(self, scope, receive, send):
+        """
+        ASGI 3 entry point.
+        :param scope: Connection scope.
+        :param receive: Awaitable returning the next message from the client.
+        :param send: Awaitable sending a message to the client.
+        :return: None
+        """
+
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type {}.'.format(scope['type']))
+
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            self.executor, self.handle, self.build_environ(scope, body), send, loop
+        )
+        return None
+
+    async def lifespan(self, receive, send):
+        """
+        Answers the server's startup and shutdown messages.
+        :param receive: Awaitable returning the next lifespan message.
+        :param send: Awaitable sending a lifespan message.
+        :return: None
+        """
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def handle(self, environ, send, loop):
+        """
+        Runs the WSGI application in a worker thread and sends its response.
+        :param environ: WSGI environ for the request.
+        :param send: ASGI send awaitable.
+        :param loop: Event loop the connection belongs to.
+        :return: None
+        """
+
+        def send_message(message):
+            """ Sends a message from the worker thread, waiting until it's sent. """
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            """ Records the status and headers until the first body chunk is sent. """
+            #pylint: disable=W0613
+            response_start['message'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers
+                ],
+            }
+
+        iterable = self.wsgi_application(environ, start_response)
+        try:
+            started = False
+            for chunk in iterable:
+                if not chunk:
+                    continue
+                if not started:
+                    send_message(response_start['message'])
+                    started = True
+                send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                send_message(response_start['message'])
+            send_message({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    @staticmethod
+    def build_environ(scope, body):
+        """
+        Translates an ASGI HTTP scope into a WSGI environ.
+        :param scope: ASGI HTTP connection scope.
+        :param body: File-like object holding the request body.
+        :return: WSGI environ dict.
+        """
+
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            value = value.decode('latin-1')
+            environ[name] = environ[name] + ',' + value if name in environ else value
+        return environ
+
+
+application = WSGIBridge(
+    get_wsgi_application(),
+    max_workers=getattr(settings, 'ASGI_THREADS', 32)
+)
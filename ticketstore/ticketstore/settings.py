@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 
 import os
 
+from ticketstore.databases import database_settings
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -42,7 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ticketstore.tickets.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'ticketstore.tickets.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,15 +75,131 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ticketstore.wsgi.application'
 
+# Number of requests the ASGI entry point (ticketstore.asgi) lets Django handle at
+#  once.  Open connections beyond that wait on the event loop without a thread.
+ASGI_THREADS = 32
+
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
+#
+# DATABASE_URL names the primary (SQLite by default) and DATABASE_REPLICA_URLS a
+#  comma-separated list of read replicas, e.g. the same SQLite file for local testing.
+# Connections are kept open for DATABASE_CONN_MAX_AGE seconds and reused by the
+#  thread that opened them, so a process holds at most one connection per thread
+#  per database: size the server's threads (or ASGI_THREADS) to the connection
+#  budget, and put PgBouncer in front of PostgreSQL for more processes than that.
+
+DATABASES = database_settings(
+    os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')),
+    os.environ.get('DATABASE_REPLICA_URLS', ''),
+    conn_max_age=int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+)
+
+# API reads go to a random replica, except for DATABASE_REPLICA_LAG seconds after a
+#  client writes something, when its reads stay on the primary.
+
+DATABASE_REPLICAS = [alias for alias in sorted(DATABASES) if alias != 'default']
+DATABASE_REPLICA_LAG = 5
+DATABASE_ROUTERS = ['ticketstore.tickets.routers.ReplicaRouter']
+
+# Run on every new SQLite connection.  Write-ahead logging lets reads carry on while
+#  a purchase commits and synchronous=NORMAL only syncs at checkpoints, which is
+#  still safe against corruption in WAL mode.  Set to {} for SQLite's defaults.
+
+TICKETS_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+# Send purchases through a single writer thread that commits concurrent purchases
+#  together (see ticketstore.tickets.writes).  Only worth it with one writer at a time.
+
+TICKETS_COALESCE_PURCHASES = DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3'
+
+
+# Primary keys for new rows are time-ordered version 7 UUIDs, which keep inserts
+#  at the end of the primary key indexes.  Set to 4 for random UUIDs.
+
+TICKETS_UUID_VERSION = 7
+
+
+# Response cache for the read endpoints of the tickets app.  To share it between
+#  processes, use 'ticketstore.tickets.cache.DjangoCacheBackend' with
+#  OPTIONS {'alias': ...} naming a Redis cache in CACHES.
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+TICKETS_RESPONSE_CACHE = {
+    'BACKEND': 'ticketstore.tickets.cache.LocMemLRUBackend',
+    'OPTIONS': {'max_entries': 10000},
+    'TTL': 300,
+}
+
+
+# Serialize list and export responses of the endpoints that support it from
+#  .values() rows instead of model instances.  The output is the same either way.
+
+TICKETS_FAST_SERIALIZATION = True
+
+# Most children embedded per object for reverse relations, e.g. the tickets of each
+#  event with ?embed_fields=tickets.  The nested routes page through the rest.
+
+TICKETS_REVERSE_EMBED_LIMIT = 20
+
+# Most matches of a name search ranked and returned on SQLite.  Queries matching more
+#  than this, e.g. two letter prefixes, are ranked among the first matches only.
+
+TICKETS_SEARCH_RANK_LIMIT = 5000
+
+# Change feed at /api/changes.  Long-polling requests wait up to MAX_WAIT seconds,
+#  each holding a server thread (one of ASGI_THREADS under ASGI), and look for
+#  changes committed by other processes every POLL_INTERVAL seconds.
+
+TICKETS_CHANGES = {
+    'MAX_WAIT': 30,
+    'POLL_INTERVAL': 1.0,
+}
+
+
+# Request metrics, served at /metrics in the Prometheus text format to ALLOWED_IPS.
+#  Set SLOW_REQUEST_SECONDS to log the SQL of slower requests, for SLOW_SAMPLE_RATE
+#  of them, to the ticketstore.tickets.requests logger.
+
+TICKETS_METRICS = {
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'SLOW_REQUEST_SECONDS': None,
+    'SLOW_SAMPLE_RATE': 1.0,
+}
+
+
+# Logging
+# https://docs.djangoproject.com/en/2.1/topics/logging/
+#
+# Every API request is logged as a JSON line at INFO, and sampled slow requests at
+#  WARNING.  TICKETS_REQUEST_LOG_LEVEL=INFO logs every request.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'ticketstore.tickets.requests': {
+            'handlers': ['requests'],
+            'level': os.environ.get('TICKETS_REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
 }
 
 
@@ -121,4 +241,18 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+
+# Django REST Framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_FILTER_BACKENDS': ['ticketstore.tickets.filters.QueryParamFilterBackend'],
+    'DEFAULT_PAGINATION_CLASS': 'ticketstore.tickets.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 100,
+    'DEFAULT_RENDERER_CLASSES': [
+        'ticketstore.tickets.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 ALLOWED_HOSTS = ['*']
@@ -0,0 +1 @@
+default_app_config = 'ticketstore.tickets.apps.TicketsConfig'
@@ -1,11 +1,42 @@
 """
- Standard Django app config file.  We don't really need anything here.
+ Standard Django app config file.  Hooks up the response cache's signal receivers,
+  the SQLite connection tuning and the upkeep of the name search indexes.
 """
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
 
 
 class TicketsConfig(AppConfig):
     """
-     Autogenerated by Django
+     App config for the tickets app
     """
-    name = 'tickets'
+    name = 'ticketstore.tickets'
+    label = 'tickets'
+
+    def ready(self):
+        """
+        Imports the response cache and the SQLite tuning so their receivers are
+         connected for every process, including management commands.
+        :return: None
+        """
+        #pylint: disable=W0611
+        from . import cache, pragmas
+        post_migrate.connect(ensure_search_indexes, sender=self)
+
+
+def ensure_search_indexes(sender, using, **kwargs):
+    """
+    Signal receiver putting back any missing part of the name search indexes after a
+     migrate, e.g. the SQLite triggers dropped when a migration rebuilt a table.
+     Skipped while the migration creating the indexes isn't applied.
+    """
+
+    #pylint: disable=W0613
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import ensure_search_index
+    connection = connections[using]
+    if ('tickets', '0010_name_search') not in MigrationRecorder(connection).applied_migrations():
+        return
+    for model_name in ('Client', 'Event', 'Customer'):
+        ensure_search_index(connection, sender.get_model(model_name))
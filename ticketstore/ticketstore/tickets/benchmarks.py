@@ -0,0 +1,197 @@
+"""
+ Helpers shared by the benchmark management commands.
+ Seeds synthetic clients, events, customers and tickets under dedicated names so
+  they can be cleaned up afterwards, and times callables.
+"""
+
+#pylint: disable=E1101
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.db import OperationalError, connection
+from .cache import response_cache
+from .models import Client, Event, Customer, Ticket, SoldOutError
+
+
+BENCHMARK_CLIENT_NAME = 'Benchmark client'
+STRESS_CLIENT_NAME = 'Purchase stress test'
+STRESS_CUSTOMER_PREFIX = 'Stress buyer '
+BENCHMARK_CUSTOMER_PREFIX = 'Benchmark customer '
+PRICES = [Decimal('19.99'), Decimal('49.50'), Decimal('120.00'), Decimal('250.00')]
+
+
+def seed(tickets, events=100, customers=1000, clients=1, batch_size=5000, progress=None,
+         customer_names=None):
+    """
+    Seeds a synthetic data set with bulk inserts.
+    Tickets are spread round-robin over the events and customers, and each event's
+     tickets_sold counter and capacity are set to the number of tickets it gets.
+    :param tickets: Number of tickets to create.
+    :param events: Number of events to spread them over.
+    :param customers: Number of customers to spread them over.
+    :param clients: Number of clients to spread the events over.
+    :param batch_size: Number of tickets built and inserted at a time.
+    :param progress: Optional callable taking the number of tickets created so far.
+    :param customer_names: Optional callable taking a customer's number and returning
+     the rest of its name, after the benchmark prefix.
+    :return: Tuple of the first benchmark client, event IDs and customer IDs.
+    """
+
+    per_event = -(-tickets // events)
+    if per_event > 32767:
+        raise ValueError('Too many tickets per event, use at least {} events.'.format(
+            -(-tickets // 32767)))
+    client_objects = [Client(name=BENCHMARK_CLIENT_NAME) for _ in range(clients)]
+    Client.objects.bulk_create(client_objects)
+    event_objects = [
+        Event(
+            name='Benchmark event {:06d}'.format(number),
+            client_id=client_objects[number % clients].id,
+            venue_capacity=per_event,
+            tickets_sold=tickets // events + (1 if number < tickets % events else 0),
+        ) for number in range(events)
+    ]
+    Event.objects.bulk_create(event_objects)
+    customer_names = customer_names or '{:08d}'.format
+    customer_objects = [
+        Customer(name=BENCHMARK_CUSTOMER_PREFIX + customer_names(number))
+        for number in range(customers)
+    ]
+    Customer.objects.bulk_create(customer_objects)
+    event_ids = [event.id for event in event_objects]
+    customer_ids = [customer.id for customer in customer_objects]
+
+    for start in range(0, tickets, batch_size):
+        Ticket.objects.bulk_create([
+            Ticket(
+                event_id=event_ids[number % events],
+                customer_id=customer_ids[number % customers],
+                price=PRICES[number % len(PRICES)],
+            ) for number in range(start, min(start + batch_size, tickets))
+        ])
+        if progress:
+            progress(min(start + batch_size, tickets))
+    return client_objects[0], event_ids, customer_ids
+
+
+def clear():
+    """
+    Deletes everything created by seed.
+    The seeded rows were bulk inserted without going through the seat counters,
+     sales rollups or outbox, so they're deleted without their bookkeeping too.
+    :return: None
+    """
+
+    Ticket.objects.filter(event__client__name=BENCHMARK_CLIENT_NAME).delete_untracked()
+    Ticket.objects.filter(customer__name__prefix=BENCHMARK_CUSTOMER_PREFIX).delete_untracked()
+    Event.objects.filter(client__name=BENCHMARK_CLIENT_NAME).delete_untracked()
+    Client.objects.filter(name=BENCHMARK_CLIENT_NAME).delete_untracked()
+    Customer.objects.filter(name__prefix=BENCHMARK_CUSTOMER_PREFIX).delete_untracked()
+    for model in (Client, Event, Customer, Ticket):
+        response_cache.invalidate(model)
+
+
+def stress_purchases(workers, capacity, purchase=None):
+    """
+    Buys out a new event with parallel workers, each buying one ticket at a time
+     until the event is sold out.
+    :param workers: Number of concurrent buyers.
+    :param capacity: Venue capacity of the event.
+    :param purchase: Callable taking the same arguments as TicketManager.purchase,
+     defaulting to it.
+    :return: Dict with the event, the number of tickets purchased, the number of
+     lock errors retried and the elapsed seconds.
+    """
+
+    purchase = purchase or Ticket.objects.purchase
+    client = Client.objects.create(name=STRESS_CLIENT_NAME)
+    event = Event.objects.create(
+        name=STRESS_CLIENT_NAME, venue_capacity=capacity, client_id=client.id)
+    customers = Customer.objects.bulk_create([
+        Customer(name='{}{}'.format(STRESS_CUSTOMER_PREFIX, number)) for number in range(workers)
+    ])
+
+    def buy_until_sold_out(customer):
+        """
+        Buys tickets until the event is sold out, on a worker thread.
+        :return: Tuple of the number of tickets bought and lock errors retried.
+        """
+        bought = 0
+        retried = 0
+        try:
+            while True:
+                try:
+                    purchase(event.id, customer.id, price=50)
+                except SoldOutError:
+                    return bought, retried
+                except OperationalError:
+                    retried += 1
+                    continue
+                bought += 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(buy_until_sold_out, customers))
+    return {
+        'event': event,
+        'purchased': sum(bought for bought, _ in results),
+        'retries': sum(retried for _, retried in results),
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+def clear_stress():
+    """
+    Deletes everything created by stress_purchases.
+    :return: None
+    """
+
+    Client.objects.filter(name=STRESS_CLIENT_NAME).delete()
+    Customer.objects.filter(name__prefix=STRESS_CUSTOMER_PREFIX).delete()
+
+
+def median_ms(function, repeat=10):
+    """
+    Times a callable.
+    :param function: Callable to time.
+    :param repeat: Number of runs.
+    :return: Median run time in milliseconds.
+    """
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def index_sizes(model):
+    """
+    Measures the on-disk size of each index on a model's table.
+    Supported on SQLite (through the dbstat table) and PostgreSQL.
+    :param model: Model whose indexes to measure.
+    :return: Dict of size in bytes by index name, empty for other backends.
+    """
+
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT dbstat.name, SUM(dbstat.pgsize) FROM dbstat "
+                "JOIN sqlite_master ON sqlite_master.name = dbstat.name "
+                "WHERE sqlite_master.type = 'index' AND sqlite_master.tbl_name = %s "
+                "GROUP BY dbstat.name", [table]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes "
+                "WHERE relname = %s", [table]
+            )
+        else:
+            return {}
+        return dict(cursor.fetchall())
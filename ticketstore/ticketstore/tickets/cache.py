@@ -0,0 +1,332 @@
+"""
+ Response cache for the ticket app's read endpoints.
+ Cached responses are keyed on the request URL (including the field selection
+  params) and on a generation token for every model the response depends on.
+  Saving or deleting an object replaces the generation tokens for the object and
+  its model, so every cached response that could include it stops matching.
+ A miss right after an invalidation may be filled from a replica that hasn't
+  replayed the change yet, so for DATABASE_REPLICA_LAG seconds after a token is
+  replaced, responses depending on it are only cached for that long.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils.module_loading import import_string
+from .metrics import Counter, registry
+from .models import Client, Event, Customer, Ticket, objects_deleted, seats_changed
+
+
+class LocMemLRUBackend(object):
+    """
+     In-process cache backend with least-recently-used eviction and per-entry TTLs.
+    """
+
+    def __init__(self, max_entries=10000):
+        """
+        Initializes an empty cache.
+        :param max_entries: Number of entries to keep before evicting the oldest.
+        """
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        Looks up several keys, refreshing their recency.
+        :param keys: Keys to look up.
+        :return: Dict of the values found, by key.
+        """
+
+        now = time.monotonic()
+        found = {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires is not None and expires <= now:
+                    del self.entries[key]
+                    continue
+                self.entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value, evicting the least recently used entries if the cache is full.
+        :param key: Key to store the value under.
+        :param value: Value to store.
+        :param ttl: Seconds until the entry expires, or None to keep it until evicted.
+        :return: None
+        """
+
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every entry.
+        :return: None
+        """
+
+        with self.lock:
+            self.entries.clear()
+
+
+class DjangoCacheBackend(object):
+    """
+     Cache backend that stores entries in one of the caches in Django's CACHES
+      setting, e.g. a Redis cache shared by every process.
+    """
+
+    def __init__(self, alias='default'):
+        """
+        :param alias: Name of the cache in the CACHES setting.
+        """
+
+        self.cache = caches[alias]
+
+    def get_many(self, keys):
+        """
+        :param keys: Keys to look up.
+        :return: Dict of the values found, by key.
+        """
+
+        return self.cache.get_many(keys)
+
+    def set(self, key, value, ttl=None):
+        """
+        :param key: Key to store the value under.
+        :param value: Value to store.
+        :param ttl: Seconds until the entry expires, or None to never expire.
+        :return: None
+        """
+
+        self.cache.set(key, value, timeout=ttl)
+
+    def clear(self):
+        """
+        Removes every entry from the underlying cache.
+        :return: None
+        """
+
+        self.cache.clear()
+
+
+class ResponseCache(object):
+    """
+     Stores serialized response data, invalidated through generation tokens.
+     Tags name what a response depends on: 'event:*' for any event, 'event:<id>'
+      for one event.
+    """
+
+    def __init__(self, backend, ttl=300, replica_lag=0):
+        """
+        :param backend: Cache backend to store entries and generation tokens in.
+        :param ttl: Seconds a cached response is kept for.
+        :param replica_lag: Seconds the read replicas may lag behind, 0 without replicas.
+        """
+
+        self.backend = backend
+        self.ttl = ttl
+        self.replica_lag = replica_lag
+        self.hits = Counter(
+            'tickets_response_cache_hits_total', 'Responses served from the cache.')
+        self.misses = Counter(
+            'tickets_response_cache_misses_total', 'Cacheable responses not cached.')
+
+    def generations(self, tags):
+        """
+        Looks up the generation tokens of the given tags.
+        Tags without a token (never invalidated, or evicted) get a new one, so an
+         evicted token can never bring back an old entry.
+        :param tags: Tags to look up.
+        :return: List of generation tokens in the same order as the tags.
+        """
+
+        keys = ['generation:' + tag for tag in tags]
+        found = self.backend.get_many(keys)
+        for key in keys:
+            if key not in found:
+                found[key] = new_generation()
+                self.backend.set(key, found[key])
+        return [found[key] for key in keys]
+
+    def key(self, url, tags):
+        """
+        Builds the cache key for a response, and works out how long to keep it.
+        :param url: Absolute URL of the request, with its query params.
+        :param tags: Tags the response depends on.
+        :return: Tuple of the cache key and the TTL to pass to set().
+        """
+
+        generations = self.generations(tags)
+        raw = '|'.join([url] + generations)
+        key = 'response:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        if self.replica_lag:
+            replaced = max(generation_time(generation) for generation in generations)
+            if time.time() - replaced < self.replica_lag:
+                return key, min(self.ttl, self.replica_lag)
+        return key, self.ttl
+
+    def get(self, key):
+        """
+        Looks up a cached response and counts the hit or miss.
+        :param key: Cache key from key().
+        :return: Cached response data, or None.
+        """
+
+        data = self.backend.get_many([key]).get(key)
+        if data is None:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return data
+
+    def set(self, key, data, ttl):
+        """
+        Caches response data.
+        :param key: Cache key from key().
+        :param data: Serialized response data.
+        :param ttl: TTL from key().
+        :return: None
+        """
+
+        self.backend.set(key, data, ttl)
+
+    def invalidate(self, model, *pks):
+        """
+        Replaces the generation tokens for a model, and for the given objects.
+        Runs again once the surrounding transaction commits, so a response cached
+         from the old data while the transaction was open doesn't survive it.
+        :param model: Model class that changed.
+        :param pks: Primary keys of the objects that changed, if known.
+        :return: None
+        """
+
+        tags = [model_tag(model)] + [model_tag(model, pk) for pk in pks]
+
+        def bump():
+            """ Replaces the generation tokens. """
+            for tag in tags:
+                self.backend.set('generation:' + tag, new_generation())
+
+        bump()
+        transaction.on_commit(bump)
+
+    def clear(self):
+        """
+        Removes every cached response and resets the counters.
+        :return: None
+        """
+
+        self.backend.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+
+def new_generation():
+    """
+    Makes a generation token, recording when it was made.
+    :return: Generation token.
+    """
+
+    return '{}:{:.3f}'.format(uuid.uuid4().hex, time.time())
+
+
+def generation_time(generation):
+    """
+    Reads when a generation token was made.
+    :param generation: Generation token from new_generation().
+    :return: Unix time, or 0 for tokens that don't record it.
+    """
+
+    try:
+        return float(generation.partition(':')[2])
+    except ValueError:
+        return 0
+
+
+def model_tag(model, pk='*'):
+    """
+    Builds the tag for a model, or for one of its objects.
+    :param model: Model class.
+    :param pk: Primary key of the object, or '*' for the whole model.
+    :return: Tag string.
+    """
+
+    return '{}:{}'.format(model._meta.label_lower, pk)
+
+
+def build_response_cache():
+    """
+    Builds the response cache from the TICKETS_RESPONSE_CACHE setting.
+    :return: ResponseCache
+    """
+
+    config = getattr(settings, 'TICKETS_RESPONSE_CACHE', {})
+    backend_class = import_string(
+        config.get('BACKEND', 'ticketstore.tickets.cache.LocMemLRUBackend')
+    )
+    replica_lag = 0
+    if getattr(settings, 'DATABASE_REPLICAS', []):
+        replica_lag = getattr(settings, 'DATABASE_REPLICA_LAG', 5)
+    return ResponseCache(
+        backend_class(**config.get('OPTIONS', {})),
+        ttl=config.get('TTL', 300),
+        replica_lag=replica_lag
+    )
+
+
+response_cache = build_response_cache()
+registry.register('cache_hits', response_cache.hits)
+registry.register('cache_misses', response_cache.misses)
+
+
+def invalidate_instance(sender, instance, **kwargs):
+    """
+    Signal receiver invalidating cached responses that include a saved object.
+    """
+
+    #pylint: disable=W0613
+    response_cache.invalidate(sender, instance.pk)
+
+
+def invalidate_deleted(sender, pks, **kwargs):
+    """
+    Signal receiver invalidating cached responses that include deleted objects.
+    """
+
+    #pylint: disable=W0613
+    response_cache.invalidate(sender, *pks)
+
+
+def invalidate_events(sender, event_ids, **kwargs):
+    """
+    Signal receiver for seat reservations, which change the events' tickets_sold
+     counters and add or remove tickets without sending save or delete signals.
+    """
+
+    #pylint: disable=W0613
+    for event_id in event_ids:
+        response_cache.invalidate(Event, event_id)
+    response_cache.invalidate(Ticket)
+
+
+for cached_model in (Client, Event, Customer, Ticket):
+    post_save.connect(invalidate_instance, sender=cached_model)
+    objects_deleted.connect(invalidate_deleted, sender=cached_model)
+seats_changed.connect(invalidate_events, sender=Event)
@@ -0,0 +1,222 @@
+"""
+ Change feed over the outbox of creates, updates and deletes, served at /api/changes.
+ A consumer keeps the cursor of the last batch it read and asks for the changes
+  since it, so keeping a copy in sync costs work in proportion to what changed, not
+  to the size of the tables.  Each batch is read with index seeks on the outbox.
+ Every change comes with the object's current data, or null once it's deleted, so
+  a batch only keeps the last change of each object.
+ On SQLite there's one writer at a time, so changes are read in commit order.  On
+  PostgreSQL they're read in transaction ID order, leaving out transactions newer
+  than the oldest one still open, so a transaction that commits late can't land
+  behind a cursor that has already moved past it.
+"""
+
+import threading
+import time
+from base64 import b64decode, b64encode
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.db import connections
+from rest_framework.fields import DateTimeField
+from .models import Client, Event, Customer, Ticket, Change, changes_committed
+from .serializers import ClientSerializer, EventSerializer, CustomerSerializer, TicketSerializer
+
+
+Cursor = namedtuple('Cursor', ['txid', 'pk'])
+START = Cursor(0, 0)
+
+# Model and serializer of each resource in the feed.
+FEED_RESOURCES = OrderedDict([
+    ('client', (Client, ClientSerializer)),
+    ('event', (Event, EventSerializer)),
+    ('customer', (Customer, CustomerSerializer)),
+    ('ticket', (Ticket, TicketSerializer)),
+])
+
+
+def encode_cursor(cursor):
+    """
+    Encodes a feed position as an opaque cursor.
+    :param cursor: Cursor of the last change read.
+    :return: Cursor string.
+    """
+
+    return b64encode('{}|{}'.format(cursor.txid, cursor.pk).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(value):
+    """
+    Decodes a cursor from encode_cursor.
+    :param value: Cursor string.
+    :return: Cursor.
+    :raises ValueError: If the cursor is malformed.
+    """
+
+    try:
+        txid, pk = b64decode(value.encode('ascii'), validate=True).decode('ascii').split('|')
+        cursor = Cursor(int(txid), int(pk))
+    except (TypeError, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor.')
+    if cursor.txid < 0 or cursor.pk < 0:
+        raise ValueError('Invalid cursor.')
+    return cursor
+
+
+def visible_changes(using):
+    """
+    Builds the queryset of the changes a consumer can safely read, in feed order.
+    :param using: Database alias to read from.
+    :return: Ordered QuerySet of changes.
+    """
+
+    queryset = Change.objects.using(using).order_by('txid', 'id')
+    if connections[using].vendor == 'postgresql':
+        queryset = queryset.extra(where=['txid < txid_snapshot_xmin(txid_current_snapshot())'])
+    return queryset
+
+
+def latest_cursor(using):
+    """
+    Looks up the cursor of the last visible change, for consumers that start from
+     a full export and only want what changes after it.
+    :param using: Database alias to read from.
+    :return: Cursor.
+    """
+
+    row = visible_changes(using).order_by('-txid', '-id').values_list('txid', 'id').first()
+    return Cursor(*row) if row else START
+
+
+def read_changes(cursor, limit, using):
+    """
+    Reads the next batch of changes after a cursor, with the current data of the
+     objects they're about.  An object changed more than once in the batch comes
+     once, where it first changed, so a parent still comes before the children
+     created after it, with the action and time of its last change.
+    :param cursor: Cursor of the last change already read.
+    :param limit: Most changes to read.
+    :param using: Database alias to read from.
+    :return: Tuple of the list of changes, the cursor after them and whether there
+     are more to read.
+    """
+
+    # Read as two index seeks, the rest of the cursor's transaction and then later
+    #  ones, since SQLite can't seek to a (txid, id) row value.
+    fields = ('id', 'txid', 'resource', 'object_id', 'action', 'created_at')
+    rows = list(visible_changes(using).filter(
+        txid=cursor.txid, id__gt=cursor.pk
+    ).values(*fields)[:limit + 1])
+    if len(rows) <= limit:
+        rows.extend(visible_changes(using).filter(
+            txid__gt=cursor.txid
+        ).values(*fields)[:limit + 1 - len(rows)])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], cursor, False
+
+    latest = OrderedDict()
+    for row in rows:
+        # Replacing an entry keeps its place in the OrderedDict.
+        latest[(row['resource'], row['object_id'])] = row
+    data = load_data(latest.values(), using)
+    timestamp = DateTimeField()
+    changes = [
+        OrderedDict([
+            ('resource', row['resource']),
+            ('id', str(row['object_id'])),
+            ('action', row['action']),
+            ('changed_at', timestamp.to_representation(row['created_at'])),
+            ('data', data.get((row['resource'], row['object_id']))),
+        ])
+        for row in latest.values()
+    ]
+    return changes, Cursor(rows[-1]['txid'], rows[-1]['id']), more
+
+
+def load_data(rows, using):
+    """
+    Loads and serializes the current state of the objects a batch of changes is
+     about, with one query per resource.
+    :param rows: Change rows.
+    :param using: Database alias to read from.
+    :return: Dict of serialized objects by (resource, object ID), leaving out
+     deleted objects.
+    """
+
+    ids = OrderedDict((resource, set()) for resource in FEED_RESOURCES)
+    for row in rows:
+        if row['action'] != Change.DELETE and row['resource'] in ids:
+            ids[row['resource']].add(row['object_id'])
+    data = {}
+    for resource, pks in ids.items():
+        if not pks:
+            continue
+        model, serializer_class = FEED_RESOURCES[resource]
+        objects = list(model._default_manager.using(using).filter(pk__in=pks))
+        for obj, item in zip(objects, serializer_class(objects, many=True).data):
+            data[(resource, obj.pk)] = item
+    return data
+
+
+class ChangeNotifier(object):
+    """
+     Wakes up long-polling feed requests when a transaction in this process commits
+      changes.  Requests also poll the database, for changes made by other processes.
+    """
+
+    def __init__(self):
+        """
+        Initializes the notifier.
+        """
+
+        self.condition = threading.Condition()
+        self.generation = 0
+
+    def notify(self, **kwargs):
+        """
+        Signal receiver for changes_committed, waking every waiting request.
+        :return: None
+        """
+
+        #pylint: disable=W0613
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout):
+        """
+        Waits until changes are committed after the given generation was read.
+        :param generation: Value of generation read before looking for changes.
+        :param timeout: Most seconds to wait.
+        :return: True if changes were committed.
+        """
+
+        with self.condition:
+            return self.condition.wait_for(lambda: self.generation != generation, timeout)
+
+
+notifier = ChangeNotifier()
+changes_committed.connect(notifier.notify, sender=Change)
+
+
+def wait_for_changes(cursor, limit, wait, using):
+    """
+    Reads the next batch of changes after a cursor, waiting up to wait seconds for
+     one if there's nothing to read yet.
+    :param cursor: Cursor of the last change already read.
+    :param limit: Most changes to read.
+    :param wait: Most seconds to wait.
+    :param using: Database alias to read from.
+    :return: Same tuple as read_changes.
+    """
+
+    poll_interval = getattr(settings, 'TICKETS_CHANGES', {}).get('POLL_INTERVAL', 1.0)
+    deadline = time.monotonic() + wait
+    while True:
+        generation = notifier.generation
+        changes, next_cursor, more = read_changes(cursor, limit, using)
+        remaining = deadline - time.monotonic()
+        if changes or remaining <= 0:
+            return changes, next_cursor, more
+        notifier.wait(generation, min(remaining, poll_interval))
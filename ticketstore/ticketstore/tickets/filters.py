@@ -0,0 +1,41 @@
+"""
+ Filter backends for the ticket app's viewsets.
+"""
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """
+     Filters a viewset's queryset with the query params it declares.
+     Viewsets map each param to an ORM lookup in query_filters, e.g.
+      query_filters = {'event': 'event', 'name_prefix': 'name__prefix'}, and only
+      declare params that an index can serve.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Applies every declared filter present on the request.
+        Values are converted up front, so a malformed one is a validation error
+         rather than a failure when the query runs.
+        :param request: Request object from django rest framework.
+        :param queryset: QuerySet to filter.
+        :param view: View being filtered.
+        :return: Filtered QuerySet.
+        """
+
+        for param, lookup in getattr(view, 'query_filters', {}).items():
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            field = queryset.model._meta.get_field(lookup.split('__')[0])
+            if field.is_relation:
+                field = field.target_field
+            try:
+                value = field.to_python(value)
+            except DjangoValidationError:
+                raise ValidationError({param: ['Invalid value "{}".'.format(value)]})
+            queryset = queryset.filter(**{lookup: value})
+        return queryset
@@ -0,0 +1,303 @@
+"""
+ Streaming bulk import of clients, events, customers and tickets.
+ Reads CSV or newline-delimited JSON a chunk at a time and validates every row with
+  the rules of the model's API serializer, using one serializer for the whole run.
+ Foreign keys are checked with one query per referenced model and chunk, and each
+  chunk is loaded with bulk inserts, or COPY on PostgreSQL, in a single transaction
+  with the ImportCheckpoint that lets a failed run resume after it.
+"""
+
+import csv
+import json
+from collections import OrderedDict, namedtuple
+from io import StringIO
+from django.db import connections, router, transaction
+from rest_framework import serializers
+from rest_framework.fields import empty
+from .cache import response_cache
+from .models import Client, Event, Customer, Ticket, Change, ImportCheckpoint
+from .serializers import ClientSerializer, EventSerializer, CustomerSerializer
+from .serializers import TicketIssueSerializer
+
+
+ImportSpec = namedtuple('ImportSpec', ['model', 'serializer_class', 'references'])
+ChunkResult = namedtuple('ChunkResult', ['loaded', 'existing', 'rejected'])
+
+# Serializer whose rules each model's rows are validated with, and the foreign keys
+#  they reference by ID.
+IMPORT_SPECS = OrderedDict([
+    ('client', ImportSpec(Client, ClientSerializer, ())),
+    ('event', ImportSpec(Event, EventSerializer, ('client',))),
+    ('customer', ImportSpec(Customer, CustomerSerializer, ())),
+    ('ticket', ImportSpec(Ticket, TicketIssueSerializer, ('event', 'customer'))),
+])
+FORMATS = ('csv', 'ndjson')
+
+
+def read_rows(stream, input_format):
+    """
+    Reads rows from CSV or NDJSON input one at a time.
+    Empty CSV cells are left out of their row so the serializer's defaults apply, and
+     NDJSON lines that don't parse are passed on as None to be rejected.
+    :param stream: Text stream to read.
+    :param input_format: 'csv' or 'ndjson'.
+    :return: Generator of rows.
+    """
+
+    if input_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if key and value not in ('', None)}
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def db_values(model, objects, connection):
+    """
+    Prepares the column values of new model instances for the database, filling in
+     defaults like auto_now_add the way an INSERT through the ORM does.
+    :param model: Model of the instances.
+    :param objects: Unsaved model instances.
+    :param connection: Database connection.
+    :return: Generator of lists of column values.
+    """
+
+    fields = model._meta.concrete_fields
+    for obj in objects:
+        yield [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+
+
+def copy_value(value):
+    """
+    Formats a value for the text format of COPY.
+    :param value: Database value.
+    :return: String, with backslashes, tabs and line breaks escaped.
+    """
+
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n').replace('\r', '\\r')
+
+
+def insert_rows(model, objects, connection):
+    """
+    Inserts new model instances with one prepared statement: a COPY on PostgreSQL,
+     and an INSERT run with executemany elsewhere.  Either way the SQL isn't built
+     and parsed again for every batch, as it is with bulk_create.
+    :param model: Model of the instances.
+    :param objects: Unsaved model instances.
+    :param connection: Database connection.
+    :return: None
+    """
+
+    if not objects:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in model._meta.concrete_fields)
+    rows = db_values(model, objects, connection)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = StringIO()
+            for row in rows:
+                buffer.write('\t'.join(copy_value(value) for value in row) + '\n')
+            buffer.seek(0)
+            cursor.copy_expert('COPY {} ({}) FROM STDIN'.format(table, columns), buffer)
+        else:
+            cursor.executemany('INSERT INTO {} ({}) VALUES ({})'.format(
+                table, columns, ', '.join(['%s'] * len(model._meta.concrete_fields))
+            ), list(rows))
+
+
+class Importer(object):
+    """
+     Loads the rows of one model a chunk at a time.
+     Rows that fail validation, reference a missing object or don't fit in their
+      event are rejected and reported, and rows with an ID that's already there are
+      skipped, so importing the same input twice doesn't duplicate anything.
+    """
+
+    lookup_batch_size = 500
+    known_keys_limit = 100000
+
+    def __init__(self, spec):
+        """
+        Sets up the serializer and foreign key lookups for a model.
+        :param spec: ImportSpec of the model.
+        """
+
+        self.model = spec.model
+        self.serializer = spec.serializer_class()
+        self.id_field = serializers.UUIDField()
+        self.references = OrderedDict(
+            (name, self.model._meta.get_field(name)) for name in spec.references
+        )
+        # Keys of referenced objects already seen to exist, so a chunk only looks up
+        #  the events and customers that earlier chunks didn't reference.
+        self.known_keys = {name: set() for name in spec.references}
+        self.connection = connections[router.db_for_write(self.model)]
+
+    def validate(self, row):
+        """
+        Validates a row with the serializer's rules, and its ID and foreign keys.
+        :param row: Dict read from the input.
+        :return: Tuple of a dict of field values and a dict of errors by field.
+        """
+
+        if not isinstance(row, dict):
+            return {}, {'non_field_errors': ['Expected an object.']}
+        values = {}
+        errors = {}
+        try:
+            values.update(self.serializer.run_validation(row))
+        except serializers.ValidationError as error:
+            errors.update(error.detail)
+        for name in ('id',) + tuple(self.references):
+            if name in values or (name == 'id' and row.get('id') is None):
+                continue
+            try:
+                values[name] = self.id_field.run_validation(row.get(name, empty))
+            except serializers.ValidationError as error:
+                errors[name] = error.detail
+        return values, errors
+
+    def existing_keys(self, model, keys):
+        """
+        Looks up which of a set of primary keys exist, in batches of lookup_batch_size.
+        :param model: Model to look in.
+        :param keys: Set of primary keys.
+        :return: Set of the keys that exist.
+        """
+
+        keys = list(keys)
+        found = set()
+        for start in range(0, len(keys), self.lookup_batch_size):
+            found.update(model._default_manager.using(self.connection.alias).filter(
+                pk__in=keys[start:start + self.lookup_batch_size]
+            ).values_list('pk', flat=True))
+        return found
+
+    def referenced_keys(self, name, keys):
+        """
+        Looks up which keys of a foreign key exist, querying only the ones not
+         already known to exist.
+        :param name: Name of the foreign key.
+        :param keys: Set of keys referenced by a chunk.
+        :return: Set of the keys that exist.
+        """
+
+        known = self.known_keys[name]
+        if len(known) > self.known_keys_limit:
+            known.clear()
+        known.update(self.existing_keys(
+            self.references[name].related_model, set(keys) - known
+        ))
+        return set(keys) & known
+
+    def load_chunk(self, chunk, checkpoint):
+        """
+        Validates and loads a chunk of rows, advancing the checkpoint past it in the
+         same transaction.
+        :param chunk: List of rows.
+        :param checkpoint: ImportCheckpoint of the run.
+        :return: ChunkResult, with a list of (row number, errors) for rejected rows.
+        """
+
+        rejected = []
+        valid = []
+        for number, row in enumerate(chunk, checkpoint.rows + 1):
+            values, errors = self.validate(row)
+            if errors:
+                rejected.append((number, errors))
+            else:
+                valid.append((number, values))
+
+        with transaction.atomic(using=self.connection.alias):
+            existing = self.existing_keys(
+                self.model, set(values['id'] for _, values in valid if 'id' in values))
+            found = {
+                name: self.referenced_keys(name, set(values[name] for _, values in valid))
+                for name in self.references
+            }
+            objects = []
+            for number, values in valid:
+                errors = {
+                    name: ['{} {} does not exist.'.format(
+                        field.related_model._meta.verbose_name.capitalize(), values[name])]
+                    for name, field in self.references.items() if values[name] not in found[name]
+                }
+                if errors:
+                    rejected.append((number, errors))
+                elif values.get('id') not in existing:
+                    if 'id' in values:
+                        existing.add(values['id'])
+                    objects.append((number, self.build(values)))
+
+            instances = [instance for _, instance in objects]
+            if self.model is Ticket:
+                issued, sold_out = Ticket.objects.bulk_issue(instances, insert=self.insert)
+                rejected.extend(
+                    (number, {'event': ['Not enough tickets left for event {}.'.format(
+                        ticket.event_id)]})
+                    for number, ticket in objects if ticket.event_id in sold_out
+                )
+                loaded = len(issued)
+            else:
+                self.insert(instances)
+                Change.objects.db_manager(self.connection.alias).record(
+                    self.model, [instance.pk for instance in instances], Change.CREATE)
+                loaded = len(instances)
+                if instances:
+                    response_cache.invalidate(self.model)
+
+            checkpoint.rows += len(chunk)
+            checkpoint.loaded += loaded
+            checkpoint.rejected += len(rejected)
+            checkpoint.save()
+        rejected.sort(key=lambda item: item[0])
+        return ChunkResult(loaded, len(chunk) - loaded - len(rejected), rejected)
+
+    def build(self, values):
+        """
+        Builds an unsaved model instance from a validated row.
+        :param values: Dict of field values, with foreign keys as IDs.
+        :return: Model instance.
+        """
+
+        kwargs = dict(values)
+        for name, field in self.references.items():
+            kwargs[field.attname] = kwargs.pop(name)
+        return self.model(**kwargs)
+
+    def insert(self, objects):
+        """
+        Inserts new model instances.
+        :param objects: Unsaved model instances.
+        :return: None
+        """
+
+        insert_rows(self.model, objects, self.connection)
+
+
+def get_checkpoint(name, resume=False, restart=False):
+    """
+    Looks up or starts the checkpoint of an import.
+    :param name: Name of the import.
+    :param resume: Whether to carry on from an existing checkpoint.
+    :param restart: Whether to discard an existing checkpoint and start over.
+    :return: ImportCheckpoint.
+    :raises ValueError: If the import has a checkpoint and neither flag is set.
+    """
+
+    if restart:
+        ImportCheckpoint.objects.filter(pk=name).delete()
+    checkpoint, created = ImportCheckpoint.objects.get_or_create(pk=name)
+    if not created and not resume:
+        raise ValueError('{} has already been imported up to row {}.'.format(name, checkpoint.rows))
+    return checkpoint
@@ -0,0 +1,119 @@
+"""
+ Batch loading of embedded relations.
+ Works through an embed tree a level at a time, gathering the keys of every object
+  on a level and fetching each relation with one query, so embedding costs a query
+  per relation per level rather than per row.
+"""
+
+from collections import defaultdict
+from django.db import connections
+
+
+EMBED_ATTR = '_embedded_{}'
+
+
+def supports_window_functions(connection):
+    """
+    Checks whether a database connection can run ROW_NUMBER() OVER (...).
+    :param connection: Database connection.
+    :return: True if window functions are available.
+    """
+
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 25, 0)
+    return connection.features.supports_over_clause
+
+
+def load_relations(instances, embeds, limit, ordering=('created_at', 'id')):
+    """
+    Loads an embed tree for a list of model instances of the same model.
+    Forward relations are cached on the instances like select_related does, skipping
+     the ones already joined, and reverse relations are stored as a list of at most
+     limit children per instance in the EMBED_ATTR attribute.
+    :param instances: List of model instances.
+    :param embeds: Embed tree, a tuple of (name, serializer class, subtree) triples.
+    :param limit: Most children to load per instance for reverse relations.
+    :param ordering: Fields the children of reverse relations are sorted by.
+    :return: None
+    """
+
+    if not instances or not embeds:
+        return
+    opts = type(instances[0])._meta
+    for name, _, subtree in embeds:
+        field = opts.get_field(name)
+        if field.one_to_many:
+            related = load_reverse(instances, field, limit, ordering)
+        else:
+            related = load_forward(instances, field)
+        load_relations(related, subtree, limit, ordering)
+
+
+def load_forward(instances, field):
+    """
+    Loads a foreign key for a list of instances with a single pk__in query.
+    :param instances: List of model instances.
+    :param field: ForeignKey field to load.
+    :return: List of the related instances.
+    """
+
+    missing = [instance for instance in instances if not field.is_cached(instance)]
+    keys = set(getattr(instance, field.attname) for instance in missing)
+    keys.discard(None)
+    if keys:
+        found = field.related_model._default_manager.in_bulk(keys)
+        for instance in missing:
+            field.set_cached_value(instance, found.get(getattr(instance, field.attname)))
+    related = [field.get_cached_value(instance) for instance in instances]
+    return [instance for instance in related if instance is not None]
+
+
+def load_reverse(instances, rel, limit, ordering):
+    """
+    Loads the first children of a reverse foreign key for a list of instances.
+    Where the database has window functions, that's a single query keeping the first
+     limit rows of each parent.  Otherwise it's a LIMIT query per parent, each an
+     index range scan on the (parent, ordering) index.
+    :param instances: List of model instances.
+    :param rel: Reverse relation to load, e.g. Event.tickets.
+    :param limit: Most children to load per instance.
+    :param ordering: Fields the children are sorted by.
+    :return: List of the children loaded.
+    """
+
+    attr = EMBED_ATTR.format(rel.get_accessor_name())
+    missing = [instance for instance in instances if not hasattr(instance, attr)]
+    keys = set(instance.pk for instance in missing)
+    field = rel.field
+    model = rel.related_model
+    queryset = model._default_manager.order_by(field.attname, *ordering)
+    children = []
+    if keys:
+        queryset = queryset.filter(**{'{}__in'.format(field.attname): keys})
+        connection = connections[queryset.db]
+        if supports_window_functions(connection):
+            quote = connection.ops.quote_name
+            rank = 'ROW_NUMBER() OVER (PARTITION BY {} ORDER BY {})'.format(
+                quote(field.column),
+                ', '.join(quote(model._meta.get_field(name).column) for name in ordering)
+            )
+            ranked = queryset.extra(select={'embed_rank': rank})
+            sql, params = ranked.query.sql_with_params()
+            children = list(model._default_manager.raw(
+                'SELECT * FROM ({}) {} WHERE {rank} <= %s ORDER BY {}, {rank}'.format(
+                    sql, quote('ranked'), quote(field.column), rank=quote('embed_rank')),
+                tuple(params) + (limit,),
+                using=queryset.db
+            ))
+        else:
+            for key in keys:
+                children.extend(queryset.filter(**{field.attname: key})[:limit])
+
+    by_parent = defaultdict(list)
+    for child in children:
+        by_parent[getattr(child, field.attname)].append(child)
+    for instance in missing:
+        setattr(instance, attr, by_parent.get(instance.pk, []))
+        for child in getattr(instance, attr):
+            field.set_cached_value(child, instance)
+    return [child for instance in instances for child in getattr(instance, attr)]
@@ -0,0 +1,113 @@
+"""
+ Custom lookups for the ticket app.
+"""
+
+from django.db.models import Lookup
+
+
+class PrefixLookup(Lookup):
+    """
+     Case-sensitive prefix match written as a range, e.g. name__prefix='Bur' becomes
+      name >= 'Bur' AND name < 'Bus'.
+     Unlike startswith, which compiles to LIKE, a plain B-tree index on the column
+      can serve the range on SQLite.
+     PostgreSQL compares strings by the database's collation, under which the range
+      isn't a case-sensitive prefix match outside the C locale, so there the lookup
+      compiles to LIKE, served by the index from create_prefix_index().
+    """
+
+    lookup_name = 'prefix'
+
+    def as_sql(self, compiler, connection):
+        """
+        Compiles the lookup into a range condition.
+        :param compiler: Standard lookup compiler.
+        :param connection: Standard lookup database connection.
+        :return: Tuple of SQL and params.
+        """
+
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        prefix = self.rhs
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return '{0} >= %s AND {0} < %s'.format(lhs), lhs_params + [prefix] + lhs_params + [upper]
+
+    def as_postgresql(self, compiler, connection):
+        """
+        Compiles the lookup into a LIKE pattern anchored at the start.
+        :param compiler: Standard lookup compiler.
+        :param connection: Standard lookup database connection.
+        :return: Tuple of SQL and params.
+        """
+
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        pattern = connection.ops.prep_for_like_query(self.rhs) + '%'
+        return '{} LIKE %s'.format(lhs), lhs_params + [pattern]
+
+
+class WordSimilarLookup(Lookup):
+    """
+     PostgreSQL pg_trgm match of a term against the most similar word run in the
+      column, e.g. name__word_similar='jmes bow' matches 'James Bowen'.
+     A GiST index with gist_trgm_ops on the column serves it.
+    """
+
+    lookup_name = 'word_similar'
+
+    def as_sql(self, compiler, connection):
+        """
+        Compiles the lookup into the pg_trgm <% operator.
+        :param compiler: Standard lookup compiler.
+        :param connection: Standard lookup database connection.
+        :return: Tuple of SQL and params.
+        """
+
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '{} <%% {}'.format(rhs, lhs), rhs_params + lhs_params
+
+
+def prefix_index_name(model, field_name):
+    """
+    Builds the name of the index serving prefix lookups on a column.
+    :param model: Model class.
+    :param field_name: Name of the CharField.
+    :return: Index name.
+    """
+
+    return '{}_{}_prefix_idx'.format(model._meta.db_table, field_name)
+
+
+def create_prefix_index(schema_editor, model, field_name):
+    """
+    Creates the varchar_pattern_ops index serving prefix lookups on PostgreSQL,
+     which a plain index can only serve under the C collation.  Other backends are
+     served by the plain index on the column.
+    :param schema_editor: Schema editor of the database.
+    :param model: Model class.
+    :param field_name: Name of the CharField.
+    :return: None
+    """
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute('CREATE INDEX IF NOT EXISTS {} ON {} ({} varchar_pattern_ops)'.format(
+        quote(prefix_index_name(model, field_name)),
+        quote(model._meta.db_table),
+        quote(model._meta.get_field(field_name).column)
+    ))
+
+
+def drop_prefix_index(schema_editor, model, field_name):
+    """
+    Drops the index created by create_prefix_index().
+    :param schema_editor: Schema editor of the database.
+    :param model: Model class.
+    :param field_name: Name of the CharField.
+    :return: None
+    """
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS {}'.format(
+        schema_editor.quote_name(prefix_index_name(model, field_name))))
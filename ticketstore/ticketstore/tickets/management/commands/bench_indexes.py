@@ -0,0 +1,146 @@
+"""
+ Benchmark for the ticket access pattern indexes.
+ Seeds a synthetic data set, then runs each hot query with and without the
+  access pattern indexes, printing the query plans and median latencies.
+ Drops and recreates indexes, so only run it against a scratch database.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from ... import benchmarks, lookups
+from ...models import Client, Event, Customer, Ticket
+
+
+ACCESS_PATTERN_INDEXES = {
+    Client: ['client_name_idx'],
+    Event: ['event_name_idx'],
+    Customer: ['customer_name_idx'],
+    Ticket: ['ticket_event_created_idx', 'ticket_customer_created_idx', 'ticket_event_price_idx'],
+}
+
+
+class Command(BaseCommand):
+    """
+     Management command for the index benchmark.
+    """
+
+    help = 'Compares query plans and latency of the hot queries with and without their indexes.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the benchmark options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--tickets', type=int, default=1000000,
+                            help='Number of tickets to seed, e.g. 10000000.')
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--customers', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs of each query to take the median of.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded rows instead of deleting them.')
+
+    def handle(self, *args, **options):
+        """
+        Seeds the data, runs the benchmark and cleans up.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        self.stdout.write('Seeding {} tickets...'.format(options['tickets']))
+        _, event_ids, customer_ids = benchmarks.seed(
+            options['tickets'],
+            events=options['events'],
+            customers=options['customers'],
+            progress=self.progress
+        )
+        self.stdout.write('')
+        event_id = event_ids[len(event_ids) // 2]
+        customer_id = customer_ids[len(customer_ids) // 2]
+        cases = [
+            ('tickets for event', lambda: Ticket.objects.filter(
+                event_id=event_id).order_by('created_at', 'id')[:100]),
+            ('tickets for customer', lambda: Ticket.objects.filter(
+                customer_id=customer_id).order_by('created_at', 'id')[:100]),
+            ('revenue for event', lambda: Ticket.objects.filter(
+                event_id=event_id).values('event_id').annotate(revenue=Sum('price'))),
+            ('event by name', lambda: Event.objects.filter(name='Benchmark event 000500')),
+            ('customers by prefix', lambda: Customer.objects.filter(
+                name__prefix=benchmarks.BENCHMARK_CUSTOMER_PREFIX + '0005')[:100]),
+        ]
+
+        try:
+            self.stdout.write('== With access pattern indexes')
+            with_indexes = self.run_cases(cases, options['repeat'])
+            self.set_indexes(False)
+            try:
+                without_indexes = self.run_cases(cases, options['repeat'])
+            finally:
+                self.set_indexes(True)
+        finally:
+            if not options['keep']:
+                benchmarks.clear()
+
+        self.stdout.write('')
+        self.stdout.write('{:<24}{:>16}{:>16}{:>10}'.format(
+            'query', 'with (ms)', 'without (ms)', 'speedup'))
+        for name, _ in cases:
+            self.stdout.write('{:<24}{:>16.3f}{:>16.3f}{:>9.1f}x'.format(
+                name,
+                with_indexes[name],
+                without_indexes[name],
+                without_indexes[name] / max(with_indexes[name], 0.001)
+            ))
+
+    def run_cases(self, cases, repeat):
+        """
+        Prints the plan of each query and times it.
+        :param cases: List of (name, queryset factory) tuples.
+        :param repeat: Runs of each query to take the median of.
+        :return: Dict of median latency in milliseconds by case name.
+        """
+
+        timings = {}
+        for name, queryset in cases:
+            self.stdout.write('-- {}'.format(name))
+            self.stdout.write(queryset().explain())
+            timings[name] = benchmarks.median_ms(lambda: list(queryset()), repeat)
+        return timings
+
+    def set_indexes(self, present):
+        """
+        Creates or drops the access pattern indexes.
+        :param present: True to create the indexes, False to drop them.
+        :return: None
+        """
+
+        self.stdout.write('')
+        self.stdout.write('== {} access pattern indexes'.format(
+            'Creating' if present else 'Dropping'))
+        with connection.schema_editor() as schema_editor:
+            for model, names in ACCESS_PATTERN_INDEXES.items():
+                for index in model._meta.indexes:
+                    if index.name in names:
+                        if present:
+                            schema_editor.add_index(model, index)
+                        else:
+                            schema_editor.remove_index(model, index)
+                if model is not Ticket:
+                    if present:
+                        lookups.create_prefix_index(schema_editor, model, 'name')
+                    else:
+                        lookups.drop_prefix_index(schema_editor, model, 'name')
+
+    def progress(self, created):
+        """
+        Reports seeding progress.
+        :param created: Number of tickets created so far.
+        :return: None
+        """
+
+        if created % 500000 == 0:
+            self.stdout.write('  {} tickets'.format(created))
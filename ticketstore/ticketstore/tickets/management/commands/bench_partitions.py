@@ -0,0 +1,155 @@
+"""
+ Benchmark for partitioning the tickets table by event on PostgreSQL.
+ Seeds a synthetic data set, then times the per-event ticket queries, a lookup by
+  ticket ID, bulk inserts and purchases with the plain table and again with it hash
+  partitioned, printing the query plans and median latencies.
+ Rebuilds the tickets table twice, so only run it against a scratch database.
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from ... import benchmarks
+from ...models import Event, Ticket
+from ...partitions import partition_count, partition_tickets, supports_partitioning, vacuum
+
+
+class Command(BaseCommand):
+    """
+     Management command for the partitioning benchmark.
+    """
+
+    help = 'Compares per-event query latency and insert throughput with and without ' \
+           'partitioning the tickets table.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the benchmark options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--tickets', type=int, default=100000000,
+                            help='Number of tickets to seed.')
+        parser.add_argument('--events', type=int, default=10000)
+        parser.add_argument('--customers', type=int, default=1000000)
+        parser.add_argument('--partitions', type=int, default=16)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs of each query to take the median of.')
+        parser.add_argument('--inserts', type=int, default=50000,
+                            help='Tickets bulk inserted to measure insert throughput.')
+        parser.add_argument('--purchases', type=int, default=2000,
+                            help='Single ticket purchases to measure purchase throughput.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded rows instead of deleting them.')
+
+    def handle(self, *args, **options):
+        """
+        Seeds the data, runs the benchmark and cleans up.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        if not supports_partitioning(connection):
+            raise CommandError('This benchmark needs PostgreSQL 11 or later.')
+        if partition_count(connection):
+            raise CommandError('The tickets table is already partitioned, run '
+                               'partition_tickets --undo first.')
+
+        self.stdout.write('Seeding {} tickets...'.format(options['tickets']))
+        client, event_ids, customer_ids = benchmarks.seed(
+            options['tickets'],
+            events=options['events'],
+            customers=options['customers'],
+            progress=self.progress
+        )
+        vacuum(connection)
+        self.stdout.write('')
+        event_id = event_ids[len(event_ids) // 2]
+        ticket_id = Ticket.objects.filter(event_id=event_id).values_list('id', flat=True)[0]
+        cases = [
+            ('tickets for event', lambda: Ticket.objects.filter(
+                event_id=event_id).order_by('created_at', 'id')[:100]),
+            ('revenue for event', lambda: Ticket.objects.filter(
+                event_id=event_id).values('event_id').annotate(revenue=Sum('price'))),
+            ('count for event', lambda: Ticket.objects.filter(
+                event_id=event_id).values('event_id').annotate(tickets=Count('id'))),
+            ('ticket by id', lambda: Ticket.objects.filter(pk=ticket_id)),
+        ]
+
+        results = {}
+        try:
+            self.stdout.write('== Plain table')
+            results['plain'] = self.run_cases(cases, client, event_ids, customer_ids, options)
+            self.stdout.write('')
+            self.stdout.write('== Partitioning into {} partitions'.format(options['partitions']))
+            start = time.perf_counter()
+            partition_tickets(connection, options['partitions'])
+            self.stdout.write('  took {:.0f} s'.format(time.perf_counter() - start))
+            try:
+                results['partitioned'] = self.run_cases(
+                    cases, client, event_ids, customer_ids, options)
+            finally:
+                partition_tickets(connection, 0)
+        finally:
+            if not options['keep']:
+                benchmarks.clear()
+
+        plain, partitioned = results['plain'], results['partitioned']
+        self.stdout.write('')
+        self.stdout.write('{:<24}{:>12}{:>18}{:>10}'.format(
+            'query', 'plain (ms)', 'partitioned (ms)', 'speedup'))
+        for name, _ in cases:
+            self.stdout.write('{:<24}{:>12.3f}{:>18.3f}{:>9.1f}x'.format(
+                name, plain[name], partitioned[name], plain[name] / max(partitioned[name], 0.001)))
+        for name in ('bulk insert (rows/s)', 'purchases (/s)'):
+            self.stdout.write('{:<24}{:>12.0f}{:>18.0f}{:>9.1f}x'.format(
+                name, plain[name], partitioned[name], partitioned[name] / max(plain[name], 1)))
+
+    def run_cases(self, cases, client, event_ids, customer_ids, options):
+        """
+        Prints the plan of each query and times it, then measures inserts.
+        :param cases: List of (name, queryset factory) tuples.
+        :param client: Benchmark client to add the purchase event to.
+        :param event_ids: IDs of the seeded events.
+        :param customer_ids: IDs of the seeded customers.
+        :param options: Parsed options.
+        :return: Dict of median latency in milliseconds, or throughput, by case name.
+        """
+
+        results = {}
+        for name, queryset in cases:
+            self.stdout.write('-- {}'.format(name))
+            self.stdout.write(queryset().explain())
+            results[name] = benchmarks.median_ms(lambda: list(queryset()), options['repeat'])
+
+        start = time.perf_counter()
+        for offset in range(0, options['inserts'], 1000):
+            Ticket.objects.bulk_create([
+                Ticket(
+                    event_id=event_ids[number % len(event_ids)],
+                    customer_id=customer_ids[number % len(customer_ids)],
+                    price=benchmarks.PRICES[number % len(benchmarks.PRICES)],
+                ) for number in range(offset, min(offset + 1000, options['inserts']))
+            ])
+        results['bulk insert (rows/s)'] = options['inserts'] / (time.perf_counter() - start)
+
+        event = Event.objects.create(
+            name='Benchmark purchases', venue_capacity=32767, client_id=client.id)
+        start = time.perf_counter()
+        for number in range(options['purchases']):
+            Ticket.objects.purchase(event.id, customer_ids[number % len(customer_ids)], price=50)
+        results['purchases (/s)'] = options['purchases'] / (time.perf_counter() - start)
+        return results
+
+    def progress(self, created):
+        """
+        Reports seeding progress.
+        :param created: Number of tickets created so far.
+        :return: None
+        """
+
+        if created % 1000000 == 0:
+            self.stdout.write('  {} tickets'.format(created))
@@ -0,0 +1,65 @@
+"""
+ Benchmark for the primary key schemes.
+ Seeds the same synthetic data set with random (version 4) and time-ordered
+  (version 7) UUID keys, comparing insert throughput and ticket index sizes.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from ... import benchmarks
+from ...models import Ticket
+
+
+class Command(BaseCommand):
+    """
+     Management command for the primary key benchmark.
+    """
+
+    help = 'Compares insert throughput and index size of version 4 and version 7 UUID keys.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the benchmark options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--tickets', type=int, default=1000000)
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--customers', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        """
+        Seeds the data once per key scheme and reports the results.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        results = {}
+        for version in (4, 7):
+            self.stdout.write('Seeding {} tickets with version {} keys...'.format(
+                options['tickets'], version))
+            benchmarks.clear()
+            with override_settings(TICKETS_UUID_VERSION=version):
+                start = time.perf_counter()
+                benchmarks.seed(
+                    options['tickets'],
+                    events=options['events'],
+                    customers=options['customers']
+                )
+                elapsed = time.perf_counter() - start
+            results[version] = (options['tickets'] / elapsed, benchmarks.index_sizes(Ticket))
+            benchmarks.clear()
+
+        self.stdout.write('')
+        self.stdout.write('{:<40}{:>16}{:>16}'.format('', 'uuid4', 'uuid7'))
+        self.stdout.write('{:<40}{:>16.0f}{:>16.0f}'.format(
+            'inserts/sec', results[4][0], results[7][0]))
+        for name in sorted(results[4][1]):
+            self.stdout.write('{:<40}{:>15.1f}M{:>15.1f}M'.format(
+                name,
+                results[4][1][name] / 1048576.0,
+                results[7][1].get(name, 0) / 1048576.0
+            ))
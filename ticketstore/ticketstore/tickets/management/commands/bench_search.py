@@ -0,0 +1,107 @@
+"""
+ Benchmark for the name search endpoint.
+ Seeds customers with random first and last names, then times searches through
+  /api/customer/search, from rare words to two letter prefixes matching a large
+  share of the table, printing each query's plan and latency percentiles.
+"""
+
+import random
+import time
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient
+from ... import benchmarks
+from ...models import Customer
+from ...search import search_names
+
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William',
+    'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+    'Charles', 'Karen', 'Amelie', 'Zoe', 'Jamie', 'Mateo', 'Sofia', 'Lucas', 'Chloe', 'Noah',
+    'Hannah', 'Oliver', 'Isabella', 'Ethan', 'Ines', 'Hugo', 'Lea', 'Felix', 'Emma', 'Leon',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+    'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor',
+    'Moore', 'Jackson', 'Martin', 'Bowen', 'Bowman', 'Jameson', 'Muller', 'Schmidt', 'Dubois',
+    'Lefevre', 'Rossi', 'Russo', 'Novak', 'Kowalski', 'Nielsen', 'Jansen', 'Silva', 'Santos',
+]
+QUERIES = ['Bowen', 'jam bow', 'zoe jameson', 'kowal', 'ja', 'smith', 'xq']
+
+
+class Command(BaseCommand):
+    """
+     Management command for the search benchmark.
+    """
+
+    help = 'Measures the latency of name searches over a large customer table.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the benchmark options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--customers', type=int, default=1000000,
+                            help='Number of customers to seed.')
+        parser.add_argument('--page-size', type=int, default=20,
+                            help='Results per search.')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Runs of each search.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded rows instead of deleting them.')
+
+    def handle(self, *args, **options):
+        """
+        Seeds the customers, runs the searches and cleans up.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        self.stdout.write('Seeding {} customers...'.format(options['customers']))
+        names = random.Random(0)
+        benchmarks.seed(0, events=1, customers=options['customers'], customer_names=lambda _: (
+            '{} {}'.format(names.choice(FIRST_NAMES), names.choice(LAST_NAMES))
+        ))
+        try:
+            self.run(options['page_size'], options['repeat'])
+        finally:
+            if not options['keep']:
+                benchmarks.clear()
+
+    def run(self, page_size, repeat):
+        """
+        Prints the plan of each search and times it through the API.
+        :param page_size: Results per search.
+        :param repeat: Runs of each search.
+        :return: None
+        """
+
+        client = TestClient()
+        results = []
+        for term in QUERIES:
+            self.stdout.write('-- {}'.format(term))
+            self.stdout.write(search_names(Customer.objects.all(), term, connection).explain())
+            url = '/api/customer/search?{}'.format(urlencode({'q': term, 'page_size': page_size}))
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError('{} returned {}.'.format(url, response.status_code))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results.append((term, len(response.data['results']), timings))
+
+        self.stdout.write('')
+        self.stdout.write('{:<16}{:>8}{:>12}{:>12}{:>12}'.format(
+            'query', 'results', 'p50 (ms)', 'p95 (ms)', 'max (ms)'))
+        for term, count, timings in results:
+            self.stdout.write('{:<16}{:>8}{:>12.2f}{:>12.2f}{:>12.2f}'.format(
+                term, count, timings[len(timings) // 2],
+                timings[int(len(timings) * 0.95)], timings[-1]))
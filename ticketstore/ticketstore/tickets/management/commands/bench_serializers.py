@@ -0,0 +1,254 @@
+"""
+ Benchmark suite for the dynamic serializers.
+ Seeds synthetic data sets of increasing size, then measures list and retrieve
+  latency, SQL query count, peak memory and response size of every endpoint
+  across a matrix of embed_fields/include_fields/exclude_fields params.
+ Results are written as JSON, and can be compared against an earlier run to
+  catch regressions between commits.
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from urllib.parse import urlencode
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient
+from django.utils import timezone
+from ... import benchmarks
+from ...models import Client, Event, Customer, Ticket
+from ...views import ClientViewSet, EventViewSet
+
+
+MATRIX = [
+    ('client', Client, [
+        {},
+        {'include_fields': 'id,name'},
+        {'exclude_fields': 'created_at,updated_at'},
+    ]),
+    ('event', Event, [
+        {},
+        {'include_fields': 'id,name'},
+        {'exclude_fields': 'created_at,updated_at'},
+        {'embed_fields': 'client'},
+    ]),
+    ('customer', Customer, [
+        {},
+        {'include_fields': 'id,name'},
+        {'exclude_fields': 'created_at,updated_at'},
+    ]),
+    ('ticket', Ticket, [
+        {},
+        {'include_fields': 'id,price'},
+        {'exclude_fields': 'created_at,updated_at'},
+        {'embed_fields': 'event'},
+        {'embed_fields': 'customer'},
+        {'embed_fields': 'event,customer'},
+        {'embed_fields': 'event,customer', 'page_size': 1000},
+    ]),
+]
+
+
+class Command(BaseCommand):
+    """
+     Management command for the serializer benchmark suite.
+    """
+
+    help = ('Measures list/retrieve latency, query count and memory of every endpoint across '
+            'the field selection params, writing the results as JSON.')
+
+    def add_arguments(self, parser):
+        """
+        Adds the benchmark options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--sizes', default='1000,100000,1000000',
+                            help='Comma-separated numbers of tickets to seed, one data set each.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs of each request to take the median and p95 of.')
+        parser.add_argument('--output', default='bench_serializers.json',
+                            help='File to write the JSON results to.')
+        parser.add_argument('--compare',
+                            help='Earlier results file to compare against.')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='Slowdown ratio counted as a regression when comparing.')
+
+    def handle(self, *args, **options):
+        """
+        Runs the suite for each data set size and writes the results.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        results = []
+        # The response cache would turn every repeat into a cache hit.
+        cached_viewsets = [ClientViewSet, EventViewSet]
+        for viewset in cached_viewsets:
+            viewset.cache_responses = False
+        try:
+            for size in sizes:
+                self.stdout.write('Seeding {} tickets...'.format(size))
+                benchmarks.clear()
+                benchmarks.seed(
+                    size,
+                    events=max(10, size // 100),
+                    customers=max(10, size // 10),
+                    clients=max(1, size // 1000)
+                )
+                try:
+                    results.extend(self.run_size(size, options['repeat']))
+                finally:
+                    benchmarks.clear()
+        finally:
+            for viewset in cached_viewsets:
+                viewset.cache_responses = True
+
+        report = {'meta': self.metadata(options['repeat']), 'results': results}
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write('Wrote {} results to {}.'.format(len(results), options['output']))
+        if options['compare']:
+            self.compare(options['compare'], results, options['threshold'])
+
+    def run_size(self, size, repeat):
+        """
+        Measures every endpoint, action and param combination on the seeded data.
+        :param size: Number of tickets seeded, recorded with the results.
+        :param repeat: Runs of each request.
+        :return: List of result dicts.
+        """
+
+        client = TestClient()
+        results = []
+        self.stdout.write('{:<10}{:<10}{:<10}{:<44}{:>10}{:>10}{:>8}{:>12}'.format(
+            'size', 'endpoint', 'action', 'params', 'p50 (ms)', 'p95 (ms)', 'queries',
+            'peak (KiB)'))
+        for endpoint, model, matrix in MATRIX:
+            ids = model.objects.order_by('created_at', 'id').values_list('id', flat=True)
+            middle_id = ids[ids.count() // 2]
+            for params in matrix:
+                for action, path in (('list', '/api/{}'.format(endpoint)),
+                                     ('retrieve', '/api/{}/{}'.format(endpoint, middle_id))):
+                    if action == 'retrieve' and 'page_size' in params:
+                        continue
+                    url = path + ('?' + urlencode(params, safe=',') if params else '')
+                    result = dict(
+                        size=size, endpoint=endpoint, action=action,
+                        params=urlencode(params, safe=','),
+                        **self.measure(client, url, repeat)
+                    )
+                    results.append(result)
+                    self.stdout.write(
+                        '{:<10}{:<10}{:<10}{:<44}{:>10.2f}{:>10.2f}{:>8}{:>12.1f}'.format(
+                            size, endpoint, action, result['params'] or '-', result['median_ms'],
+                            result['p95_ms'], result['queries'], result['peak_kib']))
+        return results
+
+    @staticmethod
+    def measure(client, url, repeat):
+        """
+        Measures one request.
+        Latency comes from the timed runs, the query count from a run with queries
+         captured and peak memory from a run with tracemalloc on, so neither slows
+         down the timings.
+        :param client: Django test client.
+        :param url: URL to request.
+        :param repeat: Number of timed runs.
+        :return: Dict with the median and p95 latency, query count, peak memory and
+         response size.
+        """
+
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError('{} returned {}.'.format(url, response.status_code))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            """ Execute wrapper counting the request's queries. """
+            #pylint: disable=R0913
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            client.get(url)
+        tracemalloc.start()
+        try:
+            client.get(url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'queries': len(queries),
+            'peak_kib': round(peak / 1024.0, 1),
+            'response_bytes': len(response.content),
+        }
+
+    @staticmethod
+    def metadata(repeat):
+        """
+        Describes the environment the results were taken in.
+        :param repeat: Runs of each request.
+        :return: Dict of metadata.
+        """
+
+        try:
+            commit = subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode('ascii').strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+        }
+
+    def compare(self, path, results, threshold):
+        """
+        Compares the results with an earlier run, failing on regressions.
+        A case regresses when it makes more queries, or its median latency grows by
+         more than the threshold ratio.
+        :param path: Earlier results file.
+        :param results: Results of this run.
+        :param threshold: Slowdown ratio counted as a regression.
+        :return: None
+        """
+
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        key = lambda result: (
+            result['size'], result['endpoint'], result['action'], result['params'])
+        previous = {key(result): result for result in baseline['results']}
+        regressions = 0
+        self.stdout.write('')
+        self.stdout.write('Compared with {} ({}):'.format(path, baseline['meta'].get('commit')))
+        for result in results:
+            before = previous.get(key(result))
+            if before is None:
+                continue
+            ratio = result['median_ms'] / max(before['median_ms'], 0.001)
+            regressed = ratio > threshold or result['queries'] > before['queries']
+            regressions += regressed
+            self.stdout.write('{:<10}{:<10}{:<10}{:<44}{:>8.2f}x{:>5} -> {:<5}{}'.format(
+                *(key(result)[:3] + (result['params'] or '-', ratio, before['queries'],
+                                     result['queries'], '  REGRESSION' if regressed else ''))))
+        if regressions:
+            raise CommandError('{} cases regressed.'.format(regressions))
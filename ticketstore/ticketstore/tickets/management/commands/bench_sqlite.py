@@ -0,0 +1,80 @@
+"""
+ Benchmark for the SQLite tuning and purchase coalescing.
+ Buys out an event with parallel workers three times: with SQLite's default
+  rollback journal, with the TICKETS_SQLITE_PRAGMAS tuning, and with the tuning
+  plus the coalescing purchase queue, then compares their throughput.
+ Needs a file-backed SQLite database, and switches its journal mode while it runs.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import override_settings
+from ... import benchmarks
+from ...writes import purchase_queue
+
+
+BASELINE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+class Command(BaseCommand):
+    """
+     Management command for the SQLite purchase benchmark.
+    """
+
+    help = 'Compares concurrent purchase throughput before and after the SQLite tuning.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the benchmark options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--workers', type=int, default=50,
+                            help='Number of concurrent buyers.')
+        parser.add_argument('--capacity', type=int, default=2000,
+                            help='Venue capacity of each event being bought out.')
+
+    def handle(self, *args, **options):
+        """
+        Runs each configuration and prints the comparison.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark needs an SQLite database.')
+        configurations = [
+            ('default', BASELINE_PRAGMAS, None),
+            ('tuned', settings.TICKETS_SQLITE_PRAGMAS, None),
+            ('tuned+coalesced', settings.TICKETS_SQLITE_PRAGMAS, purchase_queue.purchase),
+        ]
+        results = []
+        try:
+            for name, pragmas, purchase in configurations:
+                self.stdout.write('Running {}...'.format(name))
+                # New connections pick up the pragmas, including the journal mode.
+                connections.close_all()
+                with override_settings(TICKETS_SQLITE_PRAGMAS=pragmas):
+                    connection.ensure_connection()
+                    try:
+                        results.append((name, benchmarks.stress_purchases(
+                            options['workers'], options['capacity'], purchase=purchase)))
+                    finally:
+                        benchmarks.clear_stress()
+                        connections.close_all()
+        finally:
+            connections.close_all()
+
+        self.stdout.write('')
+        self.stdout.write('{:<18}{:>12}{:>12}{:>16}'.format(
+            'configuration', 'purchased', 'lock errors', 'purchases/sec'))
+        for name, result in results:
+            self.stdout.write('{:<18}{:>12}{:>12}{:>16.1f}'.format(
+                name,
+                result['purchased'],
+                result['retries'],
+                result['purchased'] / result['elapsed']
+            ))
@@ -0,0 +1,115 @@
+"""
+ Benchmark of the .values() fast path of the list endpoints.
+ Requests full pages of tickets and events with the fast path on and off, checks
+  that both render the same bytes, and reports the CPU time spent per row by each.
+"""
+
+import statistics
+import time
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client as TestClient
+from django.test.utils import override_settings
+from ... import benchmarks
+from ...views import EventViewSet
+
+
+MATRIX = [
+    ('ticket', {}),
+    ('ticket', {'include_fields': 'id,price'}),
+    ('ticket', {'exclude_fields': 'created_at,updated_at'}),
+    ('ticket', {'embed_fields': 'event'}),
+    ('ticket', {'embed_fields': 'event,customer'}),
+    ('event', {}),
+    ('event', {'embed_fields': 'client'}),
+]
+
+
+class Command(BaseCommand):
+    """
+     Management command for the fast path benchmark.
+    """
+
+    help = 'Compares the CPU time per row of list responses with and without the .values() ' \
+           'fast path.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the benchmark options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--tickets', type=int, default=20000,
+                            help='Number of tickets to seed.')
+        parser.add_argument('--page-size', type=int, default=1000,
+                            help='Rows per request.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs of each request to take the median of.')
+
+    def handle(self, *args, **options):
+        """
+        Seeds the data, measures every case and cleans up.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        self.stdout.write('Seeding {} tickets...'.format(options['tickets']))
+        benchmarks.clear()
+        benchmarks.seed(
+            options['tickets'],
+            events=max(options['page_size'], options['tickets'] // 20),
+            customers=max(10, options['tickets'] // 10)
+        )
+        # The response cache would turn every repeat of the event list into a cache hit.
+        EventViewSet.cache_responses = False
+        try:
+            self.run(options['page_size'], options['repeat'])
+        finally:
+            EventViewSet.cache_responses = True
+            benchmarks.clear()
+
+    def run(self, page_size, repeat):
+        """
+        Measures every case in the matrix.
+        :param page_size: Rows per request.
+        :param repeat: Runs of each request.
+        :return: None
+        """
+
+        client = TestClient()
+        self.stdout.write('{:<10}{:<36}{:>14}{:>14}{:>14}{:>10}'.format(
+            'endpoint', 'params', 'models (us)', 'values (us)', 'saved (us)', 'speedup'))
+        for endpoint, params in MATRIX:
+            query = urlencode(dict(params, page_size=page_size), safe=',')
+            url = '/api/{}?{}'.format(endpoint, query)
+            with override_settings(TICKETS_FAST_SERIALIZATION=False):
+                content, models = self.measure(client, url, repeat)
+            values_content, values = self.measure(client, url, repeat)
+            if values_content != content:
+                raise CommandError('{} renders differently on the fast path.'.format(url))
+            self.stdout.write('{:<10}{:<36}{:>14.2f}{:>14.2f}{:>14.2f}{:>9.2f}x'.format(
+                endpoint, urlencode(params, safe=',') or '-', models, values, models - values,
+                models / max(values, 0.001)))
+
+    @staticmethod
+    def measure(client, url, repeat):
+        """
+        Measures the CPU time of one request per row returned.
+        :param client: Django test client.
+        :param url: URL to request.
+        :param repeat: Number of timed runs.
+        :return: Tuple of the response body and the median microseconds per row.
+        """
+
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError('{} returned {}.'.format(url, response.status_code))
+        rows = max(len(response.data['results']), 1)
+        timings = []
+        for _ in range(repeat):
+            start = time.process_time()
+            client.get(url)
+            timings.append((time.process_time() - start) * 1000000 / rows)
+        return response.content, statistics.median(timings)
@@ -0,0 +1,154 @@
+"""
+ Bulk import of clients, events, customers or tickets from CSV or NDJSON.
+ Streams the input a chunk at a time, so memory use doesn't grow with the file, and
+  commits a checkpoint with every chunk so a failed run can be resumed.
+ Rows reference each other by ID, so import clients, then events and customers, then
+  tickets.  Rejected rows are written out as NDJSON with their row number and errors.
+"""
+
+import json
+import os
+import sys
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from ...imports import FORMATS, IMPORT_SPECS, Importer, get_checkpoint, read_rows
+
+
+class Command(BaseCommand):
+    """
+     Management command for bulk imports.
+    """
+
+    help = 'Imports clients, events, customers or tickets from a CSV or NDJSON file.'
+    report_interval = 2.0
+
+    def add_arguments(self, parser):
+        """
+        Adds the import options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('model', choices=list(IMPORT_SPECS),
+                            help='What the input holds.')
+        parser.add_argument('path', help='File to import, or - for standard input.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format, by default from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='Rows committed per transaction.')
+        parser.add_argument('--name',
+                            help='Name of the import to checkpoint under, by default the '
+                                 'model and absolute path.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Carry on after the last committed chunk of an earlier run.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Discard the checkpoint of an earlier run and start over.')
+        parser.add_argument('--errors',
+                            help='File to write rejected rows to, by default standard error.')
+        parser.add_argument('--max-errors', type=int, default=1000,
+                            help='Stop once more rows than this have been rejected.')
+
+    def handle(self, *args, **options):
+        """
+        Runs the import.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        path = options['path']
+        input_format = options['format']
+        if not input_format:
+            extension = os.path.splitext(path)[1].lower()
+            if path == '-' or extension not in ('.csv', '.ndjson', '.jsonl'):
+                raise CommandError('Pass --format for {}.'.format(path))
+            input_format = 'csv' if extension == '.csv' else 'ndjson'
+        if path == '-' and not options['name']:
+            raise CommandError('Pass --name to checkpoint an import from standard input.')
+        name = options['name'] or '{}:{}'.format(options['model'], os.path.abspath(path))
+
+        try:
+            checkpoint = get_checkpoint(name, options['resume'], options['restart'])
+        except ValueError as error:
+            raise CommandError('{} Pass --resume to carry on from there, or --restart to '
+                               'start over.'.format(error))
+        if checkpoint.finished:
+            self.stdout.write('{} has already been imported.'.format(name))
+            return
+
+        importer = Importer(IMPORT_SPECS[options['model']])
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        errors = open(options['errors'], 'a', encoding='utf-8') if options['errors'] else None
+        try:
+            self.run(importer, read_rows(stream, input_format), checkpoint, errors, options)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if errors:
+                errors.close()
+
+    def run(self, importer, rows, checkpoint, errors, options):
+        """
+        Loads the rows a chunk at a time, reporting progress as it goes.
+        :param importer: Importer for the model.
+        :param rows: Iterator of input rows.
+        :param checkpoint: ImportCheckpoint of the import.
+        :param errors: File to write rejected rows to, or None for standard error.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        if checkpoint.rows:
+            self.stdout.write('Resuming {} after row {}.'.format(checkpoint.name, checkpoint.rows))
+            if sum(1 for _ in islice(rows, checkpoint.rows)) < checkpoint.rows:
+                raise CommandError('The input is shorter than the {} rows already '
+                                   'imported.'.format(checkpoint.rows))
+        start_rows = checkpoint.rows
+        start = reported = time.perf_counter()
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+            if not chunk:
+                break
+            try:
+                result = importer.load_chunk(chunk, checkpoint)
+            except DatabaseError as error:
+                raise CommandError(
+                    'Failed on the chunk starting at row {}: {}.  Everything before it is '
+                    'committed, run again with --resume to carry on.'.format(
+                        checkpoint.rows + 1, error))
+            for number, row_errors in result.rejected:
+                line = json.dumps({'row': number, 'errors': row_errors})
+                if errors:
+                    errors.write(line + '\n')
+                else:
+                    self.stderr.write(line)
+            if checkpoint.rejected > options['max_errors']:
+                raise CommandError(
+                    'Stopped after {} rejected rows, at row {}.  Run again with --resume to carry '
+                    'on after them.'.format(checkpoint.rejected, checkpoint.rows))
+            now = time.perf_counter()
+            if now - reported >= self.report_interval:
+                reported = now
+                self.report(checkpoint, (checkpoint.rows - start_rows) / (now - start))
+
+        checkpoint.finished = True
+        checkpoint.save()
+        self.report(checkpoint, (checkpoint.rows - start_rows) / max(time.perf_counter() - start,
+                                                                     0.001))
+        self.stdout.write('Finished {}.'.format(checkpoint.name))
+
+    def report(self, checkpoint, rate):
+        """
+        Prints the progress of the import.
+        :param checkpoint: ImportCheckpoint of the import.
+        :param rate: Rows read per second by this run.
+        :return: None
+        """
+
+        self.stdout.write('  {} rows read, {} loaded, {} already there, {} rejected, '
+                          '{:.0f} rows/s'.format(
+                              checkpoint.rows, checkpoint.loaded,
+                              checkpoint.rows - checkpoint.loaded - checkpoint.rejected,
+                              checkpoint.rejected, rate))
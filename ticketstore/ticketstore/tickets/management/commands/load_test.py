@@ -0,0 +1,140 @@
+"""
+ HTTP load test for comparing servers.
+ Sends the same read requests to each running server with a fixed number of
+  concurrent keep-alive connections, and reports requests per second and latency
+  percentiles, e.g. for the WSGI and ASGI entry points on the same machine.
+"""
+
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(timings, fraction):
+    """
+    Picks a percentile from a list of timings with the nearest-rank method.
+    :param timings: Sorted list of timings.
+    :param fraction: Percentile as a fraction, e.g. 0.99.
+    :return: Timing at that percentile, or 0 for an empty list.
+    """
+
+    if not timings:
+        return 0
+    return timings[min(len(timings) - 1, max(0, int(round(fraction * len(timings))) - 1))]
+
+
+class Command(BaseCommand):
+    """
+     Management command for the load test.
+    """
+
+    help = 'Compares requests/sec and latency of running servers under concurrent reads.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the load test options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--target', action='append', required=True,
+                            help='Server to test as name=base URL, e.g. '
+                                 'wsgi=http://127.0.0.1:8000.  Can be repeated.')
+        parser.add_argument('--path', action='append',
+                            help='Path to request, cycled through.  Can be repeated, '
+                                 'defaults to the event and ticket lists.')
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help='Number of concurrent connections.')
+        parser.add_argument('--requests', type=int, default=10000,
+                            help='Number of requests sent to each server.')
+        parser.add_argument('--warmup', type=int, default=200,
+                            help='Requests sent to each server before timing starts.')
+
+    def handle(self, *args, **options):
+        """
+        Runs the load test against each server and prints the comparison.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        paths = options['path'] or ['/api/event?page_size=20', '/api/ticket?page_size=20']
+        results = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(
+                    'Targets look like name=http://host:port, got {}.'.format(target))
+            self.stdout.write('Testing {} at {}...'.format(name, url))
+            self.run(url, paths, options['concurrency'], options['warmup'])
+            results.append(
+                (name, self.run(url, paths, options['concurrency'], options['requests'])))
+
+        self.stdout.write('')
+        self.stdout.write('{:<12}{:>10}{:>8}{:>12}{:>12}{:>12}'.format(
+            'server', 'requests', 'errors', 'req/s', 'p50 (ms)', 'p99 (ms)'))
+        for name, result in results:
+            self.stdout.write('{:<12}{:>10}{:>8}{:>12.1f}{:>12.2f}{:>12.2f}'.format(
+                name,
+                result['requests'],
+                result['errors'],
+                result['requests'] / result['elapsed'],
+                percentile(result['timings'], 0.5) * 1000,
+                percentile(result['timings'], 0.99) * 1000,
+            ))
+
+    def run(self, url, paths, concurrency, requests):
+        """
+        Sends requests to one server from concurrent keep-alive connections.
+        :param url: Base URL of the server.
+        :param paths: Paths to cycle through.
+        :param concurrency: Number of concurrent connections.
+        :param requests: Total number of requests to send.
+        :return: Dict with the request and error counts, elapsed seconds and the
+         sorted latencies of the successful requests.
+        """
+
+        base = urlsplit(url)
+        counter = iter(range(requests))
+        counter_lock = threading.Lock()
+
+        def worker():
+            """ Sends requests over one connection until the counter runs out. """
+            connection = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=60)
+            timings = []
+            errors = 0
+            while True:
+                with counter_lock:
+                    number = next(counter, None)
+                if number is None:
+                    break
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', base.path.rstrip('/') + paths[number % len(paths)])
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    errors += 1
+                    continue
+                if response.status == 200:
+                    timings.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+            connection.close()
+            return timings, errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(lambda _: worker(), range(concurrency)))
+        elapsed = time.perf_counter() - start
+        timings = sorted(timing for worker_timings, _ in outcomes for timing in worker_timings)
+        return {
+            'requests': requests,
+            'errors': sum(errors for _, errors in outcomes),
+            'elapsed': elapsed,
+            'timings': timings,
+        }
@@ -0,0 +1,58 @@
+"""
+ Maintenance command for partitioning the tickets table by event on PostgreSQL
+  (see ticketstore.tickets.partitions).
+ Rebuilds the table, locking it for the whole run, so run it in a quiet period.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, connections
+from ...partitions import partition_count, partition_tickets
+
+
+class Command(BaseCommand):
+    """
+     Management command for partitioning the tickets table.
+    """
+
+    help = 'Rebuilds the tickets table hash partitioned by event, or back as a plain table.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the partitioning options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--partitions', type=int, default=16,
+                            help='Number of hash partitions.')
+        parser.add_argument('--undo', action='store_true',
+                            help='Rebuild the table without partitions.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to partition the tickets table of.')
+
+    def handle(self, *args, **options):
+        """
+        Rebuilds the table, unless it already has the requested partitions.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        connection = connections[options['database']]
+        partitions = 0 if options['undo'] else options['partitions']
+        if partitions < 0 or partitions == 1:
+            raise CommandError('Use at least 2 partitions.')
+        current = partition_count(connection)
+        if current == partitions:
+            self.stdout.write('The tickets table already has {} partitions.'.format(partitions)
+                              if partitions else "The tickets table isn't partitioned.")
+            return
+        try:
+            partition_tickets(connection, partitions)
+        except NotSupportedError as error:
+            raise CommandError(str(error))
+        if partitions:
+            self.stdout.write('Partitioned the tickets table into {} partitions by event.'.format(
+                partitions))
+        else:
+            self.stdout.write('Rebuilt the tickets table without partitions.')
@@ -0,0 +1,68 @@
+"""
+ Maintenance command for the event sales rollups.
+ Recounts every event's tickets and gross revenue from the tickets table, reports
+  the events whose rollup has drifted from it and rebuilds them.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ...models import Event, EventSales
+
+
+class Command(BaseCommand):
+    """
+     Management command for checking and rebuilding the sales rollups.
+    """
+
+    help = 'Checks the event sales rollups against the tickets and rebuilds the ones that drifted.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the rebuild options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift, exiting with an error if there is any.')
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild every event, not just the ones that drifted.')
+
+    def handle(self, *args, **options):
+        """
+        Compares the rollups with the recounted totals and rebuilds them.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        totals = EventSales.objects.totals()
+        rollups = {
+            sales.event_id: (sales.tickets_sold, sales.gross_revenue)
+            for sales in EventSales.objects.all()
+        }
+        empty = (0, 0)
+        drifted = sorted(
+            (event_id for event_id in set(totals) | set(rollups)
+             if totals.get(event_id, empty) != rollups.get(event_id, empty)),
+            key=str
+        )
+        for event_id in drifted:
+            self.stdout.write('{}: rollup {} tickets / {}, actual {} tickets / {}'.format(
+                event_id,
+                *(rollups.get(event_id, empty) + totals.get(event_id, empty))
+            ))
+        self.stdout.write('{} of {} events with sales drifted.'.format(
+            len(drifted), len(set(totals) | set(rollups))))
+
+        if options['check']:
+            if drifted:
+                raise CommandError('Sales rollups have drifted for {} events.'.format(len(drifted)))
+            return
+        event_ids = drifted
+        if options['all']:
+            event_ids = list(Event.objects.values_list('pk', flat=True))
+        rebuilt = 0
+        for event_id in event_ids:
+            EventSales.objects.rebuild(event_id)
+            rebuilt += 1
+        self.stdout.write('Rebuilt {} rollups.'.format(rebuilt))
@@ -0,0 +1,45 @@
+"""
+ Maintenance command for the name search indexes.
+ Recreates the search index of clients, events and customers and fills it from
+  their tables.  migrate puts back an index missing a part by itself, so this is for
+  tables changed behind Django's back, e.g. restored from a dump without the index.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from ...models import Client, Event, Customer
+from ...search import create_search_index
+
+
+class Command(BaseCommand):
+    """
+     Management command for rebuilding the name search indexes.
+    """
+
+    help = 'Recreates the name search indexes of clients, events and customers.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the rebuild options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to rebuild the indexes of.')
+
+    def handle(self, *args, **options):
+        """
+        Rebuilds the index of every searchable model.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        connection = connections[options['database']]
+        for model in (Client, Event, Customer):
+            if create_search_index(connection, model):
+                self.stdout.write('Rebuilt the {} search index.'.format(model._meta.verbose_name))
+            else:
+                self.stdout.write('No search index for {} on this database, searches use '
+                                  'name prefixes.'.format(model._meta.verbose_name_plural))
@@ -0,0 +1,68 @@
+"""
+ Concurrency stress test for ticket purchases.
+ Runs parallel workers buying tickets for a single event against the configured
+  database, then checks for oversells and reports the purchase throughput.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import benchmarks
+from ...models import Ticket
+from ...writes import purchase_queue
+
+
+class Command(BaseCommand):
+    """
+     Management command for the purchase stress test.
+    """
+
+    help = 'Runs parallel buyers against one event and checks that it never oversells.'
+
+    def add_arguments(self, parser):
+        """
+        Adds the stress test options.
+        :param parser: Standard management command argument parser.
+        :return: None
+        """
+
+        parser.add_argument('--workers', type=int, default=100,
+                            help='Number of concurrent buyers.')
+        parser.add_argument('--capacity', type=int, default=2000,
+                            help='Venue capacity of the event being bought out.')
+        parser.add_argument('--coalesce', action='store_true',
+                            help='Buy through the coalescing purchase queue.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated rows instead of deleting them.')
+
+    def handle(self, *args, **options):
+        """
+        Buys out an event with parallel workers and reports the results.
+        :param args: Standard management command args.
+        :param options: Parsed options.
+        :return: None
+        """
+
+        result = benchmarks.stress_purchases(
+            options['workers'],
+            options['capacity'],
+            purchase=purchase_queue.purchase if options['coalesce'] else None
+        )
+        event = result['event']
+        purchased = result['purchased']
+        sold = Ticket.objects.filter(event_id=event.id).count()
+        event.refresh_from_db()
+        oversold = max(0, sold - event.venue_capacity)
+
+        self.stdout.write('Workers:      {}'.format(options['workers']))
+        self.stdout.write('Capacity:     {}'.format(event.venue_capacity))
+        self.stdout.write('Purchased:    {}'.format(purchased))
+        self.stdout.write('Tickets:      {}'.format(sold))
+        self.stdout.write('Counter:      {}'.format(event.tickets_sold))
+        self.stdout.write('Oversold:     {}'.format(oversold))
+        self.stdout.write('Lock retries: {}'.format(result['retries']))
+        self.stdout.write('Throughput:   {:.1f} purchases/sec'.format(
+            purchased / result['elapsed']))
+
+        if not options['keep']:
+            benchmarks.clear_stress()
+        if oversold or sold != purchased or sold != event.tickets_sold:
+            raise CommandError('Ticket counts are inconsistent.')
@@ -0,0 +1,346 @@
+"""
+ Request instrumentation for the ticket API.
+ Keeps per-endpoint histograms of latency, SQL query count, database time,
+  serializer time and response size in process, along with request and response
+  cache counters, rendered in the Prometheus text format by the metrics view.
+ Numbers are per process, so scrape every process.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Methods kept as labels.  Any other method a client sends is counted as 'other',
+#  so made up methods can't add series without bound.
+HTTP_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+_local = threading.local()
+
+
+class Counter(object):
+    """
+     Prometheus-style counter, kept per label set.
+    """
+
+    def __init__(self, name, documentation, label_names=()):
+        """
+        :param name: Metric name.
+        :param documentation: HELP text.
+        :param label_names: Names of the labels, in order.
+        """
+
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        """
+        Adds to the count of a label set.
+        :param labels: Tuple of label values, in the order of label_names.
+        :param amount: Number to add.
+        :return: None
+        """
+
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        """
+        :param labels: Tuple of label values.
+        :return: Count of the label set.
+        """
+
+        with self.lock:
+            return self.series.get(labels, 0)
+
+    def render(self):
+        """
+        Renders the counter in the Prometheus text format.
+        :return: List of lines.
+        """
+
+        lines = [
+            '# HELP {} {}'.format(self.name, self.documentation),
+            '# TYPE {} counter'.format(self.name),
+        ]
+        with self.lock:
+            series = sorted(self.series.items())
+        for labels, count in series:
+            lines.append('{}{} {}'.format(
+                self.name, format_labels(self.label_names, labels), count))
+        return lines
+
+    def clear(self):
+        """
+        Forgets every observation.
+        :return: None
+        """
+
+        with self.lock:
+            self.series.clear()
+
+
+class Histogram(object):
+    """
+     Prometheus-style histogram with a fixed set of upper bounds, kept per label set.
+    """
+
+    def __init__(self, name, documentation, label_names, buckets):
+        """
+        :param name: Metric name.
+        :param documentation: HELP text.
+        :param label_names: Names of the labels, in order.
+        :param buckets: Sorted upper bounds of the buckets.
+        """
+
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """
+        Adds an observation.
+        :param labels: Tuple of label values, in the order of label_names.
+        :param value: Observed value.
+        :return: None
+        """
+
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """
+        Renders the histogram in the Prometheus text format.
+        :return: List of lines.
+        """
+
+        lines = [
+            '# HELP {} {}'.format(self.name, self.documentation),
+            '# TYPE {} histogram'.format(self.name),
+        ]
+        with self.lock:
+            series = sorted(self.series.items())
+            series = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in series
+            ]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, format_labels(self.label_names, labels, le=bound), cumulative))
+            lines.append('{}_sum{} {}'.format(
+                self.name, format_labels(self.label_names, labels), total))
+            lines.append('{}_count{} {}'.format(
+                self.name, format_labels(self.label_names, labels), count))
+        return lines
+
+    def clear(self):
+        """
+        Forgets every observation.
+        :return: None
+        """
+
+        with self.lock:
+            self.series.clear()
+
+
+def format_labels(label_names, labels, **extra):
+    """
+    Formats a label set, escaping the values.
+    :param label_names: Names of the labels, in order.
+    :param labels: Tuple of label values.
+    :param extra: Additional labels, e.g. le for bucket bounds.
+    :return: Label string including the braces, or an empty string without labels.
+    """
+
+    pairs = list(zip(label_names, labels)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    ) + '}'
+
+
+class RequestMetrics(object):
+    """
+     Measurements for the request being handled on the current thread.
+    """
+
+    def __init__(self, capture_sql=False):
+        """
+        :param capture_sql: True to keep the SQL of every query, for slow request logs.
+        """
+
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.capture_sql = capture_sql
+        self.statements = []
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting and timing the request's queries.
+        """
+
+        #pylint: disable=R0913,W0613
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            if self.capture_sql and len(self.statements) < 200:
+                self.statements.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'ms': round(elapsed * 1000, 3),
+                })
+
+
+@contextmanager
+def request_metrics(capture_sql=False):
+    """
+    Makes a RequestMetrics current for the thread while a request is handled.
+    :param capture_sql: True to keep the SQL of every query.
+    :return: Context manager yielding the RequestMetrics.
+    """
+
+    previous = getattr(_local, 'metrics', None)
+    _local.metrics = RequestMetrics(capture_sql)
+    try:
+        yield _local.metrics
+    finally:
+        _local.metrics = previous
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Times serialization for the current request, leaving out the database time of
+     any queries it triggers, e.g. lazy loads of relations that weren't prefetched.
+    Nested serializers count towards the outermost one only.
+    :return: Context manager.
+    """
+
+    metrics = getattr(_local, 'metrics', None)
+    if metrics is None or metrics.serializer_depth:
+        yield
+        return
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    db_time = metrics.db_time
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        metrics.serializer_time += time.perf_counter() - start - (metrics.db_time - db_time)
+
+
+class Registry(object):
+    """
+     The API's request metrics.
+    """
+
+    def __init__(self):
+        """
+        Sets up empty metrics.
+        """
+
+        labels = ('endpoint', 'action', 'embed')
+        self.counters = OrderedDict([
+            ('requests', Counter(
+                'tickets_http_requests_total', 'Requests handled.',
+                ('endpoint', 'action', 'method', 'status'))),
+        ])
+        self.histograms = OrderedDict([
+            ('duration', Histogram(
+                'tickets_http_request_duration_seconds', 'Request latency.', labels,
+                DURATION_BUCKETS)),
+            ('queries', Histogram(
+                'tickets_http_request_queries', 'SQL queries per request.', labels,
+                QUERY_BUCKETS)),
+            ('db_time', Histogram(
+                'tickets_http_request_db_seconds', 'Time spent in SQL queries per request.',
+                labels, DURATION_BUCKETS)),
+            ('serializer_time', Histogram(
+                'tickets_http_request_serializer_seconds',
+                'Time spent serializing per request, excluding queries.', labels,
+                DURATION_BUCKETS)),
+            ('size', Histogram(
+                'tickets_http_response_size_bytes', 'Response body size.', labels, SIZE_BUCKETS)),
+        ])
+
+    def observe(self, record):
+        """
+        Records a finished request.
+        :param record: Dict with the request's labels and measurements, as logged.
+        :return: None
+        """
+
+        labels = (record['endpoint'], record['action'], record['embed_fields'] or '')
+        method = record['method'] if record['method'] in HTTP_METHODS else 'other'
+        self.counters['requests'].inc(
+            (record['endpoint'], record['action'], method, str(record['status'])))
+        self.histograms['duration'].observe(labels, record['duration_ms'] / 1000)
+        self.histograms['queries'].observe(labels, record['queries'])
+        self.histograms['db_time'].observe(labels, record['db_ms'] / 1000)
+        self.histograms['serializer_time'].observe(labels, record['serializer_ms'] / 1000)
+        if record['response_bytes'] is not None:
+            self.histograms['size'].observe(labels, record['response_bytes'])
+
+    def register(self, name, counter):
+        """
+        Adds a counter kept by another part of the app, e.g. the response cache's hits.
+        :param name: Name to register the counter under.
+        :param counter: Counter.
+        :return: The counter.
+        """
+
+        self.counters[name] = counter
+        return counter
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text format.
+        :return: String.
+        """
+
+        lines = []
+        for metric in list(self.counters.values()) + list(self.histograms.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        """
+        Forgets every observation.
+        :return: None
+        """
+
+        for metric in list(self.counters.values()) + list(self.histograms.values()):
+            metric.clear()
+
+
+registry = Registry()
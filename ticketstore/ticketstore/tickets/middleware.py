@@ -0,0 +1,148 @@
+"""
+ Middleware for the tickets app.
+"""
+
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.db import connections
+from .metrics import registry, request_metrics
+from .routers import replica_reads
+from .serializers import embed_paths, parse_embeds
+
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware(object):
+    """
+     Lets safe requests read from the replicas, unless the client wrote something
+      within the last DATABASE_REPLICA_LAG seconds.
+     A request that writes sets a short-lived cookie pinning the client's following
+      requests to the primary, so they see the write before the replicas catch up.
+    """
+
+    def __init__(self, get_response):
+        """
+        :param get_response: Next middleware or view in the chain.
+        """
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """
+        Handles a request with replica reads enabled when it's safe to.
+        :param request: HttpRequest.
+        :return: HttpResponse.
+        """
+
+        pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+        with replica_reads(not pinned) as state:
+            response = self.get_response(request)
+            # Writes can also happen on other threads, e.g. the purchase queue's writer.
+            written = state.written or request.method not in SAFE_METHODS
+        if written and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'DATABASE_REPLICA_LAG', 5),
+                httponly=True
+            )
+        return response
+
+
+class MetricsMiddleware(object):
+    """
+     Records the endpoint, viewset action, field selection params, SQL query count,
+      database time, serializer time and response size of every request.
+     Each request is added to the metrics registry and logged as a JSON line to the
+      ticketstore.tickets.requests logger, at INFO.  Requests slower than
+      TICKETS_METRICS['SLOW_REQUEST_SECONDS'] are sampled at WARNING with their SQL.
+    """
+
+    logger = logging.getLogger('ticketstore.tickets.requests')
+
+    def __init__(self, get_response):
+        """
+        :param get_response: Next middleware or view in the chain.
+        """
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """
+        Handles a request with its queries counted and timed.
+        :param request: HttpRequest.
+        :return: HttpResponse.
+        """
+
+        config = getattr(settings, 'TICKETS_METRICS', {})
+        slow_seconds = config.get('SLOW_REQUEST_SECONDS')
+        sampled = slow_seconds is not None and random.random() < config.get('SLOW_SAMPLE_RATE', 1.0)
+        start = time.perf_counter()
+        with request_metrics(capture_sql=sampled) as metrics, ExitStack() as wrappers:
+            for connection in connections.all():
+                wrappers.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        record = self.build_record(request, response, metrics, duration)
+        registry.observe(record)
+        if sampled and duration >= slow_seconds:
+            self.logger.warning(json.dumps(dict(record, sql=metrics.statements)))
+        elif self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(json.dumps(record))
+        return response
+
+    @staticmethod
+    def build_record(request, response, metrics, duration):
+        """
+        Collects what's recorded about a request.
+        :param request: HttpRequest.
+        :param response: HttpResponse.
+        :param metrics: RequestMetrics of the request.
+        :param duration: Seconds the request took.
+        :return: Dict ready to be logged as JSON.
+        """
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.func if match else None
+        actions = getattr(view, 'actions', None) or {}
+        return {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': match.url_name or match.view_name if match else 'unmatched',
+            'action': actions.get(request.method.lower(), ''),
+            'status': response.status_code,
+            'include_fields': request.GET.get('include_fields'),
+            'exclude_fields': request.GET.get('exclude_fields'),
+            'embed_fields': embed_label(view, request.GET.get('embed_fields')),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 3),
+            'serializer_ms': round(metrics.serializer_time * 1000, 3),
+            'duration_ms': round(duration * 1000, 3),
+            'response_bytes': None if response.streaming else len(response.content),
+        }
+
+
+def embed_label(view, embed_param):
+    """
+    Normalizes the embed_fields param into a metric label, keeping only the paths the
+     viewset's serializer can embed so clients can't create unlimited label values.
+    :param view: View function the request was resolved to, or None.
+    :param embed_param: Raw embed_fields query param, or None.
+    :return: Sorted, comma-separated embed paths, or None.
+    """
+
+    serializer_class = getattr(getattr(view, 'cls', None), 'serializer_class', None)
+    if not embed_param or not hasattr(serializer_class, 'reverse_relations'):
+        return None
+    try:
+        embeds = parse_embeds(serializer_class, embed_param.split(','))
+    except SuspiciousOperation:
+        return None
+    return ','.join(embed_paths(embeds)) or None
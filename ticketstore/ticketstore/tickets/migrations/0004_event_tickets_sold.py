@@ -0,0 +1,35 @@
+# Generated by Django 2.1.3 on 2026-10-18 08:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_tickets_sold(apps, schema_editor):
+    """
+    Backfills the tickets_sold counter from the tickets that already exist.
+    """
+    Event = apps.get_model('tickets', 'Event')
+    Ticket = apps.get_model('tickets', 'Ticket')
+    sold = Ticket.objects.filter(event=OuterRef('pk')).order_by().values('event').annotate(
+        sold=Count('id')
+    ).values('sold')
+    Event.objects.using(schema_editor.connection.alias).update(
+        tickets_sold=Coalesce(Subquery(sold, output_field=models.IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='tickets_sold',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Tickets Sold'),
+        ),
+        migrations.RunPython(count_tickets_sold, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.1.3 on 2026-10-18 09:30
+
+from django.db import migrations, models
+import ticketstore.tickets.uuids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='id',
+            field=models.UUIDField(default=ticketstore.tickets.uuids.generate_id, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='id',
+            field=models.UUIDField(default=ticketstore.tickets.uuids.generate_id, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='id',
+            field=models.UUIDField(default=ticketstore.tickets.uuids.generate_id, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='id',
+            field=models.UUIDField(default=ticketstore.tickets.uuids.generate_id, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.1.3 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def rollup_event_sales(apps, schema_editor):
+    """
+    Backfills the sales rollups from the tickets that already exist.
+    """
+    EventSales = apps.get_model('tickets', 'EventSales')
+    Ticket = apps.get_model('tickets', 'Ticket')
+    alias = schema_editor.connection.alias
+    rows = Ticket.objects.using(alias).order_by().values('event_id').annotate(
+        sold=Count('id'), revenue=Sum('price')
+    )
+    EventSales.objects.using(alias).bulk_create([
+        EventSales(event_id=row['event_id'], tickets_sold=row['sold'], gross_revenue=row['revenue'])
+        for row in rows.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSales',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='tickets.Event')),
+                ('tickets_sold', models.IntegerField(default=0, verbose_name='Tickets Sold')),
+                ('gross_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Gross Revenue')),
+            ],
+        ),
+        migrations.RunPython(rollup_event_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.3 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_event_sales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['client', 'created_at', 'id'], name='event_client_created_idx'),
+        ),
+    ]
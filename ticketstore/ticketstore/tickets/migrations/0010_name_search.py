@@ -0,0 +1,34 @@
+# Generated by Django 2.1.3 on 2026-10-18 14:05
+
+from django.db import migrations
+from ticketstore.tickets import search
+
+
+SEARCHABLE_MODELS = ('Client', 'Event', 'Customer')
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Creates the name search indexes, filled from the existing rows.
+    """
+    for name in SEARCHABLE_MODELS:
+        search.create_search_index(schema_editor.connection, apps.get_model('tickets', name))
+
+
+def drop_search_indexes(apps, schema_editor):
+    """
+    Drops the name search indexes.
+    """
+    for name in SEARCHABLE_MODELS:
+        search.drop_search_index(schema_editor.connection, apps.get_model('tickets', name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_event_client_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.1.3 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_name_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Name')),
+                ('rows', models.BigIntegerField(default=0, verbose_name='Rows Read')),
+                ('loaded', models.BigIntegerField(default=0, verbose_name='Rows Loaded')),
+                ('rejected', models.BigIntegerField(default=0, verbose_name='Rows Rejected')),
+                ('finished', models.BooleanField(default=False, verbose_name='Finished')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+        ),
+    ]
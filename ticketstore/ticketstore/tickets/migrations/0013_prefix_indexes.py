@@ -0,0 +1,106 @@
+# Generated by Django 2.1.3 on 2026-10-18 10:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+from ticketstore.tickets import lookups
+
+
+PREFIX_SEARCHED_MODELS = ('Client', 'Event', 'Customer')
+
+
+# The (client|event|customer, created_at, id) indexes lead with these columns, so
+#  their own foreign key indexes are redundant.
+FOREIGN_KEYS = (('Event', 'client'), ('Ticket', 'customer'), ('Ticket', 'event'))
+
+
+def foreign_key_indexes(schema_editor, model, field_name):
+    """
+    Looks up the plain single column indexes of a foreign key.
+    :return: Names of the indexes.
+    """
+    column = model._meta.get_field(field_name).column
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(
+            cursor, model._meta.db_table)
+    return sorted(
+        name for name, constraint in constraints.items()
+        if constraint['index'] and constraint['columns'] == [column]
+        and not constraint['unique'] and not constraint['primary_key']
+    )
+
+
+def drop_foreign_key_indexes(apps, schema_editor):
+    """
+    Drops the redundant foreign key indexes.  Altering the fields would rebuild the
+     event and ticket tables on SQLite, which leaves the foreign keys of the tables
+     referencing them pointing at the renamed copy on Django 2.1.
+    """
+    for model_name, field_name in FOREIGN_KEYS:
+        model = apps.get_model('tickets', model_name)
+        for name in foreign_key_indexes(schema_editor, model, field_name):
+            schema_editor.execute('DROP INDEX {}'.format(schema_editor.quote_name(name)))
+
+
+def create_foreign_key_indexes(apps, schema_editor):
+    """
+    Puts back the foreign key indexes.
+    """
+    for model_name, field_name in FOREIGN_KEYS:
+        model = apps.get_model('tickets', model_name)
+        if foreign_key_indexes(schema_editor, model, field_name):
+            continue
+        column = model._meta.get_field(field_name).column
+        schema_editor.execute('CREATE INDEX {} ON {} ({})'.format(
+            schema_editor.quote_name('{}_{}_idx'.format(model._meta.db_table, column)),
+            schema_editor.quote_name(model._meta.db_table),
+            schema_editor.quote_name(column)
+        ))
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """
+    Creates the indexes serving name__prefix lookups on PostgreSQL.
+    """
+    for name in PREFIX_SEARCHED_MODELS:
+        lookups.create_prefix_index(schema_editor, apps.get_model('tickets', name), 'name')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    """
+    Drops the indexes serving name__prefix lookups.
+    """
+    for name in PREFIX_SEARCHED_MODELS:
+        lookups.drop_prefix_index(schema_editor, apps.get_model('tickets', name), 'name')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_change'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(drop_foreign_key_indexes, create_foreign_key_indexes),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='event',
+                    name='client',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='tickets.Client'),
+                ),
+                migrations.AlterField(
+                    model_name='ticket',
+                    name='customer',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='tickets.Customer'),
+                ),
+                migrations.AlterField(
+                    model_name='ticket',
+                    name='event',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='tickets.Event'),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
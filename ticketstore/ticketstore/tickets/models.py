@@ -2,67 +2,362 @@
  Models for the ticket app -- nothing really special here.
 """
 
-import uuid
-from django.db import models
+from collections import OrderedDict, defaultdict
+from decimal import Decimal
+from functools import partial
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import F, Sum
+from django.db.models.deletion import Collector
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from .lookups import PrefixLookup, WordSimilarLookup
+from .uuids import generate_id
 
-class Client(models.Model):
+models.CharField.register_lookup(PrefixLookup)
+models.CharField.register_lookup(WordSimilarLookup)
+
+# Sent with event_ids when seats are reserved or released.  Reservations update the
+#  tickets_sold counters with a queryset update, which doesn't send post_save.
+seats_changed = Signal()
+
+# Sent once a transaction that recorded changes in the outbox has committed.
+changes_committed = Signal()
+
+# Sent with pks once per model by every delete of change tracked objects, including
+#  the ones removed by cascades.  Tickets removed by a cascade don't send post_delete,
+#  as they're deleted without being loaded.
+objects_deleted = Signal()
+
+
+class SoldOutError(Exception):
+    """
+    Raised when an event doesn't have enough capacity left for a ticket purchase.
+    """
+
+
+class ChangeTrackedQuerySet(models.QuerySet):
+    """
+    QuerySet for change tracked models, deleting through a ChangeCollector.
+    """
+
+    def delete(self):
+        """
+        Deletes the objects and everything that cascades from them, as Django's
+         delete does, with the bookkeeping done once for the whole delete.
+        :return: Tuple of the number of objects deleted and a dict of the number
+         deleted of each model.
+        """
+
+        assert self.query.can_filter(), "Cannot use 'limit' or 'offset' with delete."
+        if self._fields is not None:
+            raise TypeError('Cannot call delete() after .values() or .values_list()')
+        del_query = self._chain()
+        del_query._for_write = True
+        del_query.query.select_for_update = False
+        del_query.query.select_related = False
+        del_query.query.clear_ordering(force_empty=True)
+        collector = ChangeCollector(using=del_query.db)
+        collector.collect(del_query)
+        deleted = collector.delete()
+        self._result_cache = None
+        return deleted
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def delete_untracked(self):
+        """
+        Deletes the objects with Django's own collector, leaving seat counters, sales
+         rollups and the change outbox alone, e.g. for rows bulk inserted around them.
+        :return: Same as delete().
+        """
+
+        return super(ChangeTrackedQuerySet, self).delete()
+    delete_untracked.alters_data = True
+    delete_untracked.queryset_only = True
+
+
+class ChangeTrackedManager(models.Manager.from_queryset(ChangeTrackedQuerySet)):
+    """
+    Manager for change tracked models.
+    """
+
+
+class ChangeTrackedModel(models.Model):
+    """
+    Abstract model that records every save in the change outbox, in the same
+     transaction as the save.  Deletes, including the objects removed by cascades,
+     are recorded by the ChangeCollector.
+    """
+
+    class Meta:
+        """
+        Meta class for change tracked models
+        """
+
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the object and records its creation or update.
+        """
+
+        action = Change.CREATE if self._state.adding else Change.UPDATE
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super(ChangeTrackedModel, self).save(*args, **kwargs)
+            Change.objects.db_manager(kwargs.get('using')).record(type(self), [self.pk], action)
+
+    def delete(self, using=None, keep_parents=False):
+        """
+        Deletes the object and everything that cascades from it through a ChangeCollector.
+        """
+
+        using = using or router.db_for_write(type(self), instance=self)
+        assert self.pk is not None, "{} object can't be deleted because its {} attribute " \
+            "is set to None.".format(self._meta.object_name, self._meta.pk.attname)
+        collector = ChangeCollector(using=using)
+        collector.collect([self], keep_parents=keep_parents)
+        return collector.delete()
+    delete.alters_data = True
+
+
+class Client(ChangeTrackedModel):
     """
     Model used to represent organizations putting on events.
     """
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=generate_id, editable=False)
     name = models.CharField('Name', max_length=512, null=False, blank=False)
+    created_at = models.DateTimeField('Created At', auto_now_add=True)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    objects = ChangeTrackedManager()
+
+    class Meta:
+        """
+        Meta class for the client model
+        """
+
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='client_created_at_id_idx'),
+            models.Index(fields=['name'], name='client_name_idx'),
+        ]
 
     def __str__(self):
         """ String representation of client, mostly for Django admin """
         return self.name
 
 
-class Event(models.Model):
+class EventManager(ChangeTrackedManager):
+    """
+    Manager for events that keeps the tickets_sold counter in step with capacity.
+    """
+
+    def reserve_tickets(self, event_id, quantity=1):
+        """
+        Reserves seats for an event with a single conditional UPDATE, so concurrent
+         buyers can't oversell the event and nothing has to be locked or counted.
+        :param event_id: ID of the event to reserve seats at.
+        :param quantity: Number of seats to reserve.
+        :return: True if the seats were reserved, False if there weren't enough left.
+        """
+
+        reserved = bool(self.filter(
+            pk=event_id,
+            tickets_sold__lte=F('venue_capacity') - quantity
+        ).update(tickets_sold=F('tickets_sold') + quantity, updated_at=timezone.now()))
+        if reserved:
+            seats_changed.send(sender=self.model, event_ids=[event_id])
+        return reserved
+
+    def release_tickets(self, event_id, quantity=1):
+        """
+        Gives seats back to an event, e.g. when a ticket moves to another event.
+        :param event_id: ID of the event to release seats at.
+        :param quantity: Number of seats to release.
+        :return: None
+        """
+
+        self.release_seats({event_id: quantity})
+
+    def release_seats(self, quantities):
+        """
+        Gives seats back to several events with an UPDATE per event, e.g. when their
+         tickets are deleted.
+        :param quantities: Dict of the number of seats to release by event ID.
+        :return: None
+        """
+
+        if not quantities:
+            return
+        now = timezone.now()
+        event_ids = sorted(quantities, key=str)
+        for event_id in event_ids:
+            self.filter(pk=event_id).update(
+                tickets_sold=F('tickets_sold') - quantities[event_id],
+                updated_at=now
+            )
+        seats_changed.send(sender=self.model, event_ids=event_ids)
+
+
+class Event(ChangeTrackedModel):
     """
     Model used to represent events.
     """
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=generate_id, editable=False)
     name = models.CharField('Name', max_length=512, null=False, blank=False)
     venue_capacity = models.PositiveSmallIntegerField('Venue Capacity')
+    tickets_sold = models.PositiveIntegerField('Tickets Sold', default=0, editable=False)
     client = models.ForeignKey(
         Client,
         on_delete=models.CASCADE,
         null=False,
         blank=False,
+        db_index=False,
         related_name='events'
     )
+    created_at = models.DateTimeField('Created At', auto_now_add=True)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    objects = EventManager()
+
+    class Meta:
+        """
+        Meta class for the event model
+        """
+
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='event_created_at_id_idx'),
+            models.Index(fields=['client', 'created_at', 'id'], name='event_client_created_idx'),
+            models.Index(fields=['name'], name='event_name_idx'),
+        ]
 
     def __str__(self):
         """ String representation of event, mostly for Django admin """
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the event without writing back its tickets_sold counter, which only
+         changes through seat reservations and may have moved since it was loaded.
+        """
+
+        if not self._state.adding and kwargs.get('update_fields') is None and \
+                not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'tickets_sold'
+            ]
+        super(Event, self).save(*args, **kwargs)
 
-class Customer(models.Model):
+
+class Customer(ChangeTrackedModel):
     """
     Model used to represent customers who have purchased event tickets.
     """
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=generate_id, editable=False)
     name = models.CharField('Name', max_length=512, null=False, blank=False)
+    created_at = models.DateTimeField('Created At', auto_now_add=True)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    objects = ChangeTrackedManager()
+
+    class Meta:
+        """
+        Meta class for the customer model
+        """
+
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='customer_created_at_id_idx'),
+            models.Index(fields=['name'], name='customer_name_idx'),
+        ]
 
     def __str__(self):
         """ String representation of customer, mostly for Django admin """
         return self.name
 
-class Ticket(models.Model):
+class TicketManager(ChangeTrackedManager):
+    """
+    Manager for tickets that issues them against their event's capacity.
+    """
+
+    def purchase(self, event_id, customer_id, price=0, quantity=1):
+        """
+        Purchases tickets for a customer, reserving the seats and inserting the
+         tickets in the same transaction.
+        :param event_id: ID of the event the tickets are for.
+        :param customer_id: ID of the customer buying the tickets.
+        :param price: Price of each ticket.
+        :param quantity: Number of tickets to buy.
+        :return: List of the new tickets.
+        """
+
+        with transaction.atomic(using=self.db):
+            if not Event.objects.reserve_tickets(event_id, quantity):
+                raise SoldOutError('Not enough tickets left for event {}.'.format(event_id))
+            tickets = self.bulk_create([
+                self.model(event_id=event_id, customer_id=customer_id, price=price)
+                for _ in range(quantity)
+            ])
+            Change.objects.record(self.model, [ticket.pk for ticket in tickets], Change.CREATE)
+            EventSales.objects.record(event_id, quantity, Decimal(str(price)) * quantity)
+        return tickets
+
+    def bulk_issue(self, tickets, batch_size=None, insert=None):
+        """
+        Issues a batch of unsaved tickets, reserving seats for each event's share of
+         the batch with one conditional update and inserting them with bulk_create.
+        An event without room for its whole share gets none of its tickets issued.
+        :param tickets: Unsaved Ticket instances.
+        :param batch_size: Number of rows per INSERT, or None for a single INSERT.
+        :param insert: Optional callable taking the tickets to insert in place of
+         bulk_create, e.g. with a COPY.
+        :return: Tuple of the issued tickets and the set of sold out event IDs.
+        """
+
+        if batch_size:
+            # Older Django versions don't cap the batch size at the backend's limit.
+            batch_size = min(batch_size, connections[self.db].ops.bulk_batch_size(
+                self.model._meta.concrete_fields, tickets) or batch_size)
+        by_event = defaultdict(list)
+        for ticket in tickets:
+            by_event[ticket.event_id].append(ticket)
+        with transaction.atomic(using=self.db):
+            # Reserving in a fixed order keeps concurrent batches from deadlocking.
+            sold_out = set(
+                event_id for event_id in sorted(by_event, key=str)
+                if not Event.objects.reserve_tickets(event_id, len(by_event[event_id]))
+            )
+            issued = [ticket for ticket in tickets if ticket.event_id not in sold_out]
+            if insert:
+                insert(issued)
+            else:
+                self.bulk_create(issued, batch_size=batch_size)
+            Change.objects.record(self.model, [ticket.pk for ticket in issued], Change.CREATE)
+            for event_id in sorted(set(by_event) - sold_out, key=str):
+                EventSales.objects.record(
+                    event_id,
+                    len(by_event[event_id]),
+                    sum(Decimal(str(ticket.price)) for ticket in by_event[event_id])
+                )
+        return issued, sold_out
+
+
+class Ticket(ChangeTrackedModel):
     """
     Model used to represent event tickets.
     """
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=generate_id, editable=False)
     price = models.DecimalField(max_digits=6, decimal_places=2, default=0.0)
     event = models.ForeignKey(
         Event,
         on_delete=models.CASCADE,
         null=False,
         blank=False,
+        db_index=False,
         related_name='tickets'
     )
     customer = models.ForeignKey(
@@ -70,9 +365,343 @@ class Ticket(models.Model):
         on_delete=models.CASCADE,
         null=False,
         blank=False,
+        db_index=False,
         related_name='tickets'
     )
+    created_at = models.DateTimeField('Created At', auto_now_add=True)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    objects = TicketManager()
+
+    class Meta:
+        """
+        Meta class for the ticket model
+        """
+
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='ticket_created_at_id_idx'),
+            models.Index(fields=['event', 'created_at', 'id'], name='ticket_event_created_idx'),
+            models.Index(fields=['customer', 'created_at', 'id'],
+                         name='ticket_customer_created_idx'),
+            models.Index(fields=['event', 'price'], name='ticket_event_price_idx'),
+        ]
 
     def __str__(self):
         """ String representation of ticket, mostly for Django admin """
         return "{}: {}".format(self.event.name, self.customer.name)
+
+    def save(self, *args, **kwargs):
+        """
+        Reserves a seat at the event when a new ticket is saved, or moved to another
+         event, so every way of placing a single ticket respects the venue capacity.
+        Keeps the event sales rollups in step with new tickets and price changes.
+        :raises SoldOutError: If the ticket's event has no seats left.
+        """
+
+        with transaction.atomic(using=kwargs.get('using')):
+            if not self._state.adding:
+                previous = Ticket.objects.select_for_update().filter(
+                    pk=self.pk).values('event_id', 'price').first()
+                if previous and previous['event_id'] != self.event_id:
+                    if not Event.objects.reserve_tickets(self.event_id):
+                        raise SoldOutError(
+                            'Not enough tickets left for event {}.'.format(self.event_id))
+                    Event.objects.release_tickets(previous['event_id'])
+                super(Ticket, self).save(*args, **kwargs)
+                price = Decimal(str(self.price))
+                if previous and (previous['event_id'], previous['price']) != (self.event_id, price):
+                    EventSales.objects.record(previous['event_id'], -1, -previous['price'])
+                    EventSales.objects.record(self.event_id, 1, price)
+                return
+            if not Event.objects.reserve_tickets(self.event_id):
+                raise SoldOutError('Not enough tickets left for event {}.'.format(self.event_id))
+            super(Ticket, self).save(*args, **kwargs)
+            EventSales.objects.record(self.event_id, 1, Decimal(str(self.price)))
+
+
+@receiver(post_save, sender=Event)
+def create_event_sales(sender, instance, created, **kwargs):
+    """
+    Starts an empty sales rollup for a new event, so recording its sales is always a
+     plain UPDATE.  Events inserted with bulk_create get theirs on their first sale.
+    """
+
+    #pylint: disable=W0613
+    if created and not kwargs.get('raw'):
+        EventSales.objects.using(kwargs.get('using')).create(event_id=instance.pk)
+
+
+class EventSalesManager(models.Manager):
+    """
+    Manager for the event sales rollups, which are updated with increments instead
+     of being recounted from the tickets.
+    """
+
+    def record(self, event_id, tickets, revenue):
+        """
+        Adds tickets and revenue to an event's rollup, creating it on the first sale.
+        Should run in the same transaction as the ticket changes it records.
+        :param event_id: ID of the event the tickets are for.
+        :param tickets: Change in the number of tickets sold, negative for removals.
+        :param revenue: Change in gross revenue, negative for removals.
+        :return: None
+        """
+
+        increments = {
+            'tickets_sold': F('tickets_sold') + tickets,
+            'gross_revenue': F('gross_revenue') + revenue,
+        }
+        if self.filter(event_id=event_id).update(**increments) or tickets <= 0:
+            # Removals have nothing to take away from a missing rollup, and the
+            #  event may be in the middle of being deleted along with its tickets.
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(event_id=event_id, tickets_sold=tickets, gross_revenue=revenue)
+        except IntegrityError:
+            # Another transaction created the row first, or the event is gone.
+            self.filter(event_id=event_id).update(**increments)
+
+    def totals(self):
+        """
+        Recounts every event's tickets and gross revenue from the tickets table.
+        :return: Dict of (tickets_sold, gross_revenue) tuples by event ID.
+        """
+
+        rows = Ticket.objects.using(self.db).order_by().values('event_id').annotate(
+            sold=models.Count('id'), revenue=Sum('price')
+        )
+        return {row['event_id']: (row['sold'], row['revenue']) for row in rows}
+
+    def rebuild(self, event_id):
+        """
+        Recounts one event's rollup from its tickets.
+        The rollup row stays locked while the tickets are counted, so sales recorded
+         concurrently are either counted or applied on top of the new totals.
+        :param event_id: ID of the event to rebuild.
+        :return: EventSales
+        """
+
+        with transaction.atomic(using=self.db):
+            list(self.select_for_update().filter(event_id=event_id))
+            totals = Ticket.objects.using(self.db).filter(event_id=event_id).aggregate(
+                sold=models.Count('id'), revenue=Sum('price')
+            )
+            sales, _ = self.update_or_create(event_id=event_id, defaults={
+                'tickets_sold': totals['sold'],
+                'gross_revenue': totals['revenue'] or 0,
+            })
+        return sales
+
+
+class EventSales(models.Model):
+    """
+    Model used to keep a running total of each event's ticket sales, so the stats
+     endpoints don't have to aggregate the tickets table on every request.
+    Maintained by the ticket write paths and deletes; queryset updates and
+     delete_untracked() bypass them and need a rebuild_sales_rollups afterwards.
+    """
+
+    event = models.OneToOneField(
+        Event,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales'
+    )
+    tickets_sold = models.IntegerField('Tickets Sold', default=0)
+    gross_revenue = models.DecimalField('Gross Revenue', max_digits=14, decimal_places=2, default=0)
+
+    objects = EventSalesManager()
+
+    def __str__(self):
+        """ String representation of event sales, mostly for Django admin """
+        return "{}: {}".format(self.event_id, self.tickets_sold)
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Model used to record how far an import_tickets run has got through its input.
+    Updated in the same transaction as each chunk of rows it loads, so a run that
+     fails resumes right after the last chunk that was committed.
+    """
+
+    name = models.CharField('Name', max_length=255, primary_key=True)
+    rows = models.BigIntegerField('Rows Read', default=0)
+    loaded = models.BigIntegerField('Rows Loaded', default=0)
+    rejected = models.BigIntegerField('Rows Rejected', default=0)
+    finished = models.BooleanField('Finished', default=False)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    def __str__(self):
+        """ String representation of an import checkpoint, mostly for Django admin """
+        return "{}: {} rows".format(self.name, self.rows)
+
+
+class ChangeManager(models.Manager):
+    """
+    Manager for the change outbox.
+    """
+
+    def record(self, model, pks, action):
+        """
+        Adds changes of one model to the outbox.
+        :param model: Model class of the objects that changed.
+        :param pks: Primary keys of the objects that changed.
+        :param action: Change.CREATE, Change.UPDATE or Change.DELETE.
+        :return: None
+        """
+
+        self.record_many((model, pk, action) for pk in pks)
+
+    def record_many(self, changes):
+        """
+        Adds changes to the outbox with a single INSERT.
+        Should run in the same transaction as the writes it records, so a change is
+         committed, or rolled back, together with its write.
+        On PostgreSQL each change notes the ID of its transaction, so the change feed
+         can leave out transactions that haven't committed yet.
+        :param changes: Iterable of (model class, primary key, action) tuples, where
+         the action is Change.CREATE, Change.UPDATE or Change.DELETE.
+        :return: None
+        """
+
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        meta = self.model._meta
+        object_id = meta.get_field('object_id')
+        created_at = meta.get_field('created_at').get_db_prep_value(timezone.now(), connection)
+        rows = [
+            (model._meta.model_name, object_id.get_db_prep_value(pk, connection), action,
+             created_at)
+            for model, pk, action in changes
+        ]
+        if not rows:
+            return
+        quote = connection.ops.quote_name
+        # A single prepared INSERT rather than bulk_create, since every purchase
+        #  records its tickets and its event.
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO {} ({}) VALUES ({}, %s, %s, %s, %s)'.format(
+                    quote(meta.db_table),
+                    ', '.join(quote(column) for column in (
+                        'txid', 'resource', 'object_id', 'action', 'created_at')),
+                    'txid_current()' if connection.vendor == 'postgresql' else '0'
+                ),
+                rows
+            )
+        transaction.on_commit(partial(changes_committed.send, sender=self.model), using=using)
+
+
+class Change(models.Model):
+    """
+    Model used as a transactional outbox of creates, updates and deletes of clients,
+     events, customers and tickets, read by the /api/changes feed.
+    Recorded by the model saves, the ticket purchase and bulk paths, seat
+     reservations and deletes; queryset updates and delete_untracked() aren't
+     recorded.
+    """
+
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = ((CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete'))
+
+    id = models.BigAutoField(primary_key=True)
+    txid = models.BigIntegerField('Transaction ID', default=0)
+    resource = models.CharField('Resource', max_length=32)
+    object_id = models.UUIDField('Object ID')
+    action = models.CharField('Action', max_length=6, choices=ACTIONS)
+    created_at = models.DateTimeField('Created At', auto_now_add=True)
+
+    objects = ChangeManager()
+
+    class Meta:
+        """
+        Meta class for the change model
+        """
+
+        indexes = [
+            models.Index(fields=['txid', 'id'], name='change_txid_id_idx'),
+        ]
+
+    def __str__(self):
+        """ String representation of a change, mostly for Django admin """
+        return "{} {} {}".format(self.action, self.resource, self.object_id)
+
+
+class ChangeCollector(Collector):
+    """
+    Deletion collector that does the bookkeeping of a delete once for everything it
+     removes, in the delete's transaction: the seats of deleted tickets are given
+     back and taken out of the sales rollups with one update of each per event, and
+     every deleted object is recorded in the change outbox with a single insert.
+    Tickets have no delete receivers, so cascades remove them with one DELETE per
+     batch, reading only their keys, events and prices beforehand.
+    """
+
+    def delete(self):
+        """
+        Does the bookkeeping, deletes the collected objects and sends objects_deleted.
+        :return: Tuple of the number of objects deleted and a dict of the number
+         deleted of each model.
+        """
+
+        with transaction.atomic(using=self.using, savepoint=False):
+            deleted, tickets = self.tracked_objects()
+            seats = defaultdict(int)
+            revenue = defaultdict(Decimal)
+            for event_id, price in tickets:
+                seats[event_id] += 1
+                revenue[event_id] += Decimal(str(price))
+            # Events deleted along with their tickets have nothing left to update.
+            for event_id in deleted.get(Event, ()):
+                seats.pop(event_id, None)
+            Event.objects.db_manager(self.using).release_seats(seats)
+            for event_id in sorted(seats, key=str):
+                EventSales.objects.db_manager(self.using).record(
+                    event_id, -seats[event_id], -revenue[event_id])
+            Change.objects.db_manager(self.using).record_many(
+                (model, pk, Change.DELETE) for model, pks in deleted.items() for pk in pks
+            )
+            result = super(ChangeCollector, self).delete()
+            for model, pks in deleted.items():
+                objects_deleted.send(sender=model, pks=pks, using=self.using)
+        return result
+
+    def tracked_objects(self):
+        """
+        Lists the change tracked objects about to be deleted, reading the keys of the
+         ones that are going to be deleted without being loaded.
+        :return: Tuple of an OrderedDict of primary keys by model, and a list of the
+         (event_id, price) of every deleted ticket.
+        """
+
+        deleted = OrderedDict()
+        tickets = []
+        for model, instances in self.data.items():
+            if issubclass(model, ChangeTrackedModel):
+                deleted.setdefault(model, []).extend(obj.pk for obj in instances)
+                if model is Ticket:
+                    tickets.extend((obj.event_id, obj.price) for obj in instances)
+        for queryset in self.fast_deletes:
+            model = queryset.model
+            if model is Ticket:
+                rows = list(queryset.values_list('pk', 'event_id', 'price'))
+                deleted.setdefault(model, []).extend(pk for pk, _, _ in rows)
+                tickets.extend((event_id, price) for _, event_id, price in rows)
+            elif issubclass(model, ChangeTrackedModel):
+                deleted.setdefault(model, []).extend(queryset.values_list('pk', flat=True))
+        return deleted, tickets
+
+
+@receiver(seats_changed, sender=Event)
+def record_seat_changes(sender, event_ids, **kwargs):
+    """
+    Records seat reservations and releases as updates of the events, whose
+     tickets_sold counters they change without saving the events.
+    """
+
+    #pylint: disable=W0613
+    Change.objects.record(Event, event_ids, Change.UPDATE)
+
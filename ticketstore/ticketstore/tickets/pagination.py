@@ -0,0 +1,255 @@
+"""
+ Keyset cursor pagination for the ticket app's list endpoints.
+ Pages are positioned with an opaque cursor holding the (created_at, id) of the
+  row on the edge of the previous page, so every page is a bounded index range scan
+  instead of an OFFSET scan.
+"""
+
+import uuid
+from base64 import b64decode, b64encode
+from collections import OrderedDict, namedtuple
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+Cursor = namedtuple('Cursor', ['created_at', 'pk', 'reverse'])
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+     Cursor pagination over the (created_at, id) sort key.
+     Rows are sorted by created_at, with the id breaking ties between rows created
+      in the same instant.  New ids are time-ordered UUIDs, but rows created before
+      they were introduced have random ones, so the id alone isn't a creation order.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        """
+        Initializes the per-request pagination state.
+        """
+
+        self.base_url = None
+        self.cursor = None
+        self.has_next = False
+        self.has_previous = False
+        self.page = []
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns one page of the queryset, starting after the position in the cursor.
+        Fetches a single extra row to find out whether there's another page.
+        :param queryset: QuerySet to paginate.
+        :param request: Request object from django rest framework.
+        :param view: View being paginated.  Unused.
+        :return: List of the rows on the page.
+        """
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+
+        sort_field, tie_field = self.ordering
+        if reverse:
+            queryset = queryset.order_by('-' + sort_field, '-' + tie_field)
+        else:
+            queryset = queryset.order_by(sort_field, tie_field)
+
+        if self.cursor:
+            # Written as a range on the leading column so the composite index is used
+            #  for the scan and the tie-break only applies to rows in the same instant.
+            bound, seen = ('lte', 'gte') if reverse else ('gte', 'lte')
+            queryset = queryset.filter(**{
+                '{}__{}'.format(sort_field, bound): self.cursor.created_at
+            }).exclude(**{
+                sort_field: self.cursor.created_at,
+                '{}__{}'.format(tie_field, seen): self.cursor.pk,
+            })
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        """
+        Reads the client's requested page size, capped at max_page_size.
+        :param request: Request object from django rest framework.
+        :return: Page size to use for this request.
+        """
+
+        requested = request.query_params.get(self.page_size_query_param)
+        if requested:
+            try:
+                value = int(requested)
+            except ValueError:
+                value = 0
+            if value > 0:
+                return min(value, self.max_page_size)
+        return self.page_size
+
+    def get_paginated_response(self, data):
+        """
+        Wraps the serialized page with the links to the neighbouring pages.
+        :param data: Serialized page.
+        :return: Response object.
+        """
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        """
+        :return: URL of the next page, or None on the last page.
+        """
+
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """
+        :return: URL of the previous page, or None on the first page.
+        """
+
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        """
+        Builds the URL for the page on the far side of the given row.
+        :param row: Model instance, or .values() dict, on the edge of the current page.
+        :param reverse: Whether the cursor walks backwards.
+        :return: URL with the opaque cursor param set.
+        """
+
+        sort_field, tie_field = self.ordering
+        if isinstance(row, dict):
+            sort_value, tie_value = row[sort_field], row[tie_field]
+        else:
+            sort_value, tie_value = getattr(row, sort_field), getattr(row, tie_field)
+        raw = '|'.join([
+            sort_value.isoformat(),
+            str(tie_value),
+            '1' if reverse else '0',
+        ])
+        encoded = b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """
+        Decodes the opaque cursor param on the request.
+        :param request: Request object from django rest framework.
+        :return: Cursor, or None if the request is for the first page.
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk, reverse = b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            created_at = parse_datetime(created_at)
+            pk = uuid.UUID(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None or reverse not in ('0', '1'):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(created_at=created_at, pk=pk, reverse=reverse == '1')
+
+
+class SearchPagination(KeysetCursorPagination):
+    """
+     Offset pagination for ranked search results, which have no stable sort key to
+      put a cursor on.
+     Pages are fetched with LIMIT/OFFSET and one extra row, without counting the
+      matches, and offsets are capped at max_offset since every match before the page
+      has to be ranked to skip it.
+    """
+
+    offset_query_param = 'offset'
+    max_page_size = 100
+    max_offset = 1000
+    invalid_offset_message = 'Invalid offset'
+
+    def __init__(self):
+        """
+        Initializes the per-request pagination state.
+        """
+
+        super(SearchPagination, self).__init__()
+        self.limit = self.page_size
+        self.offset = 0
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns one page of the already ordered queryset.
+        :param queryset: Ordered QuerySet to paginate.
+        :param request: Request object from django rest framework.
+        :param view: View being paginated.  Unused.
+        :return: List of the rows on the page.
+        """
+
+        self.limit = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        try:
+            self.offset = int(request.query_params.get(self.offset_query_param, 0))
+        except ValueError:
+            raise NotFound(self.invalid_offset_message)
+        if not 0 <= self.offset <= self.max_offset:
+            raise NotFound(self.invalid_offset_message)
+
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit and self.offset + self.limit <= self.max_offset
+        self.has_previous = self.offset > 0
+        self.page = rows[:self.limit]
+        return self.page
+
+    def get_next_link(self):
+        """
+        :return: URL of the next page, or None on the last page.
+        """
+
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.base_url, self.offset_query_param, self.offset + self.limit)
+
+    def get_previous_link(self):
+        """
+        :return: URL of the previous page, or None on the first page.
+        """
+
+        if not self.has_previous:
+            return None
+        offset = max(self.offset - self.limit, 0)
+        if not offset:
+            return remove_query_param(self.base_url, self.offset_query_param)
+        return replace_query_param(self.base_url, self.offset_query_param, offset)
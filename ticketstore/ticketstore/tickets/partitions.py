@@ -0,0 +1,167 @@
+"""
+ Optional hash partitioning of the tickets table by event, on PostgreSQL 11 and up.
+ Every ticket query that filters on an event, like the event's ticket list, stats
+  and cascades, is pruned to the one partition holding the event, so its index
+  scans and the index maintenance of new tickets only touch that partition.
+ PostgreSQL routes rows and prunes partitions by itself, so the ORM and migrations
+  carry on using the tickets table as before.  The primary key becomes (id,
+  event_id), as a partitioned table's keys have to include the partition key, and
+  lookups by ticket ID alone check every partition's primary key index.
+ The table is rebuilt in a single transaction that locks it throughout, keeping the
+  names of its indexes and constraints so later migrations still find them.
+"""
+
+from django.db import NotSupportedError, transaction
+from .models import Ticket
+
+
+PARTITION_TABLE = '{}_p{}'
+OLD_TABLE = '{}_old'
+
+
+def supports_partitioning(connection):
+    """
+    Checks whether a database can hash partition tables.
+    :param connection: Database connection.
+    :return: True on PostgreSQL 11 and up.
+    """
+
+    return connection.vendor == 'postgresql' and connection.pg_version >= 110000
+
+
+def partition_count(connection, model=Ticket):
+    """
+    Counts the partitions of a model's table.
+    :param connection: Database connection.
+    :param model: Model whose table to look at.
+    :return: Number of partitions, 0 if the table isn't partitioned.
+    """
+
+    if not supports_partitioning(connection):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COUNT(*) FROM pg_inherits WHERE inhparent = %s::regclass',
+            [model._meta.db_table]
+        )
+        return cursor.fetchone()[0]
+
+
+def table_definition(cursor, table):
+    """
+    Reads the indexes and constraints of a table.  Indexes backing a constraint,
+     like the primary key's, come with the constraint.
+    :param cursor: Database cursor.
+    :param table: Name of the table.
+    :return: Tuple of the primary key's name, a list of (name, CREATE INDEX
+     statement) tuples and a list of (name, constraint definition) tuples.
+    """
+
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+        [table]
+    )
+    primary_key = cursor.fetchone()[0]
+    cursor.execute(
+        'SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index '
+        'JOIN pg_class i ON i.oid = pg_index.indexrelid '
+        'WHERE pg_index.indrelid = %s::regclass AND NOT EXISTS ('
+        'SELECT 1 FROM pg_constraint WHERE pg_constraint.conindid = i.oid'
+        ') ORDER BY i.relname',
+        [table]
+    )
+    # Indexes of partitioned tables are defined ON ONLY the parent.
+    indexes = [(name, sql.replace(' ON ONLY ', ' ON ')) for name, sql in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('c', 'f') ORDER BY conname",
+        [table]
+    )
+    return primary_key, indexes, cursor.fetchall()
+
+
+def rebuild_statements(connection, model, definition, partitions):
+    """
+    Lists the statements rebuilding a table with or without partitions.
+    The old table is renamed out of the way and stripped of its indexes and
+     constraints, so the new one can take their names, and its rows are copied
+     over before the new indexes are built.
+    :param connection: Database connection.
+    :param model: Model whose table to rebuild.
+    :param definition: Tuple from table_definition.
+    :param partitions: Number of hash partitions, or 0 for a plain table.
+    :return: List of SQL statements.
+    """
+
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    old = OLD_TABLE.format(table)
+    primary_key, indexes, constraints = definition
+    key_columns = [model._meta.pk.column]
+    partition_by = ''
+    if partitions:
+        key_column = model._meta.get_field('event').column
+        key_columns.append(key_column)
+        partition_by = ' PARTITION BY HASH ({})'.format(quote(key_column))
+
+    statements = ['ALTER TABLE {} RENAME TO {}'.format(quote(table), quote(old))]
+    statements.extend('DROP INDEX {}'.format(quote(name)) for name, _ in indexes)
+    statements.extend(
+        'ALTER TABLE {} DROP CONSTRAINT {}'.format(quote(old), quote(name))
+        for name in [primary_key] + [name for name, _ in constraints]
+    )
+    statements.append('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS){}'.format(
+        quote(table), quote(old), partition_by))
+    statements.extend(
+        'CREATE TABLE {} PARTITION OF {} FOR VALUES WITH (MODULUS {}, REMAINDER {})'.format(
+            quote(PARTITION_TABLE.format(table, remainder)), quote(table), partitions, remainder)
+        for remainder in range(partitions)
+    )
+    statements.extend([
+        'INSERT INTO {} SELECT * FROM {}'.format(quote(table), quote(old)),
+        'DROP TABLE {}'.format(quote(old)),
+        'ALTER TABLE {} ADD CONSTRAINT {} PRIMARY KEY ({})'.format(
+            quote(table), quote(primary_key), ', '.join(quote(column) for column in key_columns)),
+    ])
+    statements.extend(sql for _, sql in indexes)
+    statements.extend(
+        'ALTER TABLE {} ADD CONSTRAINT {} {}'.format(quote(table), quote(name), sql)
+        for name, sql in constraints
+    )
+    statements.append('ANALYZE {}'.format(quote(table)))
+    return statements
+
+
+def partition_tickets(connection, partitions):
+    """
+    Rebuilds the tickets table hash partitioned by event, or as a plain table.
+    :param connection: Database connection.
+    :param partitions: Number of partitions, or 0 to go back to a plain table.
+    :return: None
+    :raises NotSupportedError: If the database can't partition tables.
+    """
+
+    if not supports_partitioning(connection):
+        raise NotSupportedError('Partitioning needs PostgreSQL 11 or later.')
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            definition = table_definition(cursor, Ticket._meta.db_table)
+            for sql in rebuild_statements(connection, Ticket, definition, partitions):
+                cursor.execute(sql)
+    vacuum(connection)
+
+
+def vacuum(connection, model=Ticket):
+    """
+    Vacuums a PostgreSQL table, partitions included, so index-only scans can skip
+     the heap straight away rather than once autovacuum gets around to the table.
+    VACUUM can't run in a transaction, so nothing is done inside one.
+    :param connection: Database connection.
+    :param model: Model whose table to vacuum.
+    :return: None
+    """
+
+    if connection.vendor != 'postgresql' or connection.in_atomic_block:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM ANALYZE {}'.format(connection.ops.quote_name(model._meta.db_table)))
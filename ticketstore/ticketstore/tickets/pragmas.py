@@ -0,0 +1,26 @@
+"""
+ SQLite connection tuning.
+ Applies the TICKETS_SQLITE_PRAGMAS setting to every new SQLite connection, e.g.
+  write-ahead logging so readers and the writer stop blocking each other.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Signal receiver running the configured PRAGMA statements on a new connection.
+    """
+
+    #pylint: disable=W0613
+    if connection.vendor != 'sqlite':
+        return
+    cursor = connection.connection.cursor()
+    try:
+        for name, value in getattr(settings, 'TICKETS_SQLITE_PRAGMAS', {}).items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+    finally:
+        cursor.close()
@@ -0,0 +1,137 @@
+"""
+ Renderers for the ticket app.
+ The JSON renderers use orjson when it's installed, falling back to the standard
+  library's encoder with the same output.
+ The streaming renderers encode rows one at a time from a generator, so an export
+  can send its first byte before the last row has been read from the database.
+"""
+
+import json
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+     JSON renderer that encodes with orjson when it's installed.
+     orjson writes strings, integers, lists, dicts and UUIDs natively.  Anything
+      else, like datetimes, goes through the renderer's encoder class, so responses
+      are the same as the JSONRenderer's.  Floats are formatted by orjson, but the API
+      doesn't return any, with decimals rendered as strings.
+     Falls back to the JSONRenderer for data orjson can't encode, like integer dict
+      keys, and for indented or ASCII-only output.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Renders data into JSON.
+        :param data: Data to render.
+        :param accepted_media_type: Media type the client accepted, maybe with an indent.
+        :param renderer_context: Standard renderer context.
+        :return: Encoded bytes.
+        """
+
+        if data is None:
+            return b''
+        if not self.get_indent(accepted_media_type, renderer_context or {}):
+            encoded = self.encode_fast(data)
+            if encoded is not None:
+                # Like the JSONRenderer, escape the two characters that are valid in
+                #  JSON strings but not in JavaScript ones.
+                return encoded.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                    b'\xe2\x80\xa9', b'\\u2029')
+        return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+    def encode_fast(self, data):
+        """
+        Encodes data with orjson.
+        :param data: Data to encode.
+        :return: Encoded bytes, or None if the standard encoder has to be used instead.
+        """
+
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return None
+        try:
+            return orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            return None
+
+
+class StreamingJSONRenderer(FastJSONRenderer):
+    """
+     JSON renderer that can also stream a generator of rows as a single JSON array.
+    """
+
+    def encode_row(self, row):
+        """
+        Encodes a single serialized row the same way the JSONRenderer would.
+        :param row: Serialized row.
+        :return: Encoded bytes for the row.
+        """
+
+        encoded = self.encode_fast(row)
+        if encoded is not None:
+            return encoded
+        return json.dumps(
+            row,
+            cls=self.encoder_class,
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=(',', ':') if self.compact else (', ', ': ')
+        ).encode('utf-8')
+
+    def render_stream(self, rows):
+        """
+        Streams the rows as a JSON array.
+        :param rows: Iterable of serialized rows.
+        :return: Generator of encoded chunks.
+        """
+
+        separator = b'['
+        for row in rows:
+            yield separator + self.encode_row(row)
+            separator = b','
+        yield b'[]' if separator == b'[' else b']'
+
+
+class NDJSONRenderer(StreamingJSONRenderer):
+    """
+     Newline-delimited JSON renderer, one serialized row per line.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Renders a list of rows as newline-delimited JSON.
+        Anything other than a list, like an error message, is rendered as a single line.
+        :param data: Data to render.
+        :param accepted_media_type: Standard renderer arg.  Unused.
+        :param renderer_context: Standard renderer arg.  Unused.
+        :return: Encoded bytes.
+        """
+
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(self.render_stream(data))
+
+    def render_stream(self, rows):
+        """
+        Streams the rows as newline-delimited JSON.
+        :param rows: Iterable of serialized rows.
+        :return: Generator of encoded lines.
+        """
+
+        for row in rows:
+            yield self.encode_row(row) + b'\n'
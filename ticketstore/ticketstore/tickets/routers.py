@@ -0,0 +1,96 @@
+"""
+ Database router sending API reads to read replicas.
+ Replica reads are only enabled while a request that can't have written anything
+  is being handled, so management commands, migrations and writes always use the
+  primary.  Once a request writes, the client is pinned to the primary for a while
+  so it reads its own writes despite replication lag.
+"""
+
+import random
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_state = threading.local()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Enables or disables replica reads for the current thread, and records whether
+     anything is written while it's active.
+    :param enabled: True to send reads to the replicas.
+    :return: Context manager yielding an object whose written attribute says if
+     the primary was written to.
+    """
+
+    previous = getattr(_state, 'replicas', False), getattr(_state, 'written', False)
+    _state.replicas = enabled
+    _state.written = False
+    try:
+        yield _state
+    finally:
+        _state.replicas, _state.written = previous
+
+
+class ReplicaRouter(object):
+    """
+     Routes reads to a random replica from the DATABASE_REPLICAS setting while
+      replica reads are enabled, and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        """
+        Picks the database for a read.
+        Reads inside a transaction on the primary stay on the primary, so they see
+         the transaction's own writes.
+        :param model: Model being read.
+        :param hints: Router hints.
+        :return: Database alias.
+        """
+
+        #pylint: disable=W0613
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or not getattr(_state, 'replicas', False):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        """
+        Sends every write to the primary, and notes it for read-your-writes pinning.
+        :param model: Model being written.
+        :param hints: Router hints.
+        :return: Database alias.
+        """
+
+        #pylint: disable=W0613
+        _state.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Allows relations between objects loaded from the primary and its replicas,
+         which all hold the same data.
+        :return: True, or None for databases this router doesn't know about.
+        """
+
+        #pylint: disable=W0613
+        databases = [DEFAULT_DB_ALIAS] + list(getattr(settings, 'DATABASE_REPLICAS', []))
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Keeps migrations off the replicas, which get the schema through replication.
+        :return: False for replicas, None otherwise.
+        """
+
+        #pylint: disable=W0613
+        if db in getattr(settings, 'DATABASE_REPLICAS', []):
+            return False
+        return None
@@ -0,0 +1,268 @@
+"""
+ Indexed name search for clients, events and customers.
+ On SQLite each table gets an FTS5 index of its names, kept up to date by triggers,
+  and a search matches every word of the query as a word prefix, ranked by bm25.
+  Only the first TICKETS_SEARCH_RANK_LIMIT matches in index order are scored and
+  returned, so a term matching more names than that costs no more than one
+  matching that many.
+ On PostgreSQL names get a pg_trgm GiST index, and a search matches names with a
+  word similar to the query, so typos still match, read from the index nearest
+  match first.
+ Other databases, and SQLite builds without FTS5, fall back to the indexed
+  name__prefix lookup.
+ The SQLite triggers go when Django rebuilds a table in a migration, so
+  ensure_search_index() puts back any missing part of the index after every migrate.
+"""
+
+import re
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import F, FloatField, Func, Value
+
+
+FTS_TABLE = '{}_search'
+CONTENT_TABLE = '{}_search_content'
+TRGM_INDEX = '{}_name_trgm_idx'
+SEARCH_RANK = 'search_rank'
+WORD_PATTERN = re.compile(r'\w+')
+
+# Whether each database has the FTS5 index of a table, by (alias, name, table).
+_fts_tables = {}
+
+
+def fts_query(term):
+    """
+    Turns a search term into an FTS5 query matching every word as a word prefix, e.g.
+     'jam bow' becomes '"jam"* "bow"*', so user input can't inject FTS5 syntax.
+    :param term: Search term.
+    :return: FTS5 query, or an empty string if the term has no words.
+    """
+
+    return ' '.join('"{}"*'.format(word) for word in WORD_PATTERN.findall(term))
+
+
+def index_statements(connection, model):
+    """
+    Lists the statements creating the name search index of a model.
+    The FTS5 table is an external content table over a table of names keyed by the
+     model's primary key, rather than by the model table's rowid, which SQLite is
+     free to renumber when the table is rebuilt or vacuumed.  It has prefix indexes
+     for two and three character prefixes.
+    :param connection: Database connection.
+    :param model: Model with a name field.
+    :return: List of SQL statements, empty if the database has no search index.
+    """
+
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        return [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            'CREATE INDEX IF NOT EXISTS {} ON {} USING gist (name gist_trgm_ops)'.format(
+                quote(TRGM_INDEX.format(table)), quote(table)),
+        ]
+    if connection.vendor != 'sqlite':
+        return []
+    fts = quote(FTS_TABLE.format(table))
+    content = quote(CONTENT_TABLE.format(table))
+    pk = model._meta.pk
+    trigger = quote('{}_{{}}'.format(FTS_TABLE.format(table)))
+    delete = "INSERT INTO {0}({0}, rowid, name) SELECT 'delete', search_id, name FROM {1} " \
+             "WHERE key = old.{2}; DELETE FROM {1} WHERE key = old.{2};".format(
+                 fts, content, quote(pk.column))
+    insert = 'INSERT INTO {1}(key, name) VALUES (new.{2}, new.name); ' \
+             'INSERT INTO {0}(rowid, name) SELECT search_id, name FROM {1} ' \
+             'WHERE key = new.{2};'.format(fts, content, quote(pk.column))
+    return [
+        'CREATE TABLE {} (search_id integer PRIMARY KEY, key {} NOT NULL UNIQUE, '
+        'name text NOT NULL)'.format(content, pk.db_type(connection)),
+        "CREATE VIRTUAL TABLE {} USING fts5(name, content={}, content_rowid='search_id', "
+        "tokenize='unicode61 remove_diacritics 1', prefix='2 3')".format(fts, content),
+        'CREATE TRIGGER {} AFTER INSERT ON {} BEGIN {} END'.format(
+            trigger.format('insert'), quote(table), insert),
+        'CREATE TRIGGER {} AFTER DELETE ON {} BEGIN {} END'.format(
+            trigger.format('delete'), quote(table), delete),
+        'CREATE TRIGGER {} AFTER UPDATE OF {}, name ON {} BEGIN {} {} END'.format(
+            trigger.format('update'), quote(pk.column), quote(table), delete, insert),
+        'INSERT INTO {}(key, name) SELECT {}, name FROM {}'.format(
+            content, quote(pk.column), quote(table)),
+        "INSERT INTO {0}({0}) VALUES ('rebuild')".format(fts),
+    ]
+
+
+def sqlite_objects(table):
+    """
+    Lists the tables and triggers making up the SQLite search index of a table.
+    :param table: Name of the model's table.
+    :return: List of (type, name) tuples.
+    """
+
+    fts = FTS_TABLE.format(table)
+    return [('table', fts), ('table', CONTENT_TABLE.format(table))] + [
+        ('trigger', '{}_{}'.format(fts, name)) for name in ('insert', 'delete', 'update')
+    ]
+
+
+def drop_statements(connection, table):
+    """
+    Lists the statements dropping the name search index of a table.
+    :param connection: Database connection.
+    :param table: Name of the model's table.
+    :return: List of SQL statements.
+    """
+
+    quote = connection.ops.quote_name
+    if connection.vendor == 'postgresql':
+        return ['DROP INDEX IF EXISTS {}'.format(quote(TRGM_INDEX.format(table)))]
+    if connection.vendor != 'sqlite':
+        return []
+    return [
+        'DROP {0} IF EXISTS {1}'.format(kind.upper(), quote(name))
+        for kind, name in reversed(sqlite_objects(table))
+    ]
+
+
+def create_search_index(connection, model):
+    """
+    Creates, or recreates and fills, the name search index of a model.
+    Leaves the model without an index where SQLite is built without FTS5.
+    :param connection: Database connection.
+    :param model: Model with a name field.
+    :return: True if the index was created.
+    """
+
+    table = model._meta.db_table
+    _fts_tables.clear()
+    statements = index_statements(connection, model)
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                for sql in drop_statements(connection, table) + statements:
+                    cursor.execute(sql)
+    except OperationalError:
+        if connection.vendor != 'sqlite':
+            raise
+        return False
+    return bool(statements)
+
+
+def drop_search_index(connection, model):
+    """
+    Drops the name search index of a model.
+    :param connection: Database connection.
+    :param model: Model with a name field.
+    :return: None
+    """
+
+    _fts_tables.clear()
+    with connection.cursor() as cursor:
+        for sql in drop_statements(connection, model._meta.db_table):
+            cursor.execute(sql)
+
+
+def ensure_search_index(connection, model):
+    """
+    Creates the name search index of a model where any part of it is missing, e.g.
+     after a migration rebuilt the table on SQLite, which drops its triggers.  The
+     index is filled again, since the table may have changed while they were gone.
+     Does nothing when the index is complete, so it can run after every migrate.
+    :param connection: Database connection.
+    :param model: Model with a name field.
+    :return: True if the index was created.
+    """
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for sql in index_statements(connection, model):
+                cursor.execute(sql)
+        return False
+    if connection.vendor != 'sqlite':
+        return False
+    expected = sqlite_objects(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT type, name FROM sqlite_master WHERE name IN ({})'.format(
+                ', '.join(['%s'] * len(expected))),
+            [name for _, name in expected]
+        )
+        if set(cursor.fetchall()) == set(expected):
+            return False
+    return create_search_index(connection, model)
+
+
+def has_fts_index(connection, table):
+    """
+    Checks whether a SQLite database has the FTS5 index of a table, looking it up
+     once per database.
+    :param connection: Database connection.
+    :param table: Name of the model's table.
+    :return: True if the FTS5 table exists.
+    """
+
+    key = (connection.alias, connection.settings_dict['NAME'], table)
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE.format(table)]
+            )
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+class WordDistance(Func):
+    """
+    PostgreSQL pg_trgm distance between a term and the most similar word run in a
+     column, one minus their word similarity.  Sorting by it reads the GiST index
+     nearest match first.
+    """
+
+    arg_joiner = ' <<-> '
+    template = '(%(expressions)s)'
+
+    def __init__(self, term, column):
+        """
+        :param term: Search term.
+        :param column: Name of the column.
+        """
+
+        super(WordDistance, self).__init__(Value(term), F(column), output_field=FloatField())
+
+
+def search_names(queryset, term, connection):
+    """
+    Filters a queryset to the rows whose name matches a search term, best match first.
+    :param queryset: QuerySet of a model with a name field.
+    :param term: Search term.
+    :param connection: Connection of the database the queryset reads from.
+    :return: Ordered QuerySet.
+    """
+
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        return queryset.annotate(**{SEARCH_RANK: WordDistance(term, 'name')}).filter(
+            name__word_similar=term).order_by(SEARCH_RANK, 'id')
+    if connection.vendor == 'sqlite' and has_fts_index(connection, table):
+        query = fts_query(term)
+        if not query:
+            return queryset.none()
+        quote = connection.ops.quote_name
+        fts = quote(FTS_TABLE.format(table))
+        content = quote(CONTENT_TABLE.format(table))
+        # Scoring is what a search costs, so only the first TICKETS_SEARCH_RANK_LIMIT
+        #  matches are ranked.  Broad terms like two letter prefixes would otherwise
+        #  score a large share of the table.
+        candidates = 'SELECT rowid FROM {0} WHERE {0} MATCH %s LIMIT %s'.format(fts)
+        return queryset.extra(
+            select={SEARCH_RANK: '{}.rank'.format(fts)},
+            tables=[FTS_TABLE.format(table), CONTENT_TABLE.format(table)],
+            where=[
+                '{} MATCH %s'.format(fts),
+                '{}.search_id IN ({})'.format(content, candidates),
+                '{}.rowid = {}.search_id'.format(fts, content),
+                '{}.key = {}.{}'.format(
+                    content, quote(table), quote(queryset.model._meta.pk.column)),
+            ],
+            params=[query, query, getattr(settings, 'TICKETS_SEARCH_RANK_LIMIT', 5000)],
+        ).order_by(SEARCH_RANK, 'id')
+    return queryset.filter(name__prefix=term).order_by('name', 'id')
@@ -6,28 +6,305 @@
 #pylint: disable=R0903
 #pylint: disable=R0201
 
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
 from rest_framework import serializers
-from django.core.exceptions import SuspiciousOperation
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, SuspiciousOperation
+from django.db.models import Manager
+from .loaders import EMBED_ATTR, load_relations
+from .metrics import serializer_timer
 from .models import Client, Event, Customer, Ticket
 
 
+FieldPlan = namedtuple('FieldPlan', ['fields', 'embed_fields', 'embeds'])
+MAX_EMBED_DEPTH = 3
+
+
+def parse_embeds(serializer_class, paths, depth=1):
+    """
+    Parses embed_fields paths, like ['event.client', 'customer'], into a tree of the
+     relations to embed.
+    :param serializer_class: DynamicModelSerializer subclass the paths start from.
+    :param paths: List of dot-separated relation paths.
+    :param depth: Level of serializer_class in the tree.
+    :return: Tuple of (name, serializer class, subtree) triples, sorted by name.
+     Names that aren't relations of the serializer are left out.
+    """
+
+    grouped = OrderedDict()
+    for path in paths:
+        name, _, rest = path.partition('.')
+        grouped.setdefault(name, [])
+        if rest:
+            grouped[name].append(rest)
+    embeds = []
+    for name in sorted(grouped):
+        nested_class = serializer_class.relations.get(name) or \
+            serializer_class.reverse_relations.get(name)
+        if nested_class is None:
+            continue
+        if grouped[name] and depth >= MAX_EMBED_DEPTH:
+            raise SuspiciousOperation(
+                'Cannot embed more than {} levels deep.'.format(MAX_EMBED_DEPTH)
+            )
+        embeds.append((name, nested_class, parse_embeds(nested_class, grouped[name], depth + 1)))
+    return tuple(embeds)
+
+
+def embed_paths(embeds, prefix=''):
+    """
+    Flattens an embed tree back into the shortest list of dot-separated paths.
+    :param embeds: Embed tree from parse_embeds.
+    :param prefix: Path of the tree's parent.
+    :return: List of paths, e.g. ['customer', 'event.client'].
+    """
+
+    paths = []
+    for name, _, subtree in embeds:
+        if subtree:
+            paths.extend(embed_paths(subtree, prefix + name + '.'))
+        else:
+            paths.append(prefix + name)
+    return paths
+
+
+@lru_cache(maxsize=512)
+def compile_field_plan(serializer_class, include_param, exclude_param, embed_param):
+    """
+    Parses the field selection query params into an immutable plan for a serializer class.
+    Cached on the serializer class and raw param values, so each distinct combination
+     is only parsed and resolved against the serializer's fields once.
+    :param serializer_class: DynamicModelSerializer subclass the plan is for.
+    :param include_param: Raw include_fields query param, or None.
+    :param exclude_param: Raw exclude_fields query param, or None.
+    :param embed_param: Raw embed_fields query param, or None.
+    :return: FieldPlan with the names of the fields to keep, the fields to embed and
+     the tree of relations to embed.
+    """
+
+    exclude_fields = exclude_param.split(",") if exclude_param else []
+    embed_paths_param = embed_param.split(",") if embed_param else []
+    embed_fields = [path.split(".")[0] for path in embed_paths_param]
+    include_fields = embed_fields + (include_param.split(",") if include_param else [])
+    if include_fields and exclude_fields:
+        raise SuspiciousOperation(
+            'Cannot both include and exclude fields in the same API request.'
+        )
+    fields = tuple(serializer_class().fields.keys())
+    if include_fields:
+        fields = tuple(field for field in fields if field in include_fields)
+    if exclude_fields:
+        fields = tuple(field for field in fields if field not in exclude_fields)
+    return FieldPlan(
+        fields=fields,
+        embed_fields=frozenset(embed_fields),
+        embeds=parse_embeds(serializer_class, embed_paths_param)
+    )
+
+
+@lru_cache(maxsize=512)
+def compile_embed_plan(serializer_class, embeds):
+    """
+    Builds the plan of a serializer embedded in another, which returns every field
+     and embeds its part of the parent's embed tree.
+    :param serializer_class: DynamicModelSerializer subclass being embedded.
+    :param embeds: Subtree of the parent's embed tree.
+    :return: FieldPlan.
+    """
+
+    return FieldPlan(
+        fields=tuple(serializer_class().fields.keys()),
+        embed_fields=frozenset(name for name, _, _ in embeds),
+        embeds=embeds
+    )
+
+
+def request_field_plan(serializer_class, request):
+    """
+    Looks up the compiled field plan for a serializer class and a request's query params.
+    :param serializer_class: DynamicModelSerializer subclass the plan is for.
+    :param request: Request object from django rest framework, or None.
+    :return: FieldPlan, or None when there's no request.
+    """
+
+    if not request:
+        return None
+    return compile_field_plan(
+        serializer_class,
+        request.query_params.get('include_fields'),
+        request.query_params.get('exclude_fields'),
+        request.query_params.get('embed_fields')
+    )
+
+
+@lru_cache(maxsize=512)
+def compile_values_serializer(serializer_class, field_plan):
+    """
+    Builds the .values() fast path for a serializer class and field plan.
+    Cached like the field plans, so the columns are only worked out once per combination.
+    :param serializer_class: DynamicModelSerializer subclass to mirror.
+    :param field_plan: FieldPlan of the request, or None for every field.
+    :return: ValuesSerializer, or None if the serializer has fields the fast path
+     can't produce.
+    """
+
+    try:
+        return ValuesSerializer(serializer_class, field_plan)
+    except ValueError:
+        return None
+
+
+class ValuesSerializer(object):
+    """
+     Produces the same output as a DynamicModelSerializer from .values() rows, skipping
+      the model instances and DRF's per-field attribute lookups.
+     Each value is still formatted by the serializer field's own to_representation, so
+      the rendered output is identical.  Embedded relations are read from columns
+      joined in the same query, and related IDs straight from the foreign key column.
+    """
+
+    def __init__(self, serializer_class, field_plan=None, prefix=''):
+        """
+        Works out the columns to select and how to turn them into each field.
+        :param serializer_class: DynamicModelSerializer subclass to mirror.
+        :param field_plan: FieldPlan of the request, or None for every field.
+        :param prefix: Lookup prefix of the columns, for embedded relations.
+        :raises ValueError: If a field isn't a plain model column or a relation
+         listed in the serializer's relations, or a reverse relation is embedded.
+        """
+
+        if field_plan and any(name not in serializer_class.relations
+                              for name, _, _ in field_plan.embeds):
+            raise ValueError('Reverse relations are loaded separately.')
+        serializer = serializer_class()
+        opts = serializer_class.Meta.model._meta
+        relations = serializer_class.relations
+        subtrees = dict((name, subtree) for name, _, subtree in field_plan.embeds) \
+            if field_plan else {}
+        names = field_plan.fields if field_plan else tuple(serializer.fields.keys())
+        embed_fields = field_plan.embed_fields if field_plan else frozenset()
+        self.columns = []
+        self.fields = []
+        for name in names:
+            field = serializer.fields[name]
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in relations:
+                    raise ValueError('{} is not a known relation.'.format(name))
+                if name in embed_fields:
+                    nested = ValuesSerializer(
+                        relations[name],
+                        compile_embed_plan(relations[name], subtrees.get(name, ())),
+                        prefix=prefix + name + '__'
+                    )
+                    self.columns.extend(nested.columns)
+                    self.fields.append((name, None, None, nested))
+                    continue
+                column, to_representation = prefix + opts.get_field(name).attname, None
+            else:
+                try:
+                    model_field = opts.get_field(field.source)
+                except FieldDoesNotExist:
+                    raise ValueError('{} is not a model field.'.format(name))
+                if not model_field.concrete or model_field.is_relation:
+                    raise ValueError('{} is not a column.'.format(name))
+                column, to_representation = prefix + field.source, field.to_representation
+            self.columns.append(column)
+            self.fields.append((name, column, to_representation, None))
+
+    def to_representation(self, row):
+        """
+        Serializes one row.
+        :param row: Dict from a .values() queryset with the columns selected.
+        :return: Serialized object.
+        """
+
+        ret = OrderedDict()
+        for name, column, to_representation, nested in self.fields:
+            if nested is not None:
+                ret[name] = nested.to_representation(row)
+                continue
+            value = row[column]
+            ret[name] = value if value is None or to_representation is None \
+                else to_representation(value)
+        return ret
+
+    def serialize(self, rows):
+        """
+        Serializes a list of rows, timed for the request metrics.
+        :param rows: Iterable of .values() dicts.
+        :return: List of serialized objects.
+        """
+
+        with serializer_timer():
+            return [self.to_representation(row) for row in rows]
+
+
+class DynamicListSerializer(serializers.ListSerializer):
+    """
+     List serializer that loads the embedded relations of the whole list up front,
+      with a query per relation per level of the embed tree.
+    """
+
+    def to_representation(self, data):
+        """
+        Standard to_representation, after batch loading the embeds.
+        :param data: List, QuerySet or Manager of objects to serialize.
+        :return: List of serialized objects.
+        """
+
+        instances = list(data.all() if isinstance(data, Manager) else data)
+        self.child.load_embeds(instances)
+        return super(DynamicListSerializer, self).to_representation(instances)
+
+
 class DynamicModelSerializer(serializers.ModelSerializer):
     """
      Extension of the model serializer class to dynamically alter
       the fields of the serializer upon runtime.
+     Forward relations that can be embedded are declared in relations, and reverse
+      ones in reverse_relations.  Embedded reverse relations are added after the
+      serializer's fields, with at most TICKETS_REVERSE_EMBED_LIMIT children each.
     """
+
+    relations = {}
+    reverse_relations = {}
+
     def __init__(self, *args, **kwargs):
         """
         Initializes the DynamicModelSerializer -- inherits the standard ModelSerializer
         Defined and automatically calls alter_fields so we aren't repeating ourselves
          on every serializer.
         :param args: Standard serializer args.  Just passed along.
-        :param kwargs: Standard serializer kwargs.  Just passed along.
+        :param kwargs: Standard serializer kwargs.  Just passed along, apart from embeds,
+         the embed subtree of a serializer embedded in another one.
         """
+        embeds = kwargs.pop('embeds', None)
         super(DynamicModelSerializer, self).__init__(*args, **kwargs)
-        if self.context.get('request'):
+        if embeds is None:
+            self.field_plan = self.get_field_plan(self.context.get('request'))
+        else:
+            self.field_plan = compile_embed_plan(type(self), embeds)
+        # Embedded serializers get their relations loaded by the outermost one.
+        self.loads_embeds = embeds is None
+        self.embedded_serializers = {}
+        self.reverse_embeds = [
+            (name, serializer_class) for name, serializer_class, _ in self.field_plan.embeds
+            if name in self.reverse_relations
+        ] if self.field_plan else []
+        if self.field_plan and embeds is None:
             self.alter_fields(self.context.get("request"), self.fields)
 
+    def get_field_plan(self, request):
+        """
+        Looks up the compiled field plan for this serializer and the request's query params.
+        :param request: Request object from django rest framework's context.
+        :return: FieldPlan, or None when there's no request.
+        """
+
+        return request_field_plan(type(self), request)
 
     def alter_fields(self, request, fields):
         """
@@ -40,27 +317,71 @@ class DynamicModelSerializer(serializers.ModelSerializer):
         """
 
         if request:
-            exclude_fields = []
-            if request.query_params.get('exclude_fields'):
-                exclude_fields = request.query_params.get('exclude_fields').split(",")
-            include_fields = []
-            if request.query_params.get('embed_fields'):
-                include_fields += request.query_params.get('embed_fields').split(",")
-            if request.query_params.get('include_fields'):
-                include_fields += request.query_params.get('include_fields').split(",")
-            keys = fields.keys()
-            if include_fields and exclude_fields:
-                raise SuspiciousOperation(
-                    'Cannot both include and exclude fields in the same API request.'
-                )
-            if include_fields:
-                for field in set(keys):
-                    if field not in include_fields:
-                        fields.pop(field)
-            if exclude_fields:
-                for field in set(keys):
-                    if field in exclude_fields:
-                        fields.pop(field)
+            keep = self.field_plan.fields
+            for field in set(fields.keys()):
+                if field not in keep:
+                    fields.pop(field)
+
+    def load_embeds(self, instances):
+        """
+        Batch loads the relations to embed for a list of objects.
+        :param instances: List of model instances.
+        :return: None
+        """
+
+        if self.loads_embeds and self.field_plan and self.field_plan.embeds:
+            load_relations(
+                instances, self.field_plan.embeds,
+                limit=getattr(settings, 'TICKETS_REVERSE_EMBED_LIMIT', 20)
+            )
+
+    def to_representation(self, instance):
+        """
+        Standard to_representation plus any embedded reverse relations, timed for the
+         request metrics.
+        :param instance: Object to serialize.
+        :return: Serialized object.
+        """
+
+        with serializer_timer():
+            if not isinstance(self.parent, serializers.ListSerializer):
+                self.load_embeds([instance])
+            ret = super(DynamicModelSerializer, self).to_representation(instance)
+            for name, serializer_class in self.reverse_embeds:
+                ret[name] = [
+                    self.embed(name, serializer_class, child)
+                    for child in getattr(instance, EMBED_ATTR.format(name))
+                ]
+            return ret
+
+    def is_embedded(self, field_name):
+        """
+        Checks whether a related field was requested through embed_fields.
+        :param field_name: Name of the related field.
+        :return: True if the related object should be embedded.
+        """
+
+        return bool(self.field_plan) and field_name in self.field_plan.embed_fields
+
+    def embed(self, field_name, serializer_class, instance):
+        """
+        Serializes an embedded related object.
+        The nested serializer is built once and reused for every row, so embedding
+         doesn't rebuild the nested serializer's fields per object.  It embeds its
+         own part of the embed tree.
+        :param field_name: Name of the related field being embedded.
+        :param serializer_class: Serializer class for the related object.
+        :param instance: Related object to serialize.
+        :return: Serialized related object.
+        """
+
+        serializer = self.embedded_serializers.get(field_name)
+        if serializer is None:
+            subtrees = dict((name, subtree) for name, _, subtree in self.field_plan.embeds)
+            serializer = self.embedded_serializers[field_name] = serializer_class(
+                embeds=subtrees.get(field_name, ())
+            )
+        return serializer.to_representation(instance)
 
 
 class ClientSerializer(DynamicModelSerializer):
@@ -75,6 +396,7 @@ class ClientSerializer(DynamicModelSerializer):
 
         model = Client
         fields = ('__all__')
+        list_serializer_class = DynamicListSerializer
 
 
 class EventSerializer(DynamicModelSerializer):
@@ -84,6 +406,7 @@ class EventSerializer(DynamicModelSerializer):
     """
 
     client = serializers.SerializerMethodField()
+    relations = {'client': ClientSerializer}
 
     class Meta:
         """
@@ -92,6 +415,7 @@ class EventSerializer(DynamicModelSerializer):
 
         model = Event
         fields = ('__all__')
+        list_serializer_class = DynamicListSerializer
 
     def get_client(self, obj):
         """
@@ -100,11 +424,8 @@ class EventSerializer(DynamicModelSerializer):
         :return: Either a ClientSerializer or a UUID depending on query params.
         """
 
-        request = self.context.get('request')
-        if request:
-            embed_fields = request.query_params.get('embed_fields')
-            if embed_fields and 'client' in embed_fields:
-                return ClientSerializer(instance=obj.client).data
+        if self.is_embedded('client'):
+            return self.embed('client', ClientSerializer, obj.client)
         return obj.client_id
 
 
@@ -120,6 +441,7 @@ class CustomerSerializer(DynamicModelSerializer):
 
         model = Customer
         fields = ('__all__')
+        list_serializer_class = DynamicListSerializer
 
 class TicketSerializer(DynamicModelSerializer):
     """
@@ -129,6 +451,7 @@ class TicketSerializer(DynamicModelSerializer):
 
     customer = serializers.SerializerMethodField()
     event = serializers.SerializerMethodField()
+    relations = {'customer': CustomerSerializer, 'event': EventSerializer}
 
     class Meta:
         """
@@ -137,6 +460,7 @@ class TicketSerializer(DynamicModelSerializer):
 
         model = Ticket
         fields = ('__all__')
+        list_serializer_class = DynamicListSerializer
 
     def get_customer(self, obj):
         """
@@ -145,11 +469,8 @@ class TicketSerializer(DynamicModelSerializer):
         :return: Either a CustomerSerializer or a UUID depending on query params.
         """
 
-        request = self.context.get('request')
-        if request:
-            embed_fields = request.query_params.get('embed_fields')
-            if embed_fields and 'customer' in embed_fields:
-                return CustomerSerializer(instance=obj.customer).data
+        if self.is_embedded('customer'):
+            return self.embed('customer', CustomerSerializer, obj.customer)
         return obj.customer_id
     def get_event(self, obj):
         """
@@ -158,9 +479,66 @@ class TicketSerializer(DynamicModelSerializer):
         :return: Either a EventSerializer or a UUID depending on query params.
         """
 
-        request = self.context.get('request')
-        if request:
-            embed_fields = request.query_params.get('embed_fields')
-            if embed_fields and 'event' in embed_fields:
-                return EventSerializer(instance=obj.event).data
+        if self.is_embedded('event'):
+            return self.embed('event', EventSerializer, obj.event)
         return obj.event_id
+
+
+# Reverse relations point at serializers defined after their parent's.
+ClientSerializer.reverse_relations = {'events': EventSerializer}
+EventSerializer.reverse_relations = {'tickets': TicketSerializer}
+
+
+class TicketIssueSerializer(serializers.Serializer):
+    """
+     Input serializer for issuing a ticket.
+     Takes plain IDs for the event and customer, so validating a ticket never
+      touches the database and a batch can resolve all of its IDs at once.
+    """
+
+    event = serializers.UUIDField()
+    customer = serializers.UUIDField()
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, default=0)
+
+
+class PurchaseSerializer(TicketIssueSerializer):
+    """
+     Input serializer for ticket purchases.
+     The seats are reserved with a conditional update instead of loading the event.
+    """
+
+    quantity = serializers.IntegerField(min_value=1, max_value=100, default=1)
+
+    def validate_customer(self, value):
+        """
+        Makes sure the customer exists before any seats are reserved.
+        :param value: ID of the customer.
+        :return: ID of the customer.
+        """
+
+        if not Customer.objects.filter(pk=value).exists():
+            raise serializers.ValidationError('Customer {} does not exist.'.format(value))
+        return value
+
+
+class EventStatsSerializer(serializers.Serializer):
+    """
+     Output serializer for an event's sales stats.
+    """
+
+    event = serializers.UUIDField(source='id')
+    tickets_sold = serializers.IntegerField()
+    remaining_capacity = serializers.IntegerField()
+    gross_revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class ClientStatsSerializer(serializers.Serializer):
+    """
+     Output serializer for the sales stats of all of a client's events.
+    """
+
+    client = serializers.UUIDField(source='id')
+    events = serializers.IntegerField()
+    tickets_sold = serializers.IntegerField()
+    remaining_capacity = serializers.IntegerField()
+    gross_revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
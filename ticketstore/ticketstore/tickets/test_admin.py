@@ -0,0 +1,140 @@
+"""
+ Testing file for the Django admin.
+"""
+
+#pylint: disable=E1101
+#pylint: disable=C0103
+
+from unittest import mock
+from django import test
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from .admin import EstimatedCountPaginator
+from .models import Client, Event, Customer, Ticket
+
+
+client = test.Client()
+
+class TestAdmin(test.TestCase):
+    """
+      Test module for the ticket app's admin
+    """
+
+    def setUp(self):
+        """
+        Setting up a superuser and an event with a few tickets.
+        :return: None
+        """
+
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=self.client.id)
+        self.customers = [
+            Customer.objects.create(name=name) for name in ('James Bowen', 'Bea Arthur')
+        ]
+
+    def add_tickets(self, count):
+        """
+        Adds tickets for the event, alternating between the customers.
+        :param count: Number of tickets to add.
+        :return: None
+        """
+
+        for number in range(count):
+            Ticket.objects.create(event_id=self.event.id,
+                                  customer_id=self.customers[number % 2].id, price=190.0)
+
+    def test_ticket_changelist_constant_queries(self):
+        """
+        Tests that the ticket changelist doesn't run a query per row.
+        :return: None
+        """
+
+        self.add_tickets(3)
+        with CaptureQueriesContext(connection) as small:
+            response = client.get("/admin/tickets/ticket/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.add_tickets(30)
+        with CaptureQueriesContext(connection) as large:
+            response = client.get("/admin/tickets/ticket/")
+        self.assertContains(response, 'Burning Man 2018', count=33)
+        self.assertEqual(len(small), len(large))
+
+    def test_ticket_filters_by_event(self):
+        """
+        Tests filtering the tickets by event, as linked from the event changelist.
+        :return: None
+        """
+
+        self.add_tickets(2)
+        other = Event.objects.create(name='Comic-Con', venue_capacity=10, client_id=self.client.id)
+        response = client.get("/admin/tickets/ticket/?event__id__exact={}".format(other.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.context['cl'].result_count, 0)
+        response = client.get("/admin/tickets/event/")
+        self.assertContains(response, "?event__id__exact={}".format(self.event.id))
+
+    def test_foreign_keys_use_autocomplete(self):
+        """
+        Tests that the ticket form doesn't list every event and customer.
+        :return: None
+        """
+
+        response = client.get("/admin/tickets/ticket/add/")
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'James Bowen')
+        response = client.get("/admin/tickets/customer/autocomplete/", {'term': 'Bea'})
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Bea Arthur'])
+
+    def test_ticket_form_checks_capacity(self):
+        """
+        Tests that moving a ticket to a sold out event is a form error.
+        :return: None
+        """
+
+        self.add_tickets(1)
+        ticket = Ticket.objects.get()
+        full = Event.objects.create(name='Comic-Con', venue_capacity=0, client_id=self.client.id)
+        response = client.post("/admin/tickets/ticket/{}/change/".format(ticket.id), {
+            'event': str(full.id), 'customer': str(ticket.customer_id), 'price': '190.00',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.context['adminform'].form.errors['event'],
+                         ['This event is sold out.'])
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.event_id, self.event.id)
+
+    def test_prefix_and_id_search(self):
+        """
+        Tests that searches match name prefixes and exact IDs.
+        :return: None
+        """
+
+        response = client.get("/admin/tickets/customer/", {'q': 'Bea'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = client.get("/admin/tickets/customer/", {'q': 'ea'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+        response = client.get("/admin/tickets/customer/", {'q': str(self.customers[0].id)})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_estimated_count(self):
+        """
+        Tests that large unfiltered tables are counted from the database's estimate.
+        :return: None
+        """
+
+        self.add_tickets(3)
+        Ticket.objects.filter(pk=Ticket.objects.first().pk).delete()
+        tickets = Ticket.objects.order_by('-created_at', '-id')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE tickets_ticket')
+        # SQLite's estimate is the largest rowid, which counts the deleted ticket.
+        estimate = 3 if connection.vendor == 'sqlite' else 2
+        with mock.patch.object(EstimatedCountPaginator, 'estimate_threshold', 1):
+            self.assertEqual(EstimatedCountPaginator(tickets, 100).count, estimate)
+            self.assertEqual(EstimatedCountPaginator(tickets.filter(price=190), 100).count, 2)
+        self.assertEqual(EstimatedCountPaginator(tickets, 100).count, 2)
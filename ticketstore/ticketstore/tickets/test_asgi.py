@@ -0,0 +1,122 @@
+"""
+ Testing file for the ASGI entry point.  Drives the WSGI bridge directly with ASGI
+  messages, the way an ASGI server would.
+"""
+
+#pylint: disable=E1101
+
+import asyncio
+import json
+from unittest import mock
+from django import test
+from django.db import connection
+from ticketstore.asgi import application
+from .models import Client, Event
+
+
+class TestASGI(test.TransactionTestCase):
+    """
+      Test module for the ASGI entry point.
+      Requests are handled in the bridge's worker threads, so the test data has to
+       be committed for them to see it.
+    """
+
+    def setUp(self):
+        """
+        Has the worker threads close their database connections after each request,
+         as persistent ones would keep the test database from being dropped.
+        :return: None
+        """
+
+        patcher = mock.patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, path, query_string=b'', body=b'', headers=None):
+        """
+        Sends one request through the ASGI application.
+        :param method: HTTP method.
+        :param path: Request path.
+        :param query_string: Raw query string.
+        :param body: Request body.
+        :param headers: List of (name, value) byte string tuples.
+        :return: Tuple of the status code, headers dict and body.
+        """
+
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query_string,
+            'headers': [(b'host', b'testserver')] + (headers or []),
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 50000),
+            'scheme': 'http',
+            'http_version': '1.1',
+        }
+        incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            """ Hands the request body to the application. """
+            return incoming.pop(0)
+
+        async def send(message):
+            """ Collects the response messages. """
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(application(scope, receive, send))
+        finally:
+            loop.close()
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertFalse(sent[-1]['more_body'])
+        return (
+            sent[0]['status'],
+            dict(sent[0]['headers']),
+            b''.join(message['body'] for message in sent[1:]),
+        )
+
+    def test_list(self):
+        """
+        Tests that a list request is served through the bridge with its query params.
+        :return: None
+        """
+
+        burning_man = Client.objects.create(name='Burning Man')
+        Event.objects.create(name='Burning Man 2018', venue_capacity=100, client_id=burning_man.id)
+        status_code, headers, body = self.request(
+            'GET', '/api/event', query_string=b'include_fields=name')
+        self.assertEqual(status_code, 200)
+        self.assertIn(b'etag', headers)
+        self.assertEqual(json.loads(body.decode('utf-8'))['results'],
+                         [{'name': 'Burning Man 2018'}])
+
+    def test_post(self):
+        """
+        Tests that request bodies and content headers are passed on.
+        :return: None
+        """
+
+        body = json.dumps({'name': 'Burning Man'}).encode('utf-8')
+        status_code, _, _ = self.request('POST', '/api/client', body=body, headers=[
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ])
+        self.assertEqual(status_code, 201)
+        self.assertEqual(Client.objects.get().name, 'Burning Man')
+
+    def test_streaming_export(self):
+        """
+        Tests that a streaming response is sent as several body messages.
+        :return: None
+        """
+
+        burning_man = Client.objects.create(name='Burning Man')
+        for year in range(2015, 2020):
+            Event.objects.create(
+                name='Burning Man {}'.format(year), venue_capacity=100, client_id=burning_man.id)
+        status_code, _, body = self.request('GET', '/api/event/export')
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(body.decode('utf-8').splitlines()), 5)
@@ -0,0 +1,182 @@
+"""
+ Testing file for the response cache.
+"""
+
+#pylint: disable=E1101
+#pylint: disable=C0103
+
+from unittest import mock
+from django import test
+from rest_framework import status
+from .cache import LocMemLRUBackend, ResponseCache, model_tag, response_cache
+from .models import Client, Event, Customer
+
+
+client = test.Client()
+
+class TestResponseCache(test.TestCase):
+    """
+      Test module for caching and invalidating responses
+    """
+
+    def setUp(self):
+        """
+        Setting up an event and clearing the cache.
+        :return: None
+        """
+
+        response_cache.clear()
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=self.client.id)
+
+    def test_retrieve_hit(self):
+        """
+        Tests that a repeated retrieve is served from the cache without loading the event.
+        :return: None
+        """
+
+        url = "/api/event/{}".format(self.event.id)
+        self.assertEqual(client.get(url)['X-Cache'], 'MISS')
+        # Only the ETag's query runs, the event isn't loaded again.
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data["name"], 'Burning Man 2018')
+        self.assertEqual((response_cache.hits.value(), response_cache.misses.value()), (1, 1))
+
+    def test_field_params_in_key(self):
+        """
+        Tests that different field selections are cached separately.
+        :return: None
+        """
+
+        url = "/api/event/{}".format(self.event.id)
+        client.get(url)
+        response = client.get(url + "?include_fields=name")
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 1)
+
+    def test_save_invalidates(self):
+        """
+        Tests that saving an event invalidates its detail and the event list.
+        :return: None
+        """
+
+        detail = "/api/event/{}".format(self.event.id)
+        client.get(detail)
+        client.get("/api/event")
+        self.event.name = 'Burning Man 2019'
+        self.event.save()
+        response = client.get(detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data["name"], 'Burning Man 2019')
+        self.assertEqual(client.get("/api/event")['X-Cache'], 'MISS')
+
+    def test_embedded_relation_invalidates(self):
+        """
+        Tests that renaming a client invalidates events that embed it, but not
+         events that only return its id.
+        :return: None
+        """
+
+        embedded = "/api/event/{}?embed_fields=client".format(self.event.id)
+        plain = "/api/event/{}".format(self.event.id)
+        client.get(embedded)
+        client.get(plain)
+        self.client.name = 'Burning Man Project'
+        self.client.save()
+        response = client.get(embedded)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data["client"]["name"], 'Burning Man Project')
+        self.assertEqual(client.get(plain)['X-Cache'], 'HIT')
+
+    def test_purchase_invalidates_counter(self):
+        """
+        Tests that buying a ticket invalidates the event's cached tickets_sold.
+        :return: None
+        """
+
+        url = "/api/event/{}".format(self.event.id)
+        client.get(url)
+        customer = Customer.objects.create(name='James Bowen')
+        client.post("/api/ticket/purchase", {
+            "event": str(self.event.id), "customer": str(customer.id), "quantity": 2
+        })
+        response = client.get(url)
+        self.assertEqual(response.data["tickets_sold"], 2)
+
+    def test_errors_not_cached(self):
+        """
+        Tests that missing objects aren't cached.
+        :return: None
+        """
+
+        url = "/api/client/{}".format(self.event.id)
+        self.assertEqual(client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response_cache.hits.value(), 0)
+
+    def test_counters_in_metrics(self):
+        """
+        Tests that the hit and miss counters are served with the request metrics.
+        :return: None
+        """
+
+        url = "/api/event/{}".format(self.event.id)
+        client.get(url)
+        client.get(url)
+        body = client.get("/metrics").content.decode('utf-8')
+        self.assertIn('tickets_response_cache_hits_total 1\n', body)
+        self.assertIn('tickets_response_cache_misses_total 1\n', body)
+
+    def test_replica_lag_caps_ttl(self):
+        """
+        Tests that responses filled right after an invalidation are only cached for as
+         long as the replicas may lag, when there are replicas.
+        :return: None
+        """
+
+        cache = ResponseCache(LocMemLRUBackend(), ttl=300, replica_lag=5)
+        tags = [model_tag(Event), model_tag(Event, self.event.pk)]
+        with mock.patch('ticketstore.tickets.cache.time.time', return_value=1000.0):
+            cache.invalidate(Event, self.event.pk)
+            self.assertEqual(cache.key('/api/event', tags)[1], 5)
+        with mock.patch('ticketstore.tickets.cache.time.time', return_value=1006.0):
+            self.assertEqual(cache.key('/api/event', tags)[1], 300)
+        cache = ResponseCache(LocMemLRUBackend(), ttl=300)
+        cache.invalidate(Event, self.event.pk)
+        self.assertEqual(cache.key('/api/event', tags)[1], 300)
+
+
+class TestLocMemLRUBackend(test.SimpleTestCase):
+    """
+      Test module for the local memory cache backend
+    """
+
+    def test_evicts_least_recently_used(self):
+        """
+        Tests that the least recently used entry is evicted first.
+        :return: None
+        """
+
+        backend = LocMemLRUBackend(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get_many(['a'])
+        backend.set('c', 3)
+        self.assertEqual(backend.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+    def test_ttl(self):
+        """
+        Tests that entries expire after their TTL.
+        :return: None
+        """
+
+        backend = LocMemLRUBackend()
+        with mock.patch('ticketstore.tickets.cache.time.monotonic', return_value=100.0):
+            backend.set('a', 1, ttl=10)
+        with mock.patch('ticketstore.tickets.cache.time.monotonic', return_value=105.0):
+            self.assertEqual(backend.get_many(['a']), {'a': 1})
+        with mock.patch('ticketstore.tickets.cache.time.monotonic', return_value=111.0):
+            self.assertEqual(backend.get_many(['a']), {})
@@ -0,0 +1,199 @@
+"""
+ Testing file for the change outbox and the /api/changes feed.
+"""
+
+#pylint: disable=E1101
+#pylint: disable=C0103
+
+import time
+from django import test
+from django.db import transaction
+from rest_framework import status
+from .changes import ChangeNotifier, encode_cursor, Cursor
+from .models import Client, Event, Customer, Ticket, Change, SoldOutError, changes_committed
+
+
+client = test.Client()
+
+
+class TestChangeFeed(test.TransactionTestCase):
+    """
+      Test module for the change outbox and feed.  The feed only returns committed
+       changes on PostgreSQL, so every write is committed.
+    """
+
+    def setUp(self):
+        """
+        Setting up a client, an event with 3 seats and a customer.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=3, client_id=self.client.id)
+        self.customer = Customer.objects.create(name='James Bowen')
+
+    def changes(self, **params):
+        """
+        Reads the feed.
+        :param params: Query params.
+        :return: Response data.
+        """
+
+        response = client.get('/api/changes', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_feed(self):
+        """
+        Tests that saves and deletes come in order with the objects' current data.
+        :return: None
+        """
+
+        data = self.changes()
+        self.assertEqual(
+            [(change['resource'], change['action']) for change in data['results']],
+            [('client', 'create'), ('event', 'create'), ('customer', 'create')]
+        )
+        self.assertEqual(data['results'][1]['data']['name'], 'Burning Man 2018')
+        self.assertEqual(data['results'][1]['data']['client'], self.client.id)
+        self.assertFalse(data['more'])
+
+        self.customer.name = 'James Bowen Jr'
+        self.customer.save()
+        other = Customer.objects.create(name='Zoe Jameson')
+        other_id = other.id
+        other.delete()
+        data = self.changes(since=data['next'])
+        self.assertEqual(
+            [(change['id'], change['action'], change['data'] and change['data']['name'])
+             for change in data['results']],
+            [(str(self.customer.id), 'update', 'James Bowen Jr'), (str(other_id), 'delete', None)]
+        )
+        self.assertEqual(self.changes(since=data['next'])['results'], [])
+
+    def test_repeated_changes_keep_their_place(self):
+        """
+        Tests that an object changed again later in a batch stays where it first
+         changed, ahead of the children created after it.
+        :return: None
+        """
+
+        cursor = self.changes(since='now')['next']
+        event = Event.objects.create(
+            name='Burning Man 2019', venue_capacity=3, client_id=self.client.id)
+        ticket = Ticket.objects.create(event=event, customer=self.customer, price=10)
+        event.name = 'Burning Man 2019 Sunday'
+        event.save()
+        data = self.changes(since=cursor)
+        self.assertEqual(
+            [(change['resource'], change['id'], change['action']) for change in data['results']],
+            [('event', str(event.id), 'update'), ('ticket', str(ticket.id), 'create')]
+        )
+        self.assertEqual(data['results'][0]['data']['name'], 'Burning Man 2019 Sunday')
+
+    def test_purchases(self):
+        """
+        Tests that purchases record their tickets and the event's seat count, and
+         that a purchase that fails records nothing.
+        :return: None
+        """
+
+        cursor = self.changes(since='now')['next']
+        tickets = Ticket.objects.purchase(self.event.id, self.customer.id, price=10, quantity=2)
+        with self.assertRaises(SoldOutError):
+            Ticket.objects.purchase(self.event.id, self.customer.id, quantity=2)
+        data = self.changes(since=cursor)
+        self.assertEqual(
+            sorted((change['resource'], change['id'], change['action'])
+                   for change in data['results']),
+            sorted([('event', str(self.event.id), 'update')] +
+                   [('ticket', str(ticket.id), 'create') for ticket in tickets])
+        )
+        event = [change for change in data['results'] if change['resource'] == 'event'][0]
+        self.assertEqual(event['data']['tickets_sold'], 2)
+
+        self.client.delete()
+        data = self.changes(since=data['next'])
+        self.assertEqual(
+            sorted((change['resource'], change['action']) for change in data['results']),
+            [('client', 'delete'), ('event', 'delete'), ('ticket', 'delete'), ('ticket', 'delete')]
+        )
+
+    def test_pages(self):
+        """
+        Tests that the feed is read in batches of page_size.
+        :return: None
+        """
+
+        cursor = self.changes(since='now')['next']
+        for number in range(5):
+            Customer.objects.create(name='Customer {}'.format(number))
+        pages = []
+        more = True
+        while more:
+            data = self.changes(since=cursor, page_size=2)
+            pages.append([change['data']['name'] for change in data['results']])
+            cursor, more = data['next'], data['more']
+        self.assertEqual(pages, [
+            ['Customer 0', 'Customer 1'], ['Customer 2', 'Customer 3'], ['Customer 4']
+        ])
+        self.assertEqual(len(self.changes(since=encode_cursor(Cursor(0, 0)))['results']), 8)
+
+    def test_invalid_params(self):
+        """
+        Tests that malformed cursors and numbers are rejected.
+        :return: None
+        """
+
+        for params in ({'since': 'abc'}, {'since': 'MXwy!'}, {'wait': 'soon'}):
+            response = client.get('/api/changes', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_wait(self):
+        """
+        Tests that a long poll waits for changes and returns at once when there are some.
+        :return: None
+        """
+
+        cursor = self.changes(since='now')['next']
+        start = time.monotonic()
+        data = self.changes(since=cursor, wait=0.2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['next'], cursor)
+
+        Customer.objects.create(name='Zoe Jameson')
+        start = time.monotonic()
+        self.assertEqual(len(self.changes(since=cursor, wait=10)['results']), 1)
+        self.assertLess(time.monotonic() - start, 5)
+
+
+class TestChangeNotifier(test.TransactionTestCase):
+    """
+      Test module for waking up long polls
+    """
+
+    def test_commit_wakes_waiters(self):
+        """
+        Tests that committing a change wakes up waiters, and that rolling one back doesn't.
+        :return: None
+        """
+
+        notifier = ChangeNotifier()
+        changes_committed.connect(notifier.notify, sender=Change)
+        try:
+            generation = notifier.generation
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    Customer.objects.create(name='James Bowen')
+                    raise ValueError()
+            self.assertFalse(notifier.wait(generation, 0.05))
+            self.assertEqual(Change.objects.count(), 0)
+
+            with transaction.atomic():
+                Customer.objects.create(name='Zoe Jameson')
+                self.assertFalse(notifier.wait(generation, 0))
+            self.assertTrue(notifier.wait(generation, 0))
+        finally:
+            changes_committed.disconnect(notifier.notify, sender=Change)
@@ -0,0 +1,198 @@
+"""
+ Testing file for the import_tickets command.
+"""
+
+#pylint: disable=E1101
+#pylint: disable=C0103
+
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django import test
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from .imports import Importer
+from .models import Client, Event, EventSales, Customer, Ticket, Change, ImportCheckpoint
+
+
+class TestImportTickets(test.TestCase):
+    """
+      Test module for the bulk import command
+    """
+
+    client_id = '0192f0e2-8c6a-7b3e-9d4f-1a2b3c4d5e6f'
+    event_id = '0192f0e2-8c6a-7b3e-9d4f-1a2b3c4d5e70'
+    customer_id = '0192f0e2-8c6a-7b3e-9d4f-1a2b3c4d5e71'
+
+    def setUp(self):
+        """
+        Setting up a directory for the input files.
+        :return: None
+        """
+
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """
+        Removing the input files.
+        :return: None
+        """
+
+        shutil.rmtree(self.directory)
+
+    def write(self, filename, content):
+        """
+        Writes an input file.
+        :param filename: Name of the file.
+        :param content: Contents of the file.
+        :return: Path of the file.
+        """
+
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def run_import(self, model, path, *args):
+        """
+        Runs the command, returning what it wrote.
+        :param model: Model argument.
+        :param path: Input file.
+        :param args: Extra command line args.
+        :return: Tuple of stdout and the rejected rows written to stderr.
+        """
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_tickets', model, path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), [json.loads(line) for line in stderr.getvalue().splitlines()]
+
+    def seed(self):
+        """
+        Imports a client, an event with 3 seats and a customer.
+        :return: None
+        """
+
+        self.run_import('client', self.write(
+            'clients.csv', 'id,name\n{},Burning Man\n'.format(self.client_id)))
+        self.run_import('event', self.write('events.ndjson', json.dumps({
+            'id': self.event_id, 'name': 'Burning Man 2018', 'venue_capacity': 3,
+            'client': self.client_id,
+        }) + '\n'))
+        self.run_import('customer', self.write(
+            'customers.csv', 'id,name\n{},James Bowen\n,Zoe Jameson\n'.format(self.customer_id)))
+
+    def test_import(self):
+        """
+        Tests that every model imports, with IDs kept and references checked.
+        :return: None
+        """
+
+        self.seed()
+        self.assertEqual(str(Event.objects.get(pk=self.event_id).client_id), self.client_id)
+        self.assertEqual(Customer.objects.count(), 2)
+
+        tickets = self.write('tickets.csv', '\n'.join([
+            'event,customer,price',
+            '{},{},10.00'.format(self.event_id, self.customer_id),
+            '{},{},'.format(self.event_id, self.customer_id),
+            '{},{},abc'.format(self.event_id, self.customer_id),
+            '{},{},20.00'.format(self.customer_id, self.customer_id),
+        ]) + '\n')
+        output, rejected = self.run_import('ticket', tickets)
+        self.assertIn('4 rows read, 2 loaded, 0 already there, 2 rejected', output)
+        self.assertEqual([row['row'] for row in rejected], [3, 4])
+        self.assertIn('price', rejected[0]['errors'])
+        self.assertEqual(rejected[1]['errors']['event'],
+                         ['Event {} does not exist.'.format(self.customer_id)])
+
+        event = Event.objects.get(pk=self.event_id)
+        self.assertEqual(event.tickets_sold, 2)
+        self.assertEqual(EventSales.objects.get(event_id=self.event_id).gross_revenue, 10)
+        self.assertEqual(sorted(str(ticket.price) for ticket in Ticket.objects.all()),
+                         ['0.00', '10.00'])
+        self.assertEqual(Change.objects.filter(resource='ticket', action=Change.CREATE).count(), 2)
+        self.assertEqual(Change.objects.filter(resource='customer').count(), 2)
+
+    def test_capacity_and_invalid_rows(self):
+        """
+        Tests that tickets over the venue capacity and malformed rows are rejected.
+        :return: None
+        """
+
+        self.seed()
+        row = json.dumps({'event': self.event_id, 'customer': self.customer_id, 'price': 5})
+        output, rejected = self.run_import('ticket', self.write(
+            'tickets.ndjson', '{}\nnot json\n[1]\n{}\n'.format(row, row)))
+        self.assertIn('2 loaded', output)
+        self.assertEqual([row['row'] for row in rejected], [2, 3])
+
+        output, rejected = self.run_import('ticket', self.write(
+            'more.ndjson', '{}\n{}\n'.format(row, row)))
+        self.assertIn('0 loaded', output)
+        self.assertEqual(rejected[0]['errors']['event'],
+                         ['Not enough tickets left for event {}.'.format(self.event_id)])
+        self.assertEqual(Event.objects.get(pk=self.event_id).tickets_sold, 2)
+
+    def test_rerun(self):
+        """
+        Tests that an input isn't imported twice by accident, and that rows whose ID
+         already exists are skipped when it's imported again on purpose.
+        :return: None
+        """
+
+        self.seed()
+        path = os.path.join(self.directory, 'customers.csv')
+        with self.assertRaises(CommandError):
+            self.run_import('customer', path)
+        output, _ = self.run_import('customer', path, '--resume')
+        self.assertIn('already been imported', output)
+        output, _ = self.run_import('customer', path, '--restart')
+        self.assertIn('2 rows read, 1 loaded, 1 already there', output)
+        self.assertEqual(Customer.objects.filter(name='James Bowen').count(), 1)
+
+    def test_resume(self):
+        """
+        Tests that a run that fails part of the way through carries on after the last
+         committed chunk.
+        :return: None
+        """
+
+        path = self.write('clients.ndjson', ''.join(
+            json.dumps({'name': 'Client {}'.format(number)}) + '\n' for number in range(5)))
+        load_chunk = Importer.load_chunk
+        calls = []
+
+        def fail_second_chunk(importer, chunk, checkpoint):
+            """ Fails the second chunk. """
+            calls.append(len(chunk))
+            if len(calls) == 2:
+                raise DatabaseError('disk I/O error')
+            return load_chunk(importer, chunk, checkpoint)
+
+        with mock.patch.object(Importer, 'load_chunk', fail_second_chunk):
+            with self.assertRaisesMessage(CommandError, 'starting at row 3'):
+                self.run_import('client', path, '--chunk-size', '2')
+        self.assertEqual(ImportCheckpoint.objects.get().rows, 2)
+        self.assertEqual(Client.objects.count(), 2)
+
+        output, _ = self.run_import('client', path, '--chunk-size', '2', '--resume')
+        self.assertIn('Resuming', output)
+        self.assertIn('5 rows read, 5 loaded', output)
+        self.assertEqual(sorted(Client.objects.values_list('name', flat=True)),
+                         ['Client {}'.format(number) for number in range(5)])
+        self.assertTrue(ImportCheckpoint.objects.get().finished)
+
+    def test_max_errors(self):
+        """
+        Tests that the import stops once too many rows are rejected, after
+         committing the chunk it's on.
+        :return: None
+        """
+
+        path = self.write('clients.csv', 'name\n' + '{}\nValid\n'.format('x' * 600) * 3)
+        with self.assertRaisesMessage(CommandError, 'Stopped after 2 rejected rows'):
+            self.run_import('client', path, '--chunk-size', '4', '--max-errors', '1')
+        self.assertEqual(Client.objects.count(), 2)
@@ -0,0 +1,116 @@
+"""
+ Testing file for the request metrics middleware and the metrics endpoint.
+"""
+
+#pylint: disable=E1101
+#pylint: disable=C0103
+
+import json
+from django import test
+from .metrics import registry
+from .models import Client, Event, Customer, Ticket
+
+
+client = test.Client()
+
+class TestMetrics(test.TestCase):
+    """
+      Test module for the request metrics
+    """
+
+    def setUp(self):
+        """
+        Setting up a few tickets and empty metrics.
+        :return: None
+        """
+
+        registry.clear()
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=self.client.id)
+        self.customer = Customer.objects.create(name='James Bowen')
+        for _ in range(3):
+            Ticket.objects.create(event_id=self.event.id, customer_id=self.customer.id)
+
+    def get_logged(self, url, level='INFO', **kwargs):
+        """
+        Fetches a URL and returns what the middleware logged about it.
+        :param url: URL to fetch.
+        :param level: Level to capture the log at.
+        :return: Logged record, parsed.
+        """
+
+        with self.assertLogs('ticketstore.tickets.requests', level) as logs:
+            client.get(url, **kwargs)
+        return json.loads(logs.records[-1].getMessage())
+
+    def test_request_record(self):
+        """
+        Tests that a request's route, params and measurements are logged.
+        :return: None
+        """
+
+        record = self.get_logged("/api/ticket?embed_fields=event,bogus&include_fields=id")
+        self.assertEqual(record["endpoint"], "ticket-list")
+        self.assertEqual(record["action"], "list")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["embed_fields"], "event")
+        self.assertEqual(record["include_fields"], "id")
+        self.assertEqual(record["queries"], 2)
+        self.assertGreater(record["serializer_ms"], 0)
+        self.assertGreater(record["response_bytes"], 0)
+
+    def test_prometheus_endpoint(self):
+        """
+        Tests that the histograms are served per endpoint, action and embed.
+        :return: None
+        """
+
+        client.get("/api/ticket?embed_fields=event")
+        client.get("/api/ticket/{}".format(Ticket.objects.first().id))
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode('utf-8')
+        self.assertIn(
+            'tickets_http_request_queries_count'
+            '{endpoint="ticket-list",action="list",embed="event"} 1',
+            body
+        )
+        self.assertIn(
+            'tickets_http_requests_total{endpoint="ticket-detail",action="retrieve",method="GET",'
+            'status="200"} 1',
+            body
+        )
+        self.assertIn('tickets_http_request_duration_seconds_bucket{', body)
+
+    def test_unknown_methods_share_a_label(self):
+        """
+        Tests that methods outside the standard set are counted under one label.
+        :return: None
+        """
+
+        for method in ('FOO', 'BAR', 'GET'):
+            client.generic(method, "/api/event")
+        body = client.get("/metrics").content.decode('utf-8')
+        self.assertIn('tickets_http_requests_total{endpoint="event-list",action="",method="other",'
+                      'status="405"} 2', body)
+        self.assertNotIn('method="FOO"', body)
+
+    def test_prometheus_endpoint_is_local(self):
+        """
+        Tests that the metrics aren't served to other addresses.
+        :return: None
+        """
+
+        self.assertEqual(client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 403)
+
+    @test.override_settings(TICKETS_METRICS={'SLOW_REQUEST_SECONDS': 0, 'SLOW_SAMPLE_RATE': 1.0})
+    def test_slow_request_sql(self):
+        """
+        Tests that sampled slow requests are logged with their SQL.
+        :return: None
+        """
+
+        record = self.get_logged("/api/event", level='WARNING')
+        self.assertEqual(len(record["sql"]), record["queries"])
+        self.assertIn("tickets_event", record["sql"][-1]["sql"])
@@ -0,0 +1,73 @@
+"""
+ Testing file for partitioning the tickets table.  Partitioning needs PostgreSQL,
+  so the statements are checked as they're built.
+"""
+
+#pylint: disable=E1101
+
+from io import StringIO
+from django import test
+from django.core.management import CommandError, call_command
+from django.db import NotSupportedError, connection
+from .models import Ticket
+from .partitions import partition_tickets, rebuild_statements
+
+
+class TestPartitions(test.TestCase):
+    """
+      Test module for the partitioning of the tickets table
+    """
+
+    definition = (
+        'tickets_ticket_pkey',
+        [('ticket_event_created_idx',
+          'CREATE INDEX ticket_event_created_idx ON public.tickets_ticket '
+          'USING btree (event_id, created_at, id)')],
+        [('tickets_ticket_event_id_fk', 'FOREIGN KEY (event_id) REFERENCES tickets_event(id) '
+                                        'DEFERRABLE INITIALLY DEFERRED')],
+    )
+
+    def test_rebuild_statements(self):
+        """
+        Tests that the table is rebuilt with its indexes and constraints under their
+         old names, keyed on the event when it's partitioned.
+        :return: None
+        """
+
+        statements = rebuild_statements(connection, Ticket, self.definition, 4)
+        self.assertEqual(statements[0],
+                         'ALTER TABLE "tickets_ticket" RENAME TO "tickets_ticket_old"')
+        self.assertIn('DROP INDEX "ticket_event_created_idx"', statements)
+        self.assertIn('CREATE TABLE "tickets_ticket" (LIKE "tickets_ticket_old" '
+                      'INCLUDING DEFAULTS) PARTITION BY HASH ("event_id")', statements)
+        self.assertIn('CREATE TABLE "tickets_ticket_p3" PARTITION OF "tickets_ticket" FOR VALUES '
+                      'WITH (MODULUS 4, REMAINDER 3)', statements)
+        self.assertIn('ALTER TABLE "tickets_ticket" ADD CONSTRAINT "tickets_ticket_pkey" '
+                      'PRIMARY KEY ("id", "event_id")', statements)
+        self.assertLess(statements.index('DROP TABLE "tickets_ticket_old"'),
+                        statements.index(self.definition[1][0][1]))
+        self.assertIn('ALTER TABLE "tickets_ticket" ADD CONSTRAINT "tickets_ticket_event_id_fk" '
+                      + self.definition[2][0][1], statements)
+
+        statements = rebuild_statements(connection, Ticket, self.definition, 0)
+        self.assertIn('CREATE TABLE "tickets_ticket" (LIKE "tickets_ticket_old" '
+                      'INCLUDING DEFAULTS)', statements)
+        self.assertIn('ALTER TABLE "tickets_ticket" ADD CONSTRAINT "tickets_ticket_pkey" '
+                      'PRIMARY KEY ("id")', statements)
+        self.assertFalse([sql for sql in statements if 'PARTITION' in sql])
+
+    def test_unsupported(self):
+        """
+        Tests that databases without partitioning are left alone.
+        :return: None
+        """
+
+        if connection.vendor == 'postgresql':
+            self.skipTest('Partitioning is supported.')
+        with self.assertRaises(NotSupportedError):
+            partition_tickets(connection, 4)
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL 11'):
+            call_command('partition_tickets', stdout=StringIO())
+        output = StringIO()
+        call_command('partition_tickets', '--undo', stdout=output)
+        self.assertIn("isn't partitioned", output.getvalue())
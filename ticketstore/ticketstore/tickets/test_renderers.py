@@ -0,0 +1,79 @@
+"""
+ Testing file for the JSON renderers.
+"""
+
+#pylint: disable=E1101
+#pylint: disable=C0103
+
+import datetime
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+from django import test
+from django.utils import timezone
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from . import renderers
+from .models import Client, Event, Customer, Ticket
+from .renderers import FastJSONRenderer
+
+
+client = test.Client()
+
+class TestFastJSONRenderer(test.TestCase):
+    """
+      Test module for the orjson renderer
+    """
+
+    data = [
+        OrderedDict([
+            ('id', uuid.UUID('0192f0e2-8c6a-7b3e-9d4f-1a2b3c4d5e6f')),
+            ('price', '190.00'),
+            ('amount', Decimal('12.50')),
+            ('created_at', datetime.datetime(2018, 11, 20, 9, 30, 1, 123456, tzinfo=timezone.utc)),
+            ('date', datetime.date(2018, 11, 20)),
+            ('name', 'Caf\u00e9 \u2028 \u2029 "quoted" \U0001f600'),
+            ('count', 3),
+            ('empty', None),
+            ('flags', [True, False]),
+        ]),
+        {'errors': [ErrorDetail('Not enough tickets left for this event.', code='sold_out')]},
+        {1: 'integer keys'},
+    ]
+
+    def test_same_bytes_as_json_renderer(self):
+        """
+        Tests that the fast renderer's output matches the JSONRenderer's.
+        :return: None
+        """
+
+        for data in self.data + [self.data, None]:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_and_fallback(self):
+        """
+        Tests that indented output and a missing orjson use the standard encoder.
+        :return: None
+        """
+
+        accepted = 'application/json; indent=4'
+        self.assertEqual(FastJSONRenderer().render(self.data, accepted),
+                         JSONRenderer().render(self.data, accepted))
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_api_responses(self):
+        """
+        Tests that API responses render the same as with the JSONRenderer.
+        :return: None
+        """
+
+        client_object = Client.objects.create(name='Burning Man')
+        event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=client_object.id)
+        customer = Customer.objects.create(name='James Bowen')
+        Ticket.objects.create(event_id=event.id, customer_id=customer.id, price=190.0)
+
+        response = client.get("/api/ticket?embed_fields=event,customer")
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
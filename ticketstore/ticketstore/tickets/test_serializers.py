@@ -7,10 +7,14 @@
 #pylint: disable=E1101
 #pylint: disable=C0103
 
+import json
+from unittest import mock
 from django import test
 from rest_framework import status
+from . import serializers
 from .views import Client, Event, Customer, Ticket
 from .serializers import ClientSerializer, EventSerializer, CustomerSerializer, TicketSerializer
+from .serializers import compile_field_plan
 
 
 client = test.Client()
@@ -54,7 +58,7 @@ class TestGetClient(test.TestCase):
         """
 
         response = client.get("/api/client")
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 class TestGetEvent(test.TestCase):
@@ -98,7 +102,7 @@ class TestGetEvent(test.TestCase):
         """
 
         response = client.get("/api/event")
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 class TestGetCustomer(test.TestCase):
@@ -143,7 +147,7 @@ class TestGetCustomer(test.TestCase):
         """
 
         response = client.get("/api/customer")
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 class TestGetTicket(test.TestCase):
@@ -218,7 +222,7 @@ class TestGetTicket(test.TestCase):
         """
 
         response = client.get("/api/ticket")
-        self.assertEqual(len(response.data), 4)
+        self.assertEqual(len(response.data["results"]), 4)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 class TestDynamicSerializer(test.TestCase):
@@ -318,3 +322,208 @@ class TestDynamicSerializer(test.TestCase):
                               .format(str(self.customers["james_bowen"].id)))
         print("Respone data:, response.data")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TestFieldPlan(test.TestCase):
+    """
+      Test module for the compiled field plans of the dynamic serializers
+    """
+
+    def setUp(self):
+        """
+        Setting up a list of tickets that embed their event and customer.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=self.client.id)
+        for number in range(20):
+            customer = Customer.objects.create(name='Customer {}'.format(number))
+            Ticket.objects.create(event_id=self.event.id, customer_id=customer.id, price=190.0)
+
+    def test_plan_is_cached(self):
+        """
+        Tests that the same params resolve to the same immutable plan object.
+        :return: None
+        """
+
+        plan = compile_field_plan(TicketSerializer, 'price', None, 'event')
+        self.assertIs(plan, compile_field_plan(TicketSerializer, 'price', None, 'event'))
+        self.assertEqual(set(plan.fields), {'price', 'event'})
+        self.assertEqual(plan.embed_fields, frozenset(['event']))
+
+    @test.override_settings(TICKETS_FAST_SERIALIZATION=False)
+    def test_plan_not_rebuilt_per_row(self):
+        """
+        Tests that serializing a list with embeds doesn't look up plans or build
+         nested serializers per row.
+        :return: None
+        """
+
+        with mock.patch.object(serializers, 'compile_field_plan',
+                               wraps=serializers.compile_field_plan) as compiled, \
+                mock.patch.object(EventSerializer, 'get_fields',
+                                  autospec=True,
+                                  side_effect=EventSerializer.get_fields) as event_fields:
+            response = client.get("/api/ticket?embed_fields=event,customer")
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertLessEqual(compiled.call_count, 3)
+        self.assertEqual(event_fields.call_count, 1)
+
+
+class TestValuesSerializer(test.TestCase):
+    """
+      Test module for the .values() fast path of the list and export endpoints
+    """
+
+    def setUp(self):
+        """
+        Setting up tickets across two events and a few customers.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        events = [
+            Event.objects.create(name='Burning Man {}'.format(year), venue_capacity=100,
+                                 client_id=self.client.id)
+            for year in (2018, 2019)
+        ]
+        for number in range(6):
+            customer = Customer.objects.create(name='Customer {}'.format(number))
+            Ticket.objects.create(event_id=events[number % 2].id, customer_id=customer.id,
+                                  price=number * 12.5)
+
+    def assertSameBytes(self, url):
+        """
+        Asserts that the fast path renders exactly what the instance serializers do.
+        :param url: URL to fetch with and without the fast path.
+        :return: None
+        """
+
+        with test.override_settings(TICKETS_FAST_SERIALIZATION=False):
+            expected = client.get(url)
+        actual = client.get(url)
+        self.assertEqual(actual.status_code, status.HTTP_200_OK)
+        content = lambda response: b''.join(response) if response.streaming else response.content
+        self.assertEqual(content(actual), content(expected), url)
+
+    def test_same_output(self):
+        """
+        Tests the fast path against the serializers across the field selection params.
+        :return: None
+        """
+
+        for params in ('', 'include_fields=id,price', 'exclude_fields=created_at,event',
+                       'embed_fields=event', 'embed_fields=customer,event&include_fields=price',
+                       'embed_fields=event,customer&page_size=4'):
+            self.assertSameBytes('/api/ticket?' + params)
+            self.assertSameBytes('/api/ticket/export?' + params)
+        for params in ('', 'include_fields=name,client', 'embed_fields=client'):
+            self.assertSameBytes('/api/event?' + params)
+        next_page = client.get('/api/ticket?page_size=4').data['next']
+        self.assertSameBytes(next_page)
+
+    def test_embeds_joined(self):
+        """
+        Tests that embedded relations are read in the same query as the rows.
+        :return: None
+        """
+
+        plan = compile_field_plan(TicketSerializer, 'price', None, 'event,customer')
+        values_serializer = serializers.compile_values_serializer(TicketSerializer, plan)
+        self.assertIn('event__client_id', values_serializer.columns)
+        with self.assertNumQueries(2):
+            response = client.get("/api/ticket?embed_fields=event,customer")
+        self.assertEqual(response.data["results"][0]["event"]["client"], self.client.id)
+
+
+class TestEmbedTree(test.TestCase):
+    """
+      Test module for multi-level and reverse embeds
+    """
+
+    def setUp(self):
+        """
+        Setting up three events with three tickets each.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.events = [
+            Event.objects.create(name='Burning Man {}'.format(year), venue_capacity=100,
+                                 client_id=self.client.id)
+            for year in (2018, 2019, 2020)
+        ]
+        self.customer = Customer.objects.create(name='James Bowen')
+        for event in self.events:
+            for _ in range(3):
+                Ticket.objects.create(event_id=event.id, customer_id=self.customer.id, price=190.0)
+
+    def test_parse_embeds(self):
+        """
+        Tests that embed paths are parsed into a tree of known relations.
+        :return: None
+        """
+
+        plan = compile_field_plan(TicketSerializer, None, None, 'event.client,customer,bogus.x')
+        self.assertEqual(plan.embeds, (
+            ('customer', CustomerSerializer, ()),
+            ('event', EventSerializer, (('client', ClientSerializer, ()),)),
+        ))
+        self.assertEqual(serializers.embed_paths(plan.embeds), ['customer', 'event.client'])
+        response = client.get("/api/client?embed_fields=events.tickets.event.client")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nested_forward_embed(self):
+        """
+        Tests that an embed of an embed is joined into the page query.
+        :return: None
+        """
+
+        for fast in (True, False):
+            with test.override_settings(TICKETS_FAST_SERIALIZATION=fast), \
+                    self.assertNumQueries(2):
+                response = client.get("/api/ticket?embed_fields=event.client,customer")
+            row = response.data["results"][0]
+            self.assertEqual(row["event"]["client"]["name"], 'Burning Man')
+            self.assertEqual(row["customer"]["name"], 'James Bowen')
+
+    @test.override_settings(TICKETS_REVERSE_EMBED_LIMIT=2)
+    def test_reverse_embed(self):
+        """
+        Tests that reverse relations are batch loaded a level at a time, capped per parent.
+        :return: None
+        """
+
+        url = "/api/event?embed_fields=tickets.customer,client&include_fields=id"
+        with self.assertNumQueries(3):
+            response = client.get(url)
+        for row in response.data["results"]:
+            self.assertEqual(len(row["tickets"]), 2)
+            self.assertEqual(row["tickets"][0]["customer"]["name"], 'James Bowen')
+            self.assertEqual(row["client"]["name"], 'Burning Man')
+        expected = list(Ticket.objects.filter(event_id=self.events[0].id)
+                        .order_by('created_at', 'id').values_list('id', flat=True)[:2])
+        first = [row for row in response.data["results"] if row["id"] == str(self.events[0].id)][0]
+        self.assertEqual([ticket["id"] for ticket in first["tickets"]],
+                         [str(pk) for pk in expected])
+        self.assertNotIn('ETag', response)
+
+        with mock.patch('ticketstore.tickets.loaders.supports_window_functions',
+                        return_value=False):
+            self.assertEqual(client.get(url).data, response.data)
+
+    def test_reverse_embed_retrieve_and_export(self):
+        """
+        Tests two levels of reverse embeds on a single object and in an export.
+        :return: None
+        """
+
+        with self.assertNumQueries(3):
+            response = client.get(
+                "/api/client/{}?embed_fields=events.tickets".format(self.client.id))
+        self.assertEqual(len(response.data["events"]), 3)
+        self.assertEqual(sum(len(event["tickets"]) for event in response.data["events"]), 9)
+        response = client.get("/api/event/export?format=json&embed_fields=tickets")
+        rows = json.loads(b''.join(response))
+        self.assertEqual([len(row["tickets"]) for row in rows], [3, 3, 3])
@@ -0,0 +1,50 @@
+"""
+ Testing file for the primary key generators.
+"""
+
+#pylint: disable=E1101
+
+from django import test
+from .models import Client
+from .uuids import generate_id, uuid7
+
+
+class TestUUID7(test.TestCase):
+    """
+      Test module for the time-ordered UUIDs
+    """
+
+    def test_version_and_variant(self):
+        """
+        Tests that the generated UUIDs are well-formed version 7 UUIDs.
+        :return: None
+        """
+
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, 'specified in RFC 4122')
+
+    def test_strictly_increasing(self):
+        """
+        Tests that UUIDs generated in a tight loop never go backwards, even in the
+         same millisecond.
+        :return: None
+        """
+
+        values = [uuid7() for _ in range(10000)]
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+        self.assertEqual([value.hex for value in values], sorted(value.hex for value in values))
+
+    def test_setting_picks_version(self):
+        """
+        Tests that the TICKETS_UUID_VERSION setting picks the key scheme for new rows.
+        :return: None
+        """
+
+        with self.settings(TICKETS_UUID_VERSION=4):
+            self.assertEqual(generate_id().version, 4)
+            self.assertEqual(Client.objects.create(name='Burning Man').id.version, 4)
+        with self.settings(TICKETS_UUID_VERSION=7):
+            self.assertEqual(generate_id().version, 7)
+            self.assertEqual(Client.objects.create(name='Comic-Con').id.version, 7)
@@ -0,0 +1,1032 @@
+"""
+ Testing file for the viewsets.  Tests the query planning done by the viewsets
+  on top of the dynamic model serializers.
+"""
+
+#pylint: disable=E1101
+#pylint: disable=C0103
+
+import json
+import uuid
+from io import StringIO
+from unittest import mock, skipUnless
+from django import test
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from .apps import ensure_search_indexes
+from .models import Client, Event, EventSales, Customer, Ticket, SoldOutError
+from .serializers import TicketSerializer
+from .pagination import KeysetCursorPagination
+
+
+client = test.Client()
+
+class TestQueryPlanning(test.TestCase):
+    """
+      Test module for the select_related/only planning of the viewsets
+    """
+
+    def setUp(self):
+        """
+        Setting up enough tickets that an N+1 pattern would show up in the query count.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.events = [
+            Event.objects.create(
+                name='Burning Man {}'.format(year),
+                venue_capacity=1000,
+                client_id=self.client.id
+            ) for year in range(2015, 2020)
+        ]
+        self.customers = [
+            Customer.objects.create(name='Customer {}'.format(number)) for number in range(10)
+        ]
+        for event in self.events:
+            for customer in self.customers:
+                Ticket.objects.create(event_id=event.id, customer_id=customer.id, price=190.0)
+
+    def test_embedded_ticket_list_query_count(self):
+        """
+        Tests that embedding the event and customer on the ticket list costs a fixed
+         number of queries no matter how many tickets are returned.
+        :return: None
+        """
+
+        # One query for the ETag, and one for the tickets.
+        with self.assertNumQueries(2):
+            response = client.get("/api/ticket?embed_fields=event,customer")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 50)
+        self.assertEqual(response.data["results"][0]["event"]["client"], self.client.id)
+        self.assertTrue("name" in response.data["results"][0]["customer"])
+
+    def test_embedded_event_list_query_count(self):
+        """
+        Tests that embedding the client on the event list doesn't cost a query per event.
+        :return: None
+        """
+
+        with self.assertNumQueries(2):
+            response = client.get("/api/event?embed_fields=client")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual(response.data["results"][0]["client"]["name"], 'Burning Man')
+
+    def test_embedded_ticket_retrieve_query_count(self):
+        """
+        Tests that retrieving a single ticket with embeds loads it in one query.
+        :return: None
+        """
+
+        ticket = Ticket.objects.first()
+        with self.assertNumQueries(2):
+            response = client.get("/api/ticket/{}?embed_fields=event,customer".format(ticket.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["event"]["id"], str(ticket.event_id))
+
+    def test_include_fields_only_loads_requested_columns(self):
+        """
+        Tests that include_fields restricts the columns selected from the database.
+        :return: None
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/api/customer?include_fields=id")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        self.assertTrue('"name"' not in queries[1]['sql'])
+
+class TestKeysetPagination(test.TestCase):
+    """
+      Test module for the cursor pagination of the list endpoints
+    """
+
+    def setUp(self):
+        """
+        Setting up customers that all share a creation time, so the id tie-break is exercised.
+        :return: None
+        """
+
+        self.customers = [
+            Customer.objects.create(name='Customer {}'.format(number)) for number in range(25)
+        ]
+        Customer.objects.update(created_at=self.customers[0].created_at)
+
+    def walk(self, url):
+        """
+        Follows the next links from the given URL until the last page.
+        :param url: URL of the first page.
+        :return: List of the pages' response data.
+        """
+
+        pages = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data["next"]
+        return pages
+
+    def test_pages_cover_every_row_once(self):
+        """
+        Tests that walking the next links returns every row exactly once, in a stable order.
+        :return: None
+        """
+
+        pages = self.walk("/api/customer?page_size=10")
+        self.assertEqual([len(page["results"]) for page in pages], [10, 10, 5])
+        ids = [row["id"] for page in pages for row in page["results"]]
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(ids, sorted(ids))
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link_returns_prior_page(self):
+        """
+        Tests that the previous link of the second page returns the first page.
+        :return: None
+        """
+
+        first = client.get("/api/customer?page_size=10").data
+        second = client.get(first["next"]).data
+        previous = client.get(second["previous"]).data
+        self.assertEqual(previous["results"], first["results"])
+
+    def test_page_size_is_capped(self):
+        """
+        Tests that the requested page size can't go above the server maximum.
+        :return: None
+        """
+
+        with mock.patch.object(KeysetCursorPagination, 'max_page_size', 3):
+            response = client.get("/api/customer?page_size=50")
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_invalid_cursor(self):
+        """
+        Tests that a tampered cursor is rejected rather than erroring.
+        :return: None
+        """
+
+        response = client.get("/api/customer?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_later_page_query_count(self):
+        """
+        Tests that a later page costs the same queries as the first page.
+        :return: None
+        """
+
+        first = client.get("/api/customer?page_size=10").data
+        with self.assertNumQueries(2):
+            response = client.get(first["next"])
+        self.assertEqual(len(response.data["results"]), 10)
+
+class TestExport(test.TestCase):
+    """
+      Test module for the streaming export action
+    """
+
+    def setUp(self):
+        """
+        Setting up a handful of tickets to export.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=self.client.id)
+        self.customers = [
+            Customer.objects.create(name='Customer {}'.format(number)) for number in range(5)
+        ]
+        for customer in self.customers:
+            Ticket.objects.create(event_id=self.event.id, customer_id=customer.id, price=190.0)
+
+    def test_export_ndjson(self):
+        """
+        Tests that the export streams one JSON object per line, honoring embed_fields,
+         in a single query.
+        :return: None
+        """
+
+        with self.assertNumQueries(1):
+            response = client.get("/api/ticket/export?embed_fields=event,customer")
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.decode('utf-8').splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["event"]["name"], 'Burning Man 2018')
+
+    def test_export_json_include_fields(self):
+        """
+        Tests that ?format=json streams a JSON array and include_fields is honored.
+        :return: None
+        """
+
+        response = client.get("/api/ticket/export?format=json&include_fields=price")
+        rows = json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        self.assertEqual(rows, [{"price": "190.00"}] * 5)
+
+    def test_export_empty(self):
+        """
+        Tests that an empty export is still valid JSON.
+        :return: None
+        """
+
+        Ticket.objects.all().delete()
+        response = client.get("/api/ticket/export?format=json")
+        self.assertEqual(json.loads(b''.join(response.streaming_content).decode('utf-8')), [])
+
+class TestPurchase(test.TestCase):
+    """
+      Test module for the capacity-checked ticket purchase action
+    """
+
+    def setUp(self):
+        """
+        Setting up a small event to buy out.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=3, client_id=self.client.id)
+        self.customer = Customer.objects.create(name='James Bowen')
+
+    def purchase(self, quantity=1, event_id=None):
+        """
+        Posts a purchase for the test customer.
+        :param quantity: Number of tickets to buy.
+        :param event_id: ID of the event, defaults to the test event.
+        :return: Response object.
+        """
+
+        return client.post("/api/ticket/purchase", {
+            "event": str(event_id or self.event.id),
+            "customer": str(self.customer.id),
+            "price": "190.00",
+            "quantity": quantity,
+        })
+
+    def test_purchase_up_to_capacity(self):
+        """
+        Tests that purchases succeed up to the venue capacity and are refused after.
+        :return: None
+        """
+
+        response = self.purchase(quantity=2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(self.purchase(quantity=2).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.purchase().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.purchase().status_code, status.HTTP_409_CONFLICT)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 3)
+        self.assertEqual(Ticket.objects.filter(event_id=self.event.id).count(), 3)
+
+    def test_delete_releases_seat(self):
+        """
+        Tests that deleting a ticket gives its seat back to the event.
+        :return: None
+        """
+
+        self.purchase(quantity=3)
+        Ticket.objects.filter(event_id=self.event.id).first().delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 2)
+        self.assertEqual(self.purchase().status_code, status.HTTP_201_CREATED)
+
+    def test_create_respects_capacity(self):
+        """
+        Tests that creating tickets directly also reserves seats.
+        :return: None
+        """
+
+        for _ in range(3):
+            Ticket.objects.create(event_id=self.event.id, customer_id=self.customer.id)
+        with self.assertRaises(SoldOutError):
+            Ticket.objects.create(event_id=self.event.id, customer_id=self.customer.id)
+        self.assertEqual(Ticket.objects.count(), 3)
+
+    def test_move_respects_capacity(self):
+        """
+        Tests that moving a ticket to another event takes a seat there and gives its
+         seat back, and that it can't be moved to a sold out event.
+        :return: None
+        """
+
+        full = Event.objects.create(name='Comic-Con', venue_capacity=1, client_id=self.client.id)
+        Ticket.objects.create(event_id=full.id, customer_id=self.customer.id)
+        ticket = Ticket.objects.create(event_id=self.event.id, customer_id=self.customer.id)
+        ticket.event_id = full.id
+        with self.assertRaises(SoldOutError):
+            ticket.save()
+
+        full.venue_capacity = 2
+        full.save()
+        ticket.save()
+        full.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(full.tickets_sold, 2)
+        self.assertEqual(self.event.tickets_sold, 0)
+        self.assertEqual(Ticket.objects.filter(event_id=full.id).count(), 2)
+
+    def test_purchase_unknown_event(self):
+        """
+        Tests that buying tickets for an event that doesn't exist is a validation error.
+        :return: None
+        """
+
+        response = self.purchase(event_id=self.customer.id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue("event" in response.data)
+
+class TestBulkIssue(test.TestCase):
+    """
+      Test module for the bulk ticket issuance action
+    """
+
+    def setUp(self):
+        """
+        Setting up a roomy event, a tiny event and some customers.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=self.client.id)
+        self.small_event = Event.objects.create(
+            name='Burning Man Afterparty', venue_capacity=2, client_id=self.client.id)
+        self.customers = [
+            Customer.objects.create(name='Customer {}'.format(number)) for number in range(5)
+        ]
+
+    def bulk(self, items):
+        """
+        Posts a batch of tickets.
+        :param items: List of ticket payloads.
+        :return: Response object.
+        """
+
+        return client.post("/api/ticket/bulk", json.dumps(items), content_type="application/json")
+
+    def items(self, event, count):
+        """
+        Builds ticket payloads for an event, cycling through the customers.
+        :param event: Event to issue tickets for.
+        :param count: Number of tickets.
+        :return: List of ticket payloads.
+        """
+
+        return [{
+            "event": str(event.id),
+            "customer": str(self.customers[number % len(self.customers)].id),
+            "price": "50.00",
+        } for number in range(count)]
+
+    def test_bulk_issue_constant_queries(self):
+        """
+        Tests that a batch costs the same number of queries whatever its size.
+        :return: None
+        """
+
+        with CaptureQueriesContext(connection) as small:
+            self.bulk(self.items(self.event, 5))
+        with mock.patch('ticketstore.tickets.views.TicketViewSet.bulk_batch_size', 1000):
+            with CaptureQueriesContext(connection) as large:
+                response = self.bulk(self.items(self.event, 150))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Ticket.objects.count(), 155)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 155)
+
+    def test_bulk_issue_per_item_results(self):
+        """
+        Tests that invalid items, unknown references and sold out events are reported
+         per item while the rest of the batch is issued.
+        :return: None
+        """
+
+        items = self.items(self.event, 2) + self.items(self.small_event, 3) + [
+            {"event": "not-a-uuid", "customer": str(self.customers[0].id)},
+            {"event": str(self.event.id), "customer": str(self.event.id)},
+        ]
+        response = self.bulk(items)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [result["status"] for result in response.data],
+            [201, 201, 409, 409, 409, 400, 400]
+        )
+        self.assertTrue("event" in response.data[5]["errors"])
+        self.assertTrue("customer" in response.data[6]["errors"])
+        self.assertEqual(response.data[0]["ticket"]["event"], self.event.id)
+        self.small_event.refresh_from_db()
+        self.assertEqual(self.small_event.tickets_sold, 0)
+        self.assertEqual(Ticket.objects.count(), 2)
+
+    def test_bulk_requires_list(self):
+        """
+        Tests that the bulk action only takes a list.
+        :return: None
+        """
+
+        response = self.bulk({"event": str(self.event.id)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TestQueryFilters(test.TestCase):
+    """
+      Test module for the indexed query param filters
+    """
+
+    def setUp(self):
+        """
+        Setting up two events with tickets for different customers.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.events = [
+            Event.objects.create(name=name, venue_capacity=1000, client_id=self.client.id)
+            for name in ('Burning Man 2018', 'Burning Man 2019', 'Comic-Con 2019')
+        ]
+        self.customers = [
+            Customer.objects.create(name=name)
+            for name in ('James Bowen', 'Amanda Arias', 'Beau Jeppesen', 'Bea Arthur')
+        ]
+        for event in self.events[:2]:
+            for customer in self.customers:
+                Ticket.objects.create(event_id=event.id, customer_id=customer.id, price=190.0)
+
+    def test_tickets_by_event_and_customer(self):
+        """
+        Tests filtering tickets by event, and by event and customer together.
+        :return: None
+        """
+
+        response = client.get("/api/ticket?event={}".format(self.events[0].id))
+        self.assertEqual(len(response.data["results"]), 4)
+        response = client.get("/api/ticket?event={}&customer={}".format(
+            self.events[0].id, self.customers[0].id))
+        self.assertEqual(len(response.data["results"]), 1)
+        response = client.get("/api/ticket?event={}".format(self.events[2].id))
+        self.assertEqual(len(response.data["results"]), 0)
+
+    def test_name_filters(self):
+        """
+        Tests exact and prefix name filters.
+        :return: None
+        """
+
+        response = client.get("/api/event?name=Burning Man 2019")
+        self.assertEqual([row["id"] for row in response.data["results"]], [str(self.events[1].id)])
+        response = client.get("/api/customer?name_prefix=Bea")
+        self.assertEqual(
+            sorted(row["name"] for row in response.data["results"]),
+            ['Bea Arthur', 'Beau Jeppesen']
+        )
+        response = client.get("/api/event?name_prefix=Burning&client={}".format(self.client.id))
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_prefix_is_case_sensitive_range(self):
+        """
+        Tests that the prefix lookup matches exactly, without case folding or wildcards.
+        :return: None
+        """
+
+        self.assertEqual(Customer.objects.filter(name__prefix='bea').count(), 0)
+        self.assertEqual(Customer.objects.filter(name__prefix='Beau').count(), 1)
+        self.assertEqual(Customer.objects.filter(name__prefix='Bea Arthur').count(), 1)
+        self.assertEqual(Customer.objects.filter(name__prefix='B_a').count(), 0)
+        self.assertEqual(Customer.objects.filter(name__prefix='%').count(), 0)
+
+    def test_invalid_filter_value(self):
+        """
+        Tests that malformed filter values are a validation error.
+        :return: None
+        """
+
+        response = client.get("/api/ticket?event=not-a-uuid")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue("event" in response.data)
+
+class TestNestedRoutes(test.TestCase):
+    """
+      Test module for the nested sub-resource routes
+    """
+
+    def setUp(self):
+        """
+        Setting up two clients' events with tickets for different customers.
+        :return: None
+        """
+
+        self.clients = [Client.objects.create(name=name) for name in ('Burning Man', 'Comic-Con')]
+        self.events = [
+            Event.objects.create(name='Event {}'.format(number), venue_capacity=1000,
+                                 client_id=self.clients[number % 2].id)
+            for number in range(3)
+        ]
+        self.customers = [
+            Customer.objects.create(name=name) for name in ('James Bowen', 'Bea Arthur')
+        ]
+        for event in self.events:
+            for customer in self.customers:
+                Ticket.objects.create(event_id=event.id, customer_id=customer.id, price=190.0)
+
+    def test_children_of_parent(self):
+        """
+        Tests that each route returns the parent's children only.
+        :return: None
+        """
+
+        response = client.get("/api/client/{}/events".format(self.clients[0].id))
+        self.assertEqual(sorted(row["name"] for row in response.data["results"]),
+                         ['Event 0', 'Event 2'])
+        response = client.get(
+            "/api/event/{}/tickets?embed_fields=customer".format(self.events[1].id))
+        self.assertEqual(sorted(row["customer"]["name"] for row in response.data["results"]),
+                         ['Bea Arthur', 'James Bowen'])
+        response = client.get("/api/customer/{}/tickets?include_fields=event".format(
+            self.customers[0].id))
+        self.assertEqual(sorted(row["event"] for row in response.data["results"]),
+                         sorted(event.id for event in self.events))
+        self.assertEqual(set(response.data["results"][0]), {"event"})
+
+    def test_pages_and_filters(self):
+        """
+        Tests that nested lists page with cursors and take the child's filters.
+        :return: None
+        """
+
+        url = "/api/customer/{}/tickets?page_size=2".format(self.customers[1].id)
+        response = client.get(url)
+        self.assertEqual(len(response.data["results"]), 2)
+        response = client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+        response = client.get("/api/customer/{}/tickets?event={}".format(
+            self.customers[1].id, self.events[0].id))
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_query_count(self):
+        """
+        Tests that a nested page costs the ETag query plus the page query.
+        :return: None
+        """
+
+        with self.assertNumQueries(2):
+            response = client.get("/api/event/{}/tickets?embed_fields=event,customer".format(
+                self.events[0].id))
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_unknown_parent(self):
+        """
+        Tests that an unknown parent is a 404 rather than an empty list.
+        :return: None
+        """
+
+        event = Event.objects.create(
+            name='Event 3', venue_capacity=10, client_id=self.clients[0].id)
+        response = client.get("/api/event/{}/tickets".format(event.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+        response = client.get("/api/event/{}/tickets".format(uuid.uuid4()))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = client.get("/api/event/not-a-uuid/tickets")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class TestConditionalRequests(test.TestCase):
+    """
+      Test module for ETag and Last-Modified support
+    """
+
+    def setUp(self):
+        """
+        Setting up an event with a ticket.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=1000, client_id=self.client.id)
+        self.customer = Customer.objects.create(name='James Bowen')
+        self.ticket = Ticket.objects.create(
+            event_id=self.event.id, customer_id=self.customer.id, price=190.0)
+
+    def test_not_modified_skips_serializer(self):
+        """
+        Tests that a matching If-None-Match gets a 304 without serializing anything.
+        :return: None
+        """
+
+        url = "/api/ticket/{}".format(self.ticket.id)
+        response = client.get(url)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        with mock.patch.object(TicketSerializer, 'to_representation') as to_representation, \
+                self.assertNumQueries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(to_representation.called)
+
+    def test_if_modified_since(self):
+        """
+        Tests that If-Modified-Since is answered from the row's updated_at.
+        :return: None
+        """
+
+        url = "/api/customer/{}".format(self.customer.id)
+        last_modified = client.get(url)['Last-Modified']
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_update_changes_etag(self):
+        """
+        Tests that saving the object, or an embedded relation, changes the ETag.
+        :return: None
+        """
+
+        plain = "/api/event/{}".format(self.event.id)
+        embedded = plain + "?embed_fields=client"
+        plain_etag = client.get(plain)['ETag']
+        embedded_etag = client.get(embedded)['ETag']
+        self.assertNotEqual(plain_etag, embedded_etag)
+
+        self.client.name = 'Burning Man Project'
+        self.client.save()
+        self.assertEqual(client.get(plain, HTTP_IF_NONE_MATCH=plain_etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        response = client.get(embedded, HTTP_IF_NONE_MATCH=embedded_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["client"]["name"], 'Burning Man Project')
+
+        Ticket.objects.purchase(self.event.id, self.customer.id)
+        response = client.get(plain, HTTP_IF_NONE_MATCH=plain_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["tickets_sold"], 2)
+
+    def test_list_etag(self):
+        """
+        Tests that a list's ETag changes when rows are added or removed under its filters.
+        :return: None
+        """
+
+        url = "/api/ticket?event={}".format(self.event.id)
+        etag = client.get(url)['ETag']
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        other_event = Event.objects.create(
+            name='Burning Man 2019', venue_capacity=1000, client_id=self.client.id)
+        Ticket.objects.create(event_id=other_event.id, customer_id=self.customer.id)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.ticket.delete()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 0)
+
+    def test_list_validators_read_the_page(self):
+        """
+        Tests that a list's ETag is worked out from the rows on the page rather than an
+         aggregate over every row, and that lists have no Last-Modified, which a
+         delete wouldn't move.
+        :return: None
+        """
+
+        for _ in range(3):
+            Ticket.objects.create(event_id=self.event.id, customer_id=self.customer.id)
+        url = "/api/ticket?page_size=2"
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertNotIn('COUNT(', queries[0]['sql'])
+        self.assertNotIn('MAX(', queries[0]['sql'])
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+        etag = response['ETag']
+        Ticket.objects.order_by('-created_at', '-id').first().delete()
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        Ticket.objects.order_by('created_at', 'id').first().delete()
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+
+    def test_missing_object(self):
+        """
+        Tests that a missing object is still a 404.
+        :return: None
+        """
+
+        response = client.get("/api/ticket/{}".format(self.event.id), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestSalesStats(test.TestCase):
+    """
+      Test module for the stats actions and the sales rollups behind them
+    """
+
+    def setUp(self):
+        """
+        Setting up two events for one client and a customer to buy tickets.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=10, client_id=self.client.id)
+        self.other_event = Event.objects.create(
+            name='Burning Man 2019', venue_capacity=5, client_id=self.client.id)
+        self.customer = Customer.objects.create(name='James Bowen')
+
+    def stats(self, event):
+        """
+        Fetches an event's stats.
+        :param event: Event to fetch the stats of.
+        :return: Response data.
+        """
+
+        response = client.get("/api/event/{}/stats".format(event.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_stats_follow_ticket_changes(self):
+        """
+        Tests that purchases, bulk issues, price changes and deletes update the rollup.
+        :return: None
+        """
+
+        Ticket.objects.purchase(self.event.id, self.customer.id, price='10.00', quantity=3)
+        Ticket.objects.bulk_issue([
+            Ticket(event_id=self.event.id, customer_id=self.customer.id, price='2.50')
+            for _ in range(2)
+        ])
+        data = self.stats(self.event)
+        self.assertEqual(data["tickets_sold"], 5)
+        self.assertEqual(data["remaining_capacity"], 5)
+        self.assertEqual(data["gross_revenue"], "35.00")
+
+        ticket = Ticket.objects.filter(event_id=self.event.id, price='10.00').first()
+        response = client.patch("/api/ticket/{}".format(ticket.id), json.dumps({"price": "4.00"}),
+                                content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stats(self.event)["gross_revenue"], "29.00")
+
+        ticket.refresh_from_db()
+        ticket.delete()
+        data = self.stats(self.event)
+        self.assertEqual(data["tickets_sold"], 4)
+        self.assertEqual(data["remaining_capacity"], 6)
+        self.assertEqual(data["gross_revenue"], "25.00")
+
+    def test_event_stats_single_query(self):
+        """
+        Tests that an event's stats are read without aggregating its tickets.
+        :return: None
+        """
+
+        Ticket.objects.purchase(self.event.id, self.customer.id, price='10.00', quantity=3)
+        with CaptureQueriesContext(connection) as queries:
+            self.stats(self.event)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("tickets_ticket", queries[0]["sql"])
+
+    def test_client_stats(self):
+        """
+        Tests that a client's stats add up the stats of its events.
+        :return: None
+        """
+
+        Ticket.objects.purchase(self.event.id, self.customer.id, price='10.00', quantity=3)
+        Ticket.objects.purchase(self.other_event.id, self.customer.id, price='20.00')
+        response = client.get("/api/client/{}/stats".format(self.client.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["events"], 2)
+        self.assertEqual(response.data["tickets_sold"], 4)
+        self.assertEqual(response.data["remaining_capacity"], 11)
+        self.assertEqual(response.data["gross_revenue"], "50.00")
+
+    def test_unknown_event(self):
+        """
+        Tests that the stats of an event that doesn't exist are a 404.
+        :return: None
+        """
+
+        response = client.get("/api/event/{}/stats".format(self.customer.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_event_with_tickets(self):
+        """
+        Tests that deleting an event takes its tickets and rollup with it.
+        :return: None
+        """
+
+        Ticket.objects.purchase(self.event.id, self.customer.id, price='10.00', quantity=3)
+        self.event.delete()
+        self.assertFalse(EventSales.objects.filter(event_id=self.event.id).exists())
+        self.assertEqual(Ticket.objects.count(), 0)
+
+    def test_cascade_delete_constant_queries(self):
+        """
+        Tests that deleting a customer gives back their seats and takes their tickets
+         out of the rollups with the same queries however many tickets they have.
+        :return: None
+        """
+
+        other = Customer.objects.create(name='Bea Arthur')
+        for customer, quantity in ((self.customer, 1), (other, 4)):
+            Ticket.objects.purchase(self.event.id, customer.id, price='10.00', quantity=quantity)
+            Ticket.objects.purchase(self.other_event.id, customer.id, price='20.00')
+        Ticket.objects.purchase(self.event.id, self.customer.id, price='5.00')
+        with CaptureQueriesContext(connection) as few:
+            self.customer.delete()
+        with CaptureQueriesContext(connection) as many:
+            other.delete()
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(Ticket.objects.count(), 0)
+        for event in (self.event, self.other_event):
+            data = self.stats(event)
+            self.assertEqual(data["tickets_sold"], 0)
+            self.assertEqual(data["remaining_capacity"], event.venue_capacity)
+            self.assertEqual(data["gross_revenue"], "0.00")
+
+    def test_rebuild_fixes_drift(self):
+        """
+        Tests that the rebuild command reports drifted rollups and recounts them.
+        :return: None
+        """
+
+        Ticket.objects.purchase(self.event.id, self.customer.id, price='10.00', quantity=3)
+        EventSales.objects.filter(event_id=self.event.id).update(tickets_sold=7, gross_revenue=1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sales_rollups', check=True, stdout=StringIO())
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        call_command('rebuild_sales_rollups', check=True, stdout=StringIO())
+        data = self.stats(self.event)
+        self.assertEqual(data["tickets_sold"], 3)
+        self.assertEqual(data["gross_revenue"], "30.00")
+
+
+class TestNameSearch(test.TestCase):
+    """
+      Test module for the name search actions
+    """
+
+    def setUp(self):
+        """
+        Setting up customers and events with overlapping names.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.other_client = Client.objects.create(name='Coachella')
+        self.james = Customer.objects.create(name='James Bowen')
+        self.jamie = Customer.objects.create(name='Jamie Bowes')
+        self.zoe = Customer.objects.create(name='Zoë Jameson')
+        Customer.objects.create(name='Bob Smith')
+        Event.objects.create(name='Burning Man 2018', venue_capacity=10, client_id=self.client.id)
+        Event.objects.create(name='Burning Man 2019', venue_capacity=10, client_id=self.client.id)
+        Event.objects.create(name='Man Made', venue_capacity=10, client_id=self.other_client.id)
+
+    @staticmethod
+    def search(resource, **params):
+        """
+        Searches a resource, asserting a 200.
+        :param resource: Name of the resource, e.g. customer.
+        :param params: Query params.
+        :return: Response data.
+        """
+
+        response = client.get("/api/{}/search".format(resource), params)
+        assert response.status_code == status.HTTP_200_OK, response.content
+        return response.data
+
+    def names(self, resource, **params):
+        """
+        :return: Names of the matches of a search, in order.
+        """
+
+        return [row["name"] for row in self.search(resource, **params)["results"]]
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_word_prefixes(self):
+        """
+        Tests that every word of the query matches a word prefix, in any order,
+         ignoring case and accents.
+        :return: None
+        """
+
+        self.assertEqual(sorted(self.names("customer", q="jam")),
+                         ["James Bowen", "Jamie Bowes", "Zoë Jameson"])
+        self.assertEqual(sorted(self.names("customer", q="bow JAM")),
+                         ["James Bowen", "Jamie Bowes"])
+        self.assertEqual(self.names("customer", q="zoe"), ["Zoë Jameson"])
+        self.assertEqual(self.names("customer", q="owen"), [])
+        self.assertEqual(self.names("customer", q='"jam*" OR'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_ranking_and_filters(self):
+        """
+        Tests that better matches come first and that the viewset's filters apply.
+        :return: None
+        """
+
+        Customer.objects.create(name='Bowen Bowen')
+        self.assertEqual(self.names("customer", q="bowen")[0], "Bowen Bowen")
+        self.assertEqual(sorted(self.names("event", q="man")),
+                         ["Burning Man 2018", "Burning Man 2019", "Man Made"])
+        self.assertEqual(self.names("event", q="man", client=str(self.other_client.id)),
+                         ["Man Made"])
+        self.assertEqual(self.names("client", q="coach"), ["Coachella"])
+        with test.override_settings(TICKETS_SEARCH_RANK_LIMIT=2):
+            self.assertEqual(sorted(self.names("customer", q="jam")),
+                             ["James Bowen", "Jamie Bowes"])
+
+    def test_index_follows_writes(self):
+        """
+        Tests that renamed and deleted rows are searched by their current names.
+        :return: None
+        """
+
+        self.james.name = 'Jim Bowman'
+        self.james.save()
+        self.jamie.delete()
+        self.assertEqual(self.names("customer", q="bow"), ["Jim Bowman"])
+        self.assertEqual(self.names("customer", q="james bow"), [])
+
+    def test_pagination(self):
+        """
+        Tests that pages are linked by offset, and fields can be picked.
+        :return: None
+        """
+
+        data = self.search("customer", q="jam", page_size=2, include_fields="id,name")
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(set(data["results"][0]), {"id", "name"})
+        self.assertIsNone(data["previous"])
+        last = client.get(data["next"]).data
+        self.assertEqual(len(last["results"]), 1)
+        self.assertIsNone(last["next"])
+        self.assertIsNotNone(last["previous"])
+        seen = {row["id"] for row in data["results"] + last["results"]}
+        self.assertEqual(seen, {str(self.james.id), str(self.jamie.id), str(self.zoe.id)})
+
+    def test_invalid_requests(self):
+        """
+        Tests that short queries and bad offsets are rejected, and that tickets
+         aren't searchable.
+        :return: None
+        """
+
+        response = client.get("/api/customer/search", {"q": "j"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get("/api/customer/search", {"q": "jam", "offset": "5000"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = client.get("/api/ticket/search", {"q": "jam"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_prefix_fallback(self):
+        """
+        Tests that databases without a search index fall back to name prefixes.
+        :return: None
+        """
+
+        with mock.patch('ticketstore.tickets.search.has_fts_index', return_value=False):
+            self.assertEqual(self.names("customer", q="Jam"), ["James Bowen", "Jamie Bowes"])
+            self.assertEqual(self.names("customer", q="bow"), [])
+
+    def test_rebuild_command(self):
+        """
+        Tests that the rebuild command refills the index from the tables.
+        :return: None
+        """
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(sorted(self.names("customer", q="jam")),
+                         ["James Bowen", "Jamie Bowes", "Zoë Jameson"])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_migrate_restores_triggers(self):
+        """
+        Tests that a migrate puts back triggers dropped by a table rebuild, and catches
+         up on the rows written while they were gone.
+        :return: None
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER tickets_customer_search_insert')
+        Customer.objects.create(name='Jamal Jones')
+        ensure_search_indexes(apps.get_app_config('tickets'), connection.alias)
+        Customer.objects.create(name='Jamila Jones')
+        self.assertEqual(sorted(self.names("customer", q="jam jones")),
+                         ["Jamal Jones", "Jamila Jones"])
+        with CaptureQueriesContext(connection) as queries:
+            ensure_search_indexes(apps.get_app_config('tickets'), connection.alias)
+        self.assertFalse([query for query in queries if 'CREATE' in query['sql']])
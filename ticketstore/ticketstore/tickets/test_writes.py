@@ -0,0 +1,79 @@
+"""
+ Testing file for the coalescing purchase queue and the SQLite connection tuning.
+"""
+
+#pylint: disable=E1101
+
+from concurrent.futures import Future
+from unittest import skipUnless
+from django import test
+from django.db import connection
+from .models import Client, Event, Customer, Ticket, SoldOutError
+from .writes import PurchaseQueue
+
+
+class TestPurchaseQueue(test.TestCase):
+    """
+      Test module for the coalescing purchase queue
+    """
+
+    def setUp(self):
+        """
+        Setting up a roomy event, a tiny event and a customer.
+        :return: None
+        """
+
+        self.client = Client.objects.create(name='Burning Man')
+        self.event = Event.objects.create(
+            name='Burning Man 2018', venue_capacity=100, client_id=self.client.id)
+        self.small_event = Event.objects.create(
+            name='Burning Man Afterparty', venue_capacity=1, client_id=self.client.id)
+        self.customer = Customer.objects.create(name='James Bowen')
+
+    def test_batch_isolates_sold_out_purchases(self):
+        """
+        Tests that a sold out purchase fails on its own without affecting its batch.
+        :return: None
+        """
+
+        batch = [
+            (Future(), (self.event.id, self.customer.id, 10, 2)),
+            (Future(), (self.small_event.id, self.customer.id, 10, 2)),
+            (Future(), (self.small_event.id, self.customer.id, 10, 1)),
+        ]
+        PurchaseQueue().process(batch)
+        self.assertEqual(len(batch[0][0].result()), 2)
+        self.assertIsInstance(batch[1][0].exception(), SoldOutError)
+        self.assertEqual(len(batch[2][0].result()), 1)
+        self.assertEqual(Ticket.objects.filter(event_id=self.event.id).count(), 2)
+        self.assertEqual(Ticket.objects.filter(event_id=self.small_event.id).count(), 1)
+
+    def test_purchase_inside_transaction_runs_inline(self):
+        """
+        Tests that a caller already in a transaction doesn't wait on the writer thread.
+        :return: None
+        """
+
+        queue = PurchaseQueue()
+        tickets = queue.purchase(self.event.id, self.customer.id, price=10, quantity=3)
+        self.assertEqual(len(tickets), 3)
+        self.assertIsNone(queue.thread)
+
+
+class TestSQLitePragmas(test.TestCase):
+    """
+      Test module for the SQLite connection tuning
+    """
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_pragmas_applied(self):
+        """
+        Tests that new connections get the configured pragmas.
+        :return: None
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
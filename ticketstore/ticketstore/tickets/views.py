@@ -5,38 +5,719 @@
 #pylint: disable=E1101
 #pylint: disable=R0901
 
-from rest_framework import viewsets
-from .models import Client, Event, Customer, Ticket
+import hashlib
+from calendar import timegm
+from collections import OrderedDict
+from itertools import islice
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections, router
+from django.db.models import Count, Sum
+from django.http import Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import exceptions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from .cache import model_tag, response_cache
+from .changes import START, decode_cursor, encode_cursor, latest_cursor, wait_for_changes
+from .metrics import registry
+from .models import Client, Event, Customer, Ticket, Change, SoldOutError
+from .pagination import SearchPagination
+from .renderers import NDJSONRenderer, StreamingJSONRenderer
+from .search import search_names
 from .serializers import ClientSerializer, EventSerializer, CustomerSerializer, TicketSerializer
+from .serializers import PurchaseSerializer, TicketIssueSerializer, request_field_plan
+from .serializers import compile_values_serializer
+from .serializers import ClientStatsSerializer, EventStatsSerializer
+from .writes import purchase_queue
 
-class ClientViewSet(viewsets.ModelViewSet):
+
+def metrics(request):
+    """
+    Serves the request metrics in the Prometheus text format, to the addresses in
+     TICKETS_METRICS['ALLOWED_IPS'] only.
+    :param request: HttpRequest.
+    :return: HttpResponse.
+    """
+
+    allowed = getattr(settings, 'TICKETS_METRICS', {}).get('ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ChangeFeedView(APIView):
+    """
+    Feed of the creates, updates and deletes of clients, events, customers and
+     tickets, e.g. /api/changes?since=<cursor>.
+    Returns the changes after the cursor in order, with the cursor to ask for the
+     next batch from.  Leave since out to read from the start, or pass since=now to
+     only get what changes from here on.  With wait=<seconds>, a request with
+     nothing to return waits for the next change, up to TICKETS_CHANGES['MAX_WAIT'].
+    """
+
+    since_query_param = 'since'
+    wait_query_param = 'wait'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+
+    def get(self, request):
+        """
+        Reads the changes after a cursor.
+        :param request: Request object from django rest framework.
+        :return: Response with the changes, the next cursor and whether there are more.
+        """
+
+        using = router.db_for_read(Change)
+        since = request.query_params.get(self.since_query_param)
+        try:
+            cursor = latest_cursor(using) if since == 'now' else (
+                decode_cursor(since) if since else START)
+        except ValueError as error:
+            raise exceptions.ValidationError({self.since_query_param: [str(error)]})
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+            wait = float(request.query_params.get(self.wait_query_param, 0))
+        except ValueError:
+            raise exceptions.ValidationError({'non_field_errors': [
+                '{} and {} must be numbers.'.format(
+                    self.page_size_query_param, self.wait_query_param)
+            ]})
+        max_wait = getattr(settings, 'TICKETS_CHANGES', {}).get('MAX_WAIT', 30)
+        changes, cursor, more = wait_for_changes(
+            cursor,
+            min(max(page_size, 1), self.max_page_size),
+            min(max(wait, 0), max_wait),
+            using
+        )
+        return Response(OrderedDict([
+            ('next', encode_cursor(cursor)),
+            ('more', more),
+            ('results', changes),
+        ]))
+
+
+class SoldOut(exceptions.APIException):
+    """
+    API error for purchases that would go over an event's venue capacity.
+    """
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Not enough tickets left for this event.'
+    default_code = 'sold_out'
+
+
+class DynamicFieldsViewSet(viewsets.ModelViewSet):
+    """
+    Django REST Framework viewset that shapes its queryset to the fields requested
+     through the DynamicModelSerializer query params, so read actions only load the
+     columns being returned and fetch embedded relations in a fixed number of queries.
+    """
+
+    read_actions = ('list', 'retrieve', 'export', 'search')
+    export_chunk_size = 2000
+    cache_responses = False
+    fast_serialization = False
+
+    def get_queryset(self):
+        """
+        Applies select_related/prefetch_related and only() to the base queryset
+         for read actions, based on the fields the serializer will return.
+        :return: QuerySet for the current action.
+        """
+
+        queryset = super(DynamicFieldsViewSet, self).get_queryset()
+        if self.action not in self.read_actions:
+            return queryset
+        return self.optimize_queryset(queryset, self.get_serializer().field_plan)
+
+    def optimize_queryset(self, queryset, field_plan):
+        """
+        Builds the loading plan for the serializer's compiled field plan.
+        Forward relations that are embedded are joined with select_related, as are
+         forward relations embedded in them, many-to-many fields are batched with
+         prefetch_related, and the remaining model columns are restricted with only().
+        Embedded reverse relations, and anything embedded in them, are batch loaded
+         by the serializer.
+        :param queryset: QuerySet to optimize.
+        :param field_plan: FieldPlan of the serializer that's going to return the objects.
+        :return: Optimized QuerySet.
+        """
+
+        opts = queryset.model._meta
+        only_fields = [opts.pk.name]
+        # Columns the paginator sorts and positions its cursor on are always loaded.
+        only_fields += [name.lstrip('-') for name in getattr(self.paginator, 'ordering', ())]
+        select_related = self.get_join_paths(queryset.model, field_plan.embeds)
+        prefetch_related = []
+        for name in field_plan.fields:
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.is_relation and name in field_plan.embed_fields:
+                if field.many_to_many or field.one_to_many:
+                    prefetch_related.append(name)
+                    continue
+            if field.concrete:
+                only_fields.append(name)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset.only(*only_fields)
+
+    def get_join_paths(self, model, embeds, prefix=''):
+        """
+        Lists the select_related paths of the forward relations in an embed tree,
+         stopping at reverse relations.
+        :param model: Model the embed tree starts from.
+        :param embeds: Embed tree of a FieldPlan.
+        :param prefix: Lookup path of the model.
+        :return: List of lookup paths, e.g. ['event', 'event__client'].
+        """
+
+        paths = []
+        for name, _, subtree in embeds:
+            field = model._meta.get_field(name)
+            if field.one_to_many or field.many_to_many:
+                continue
+            paths.append(prefix + name)
+            paths.extend(self.get_join_paths(field.related_model, subtree, prefix + name + '__'))
+        return paths
+
+    def get_values_serializer(self):
+        """
+        Looks up the .values() fast path for the current request, used by list and
+         export when the viewset has fast_serialization on and
+         TICKETS_FAST_SERIALIZATION isn't turned off.
+        :return: ValuesSerializer, or None to serialize model instances.
+        """
+
+        if not self.fast_serialization or not getattr(settings, 'TICKETS_FAST_SERIALIZATION', True):
+            return None
+        serializer_class = self.get_serializer_class()
+        return compile_values_serializer(
+            serializer_class, request_field_plan(serializer_class, self.request)
+        )
+
+    def get_values_queryset(self, values_serializer):
+        """
+        Selects the fast path's columns, plus the ones the paginator sorts on, in a
+         single query with the embedded relations joined.
+        :param values_serializer: ValuesSerializer of the request.
+        :return: Filtered .values() QuerySet.
+        """
+
+        columns = list(values_serializer.columns)
+        for name in getattr(self.paginator, 'ordering', ()):
+            if name.lstrip('-') not in columns:
+                columns.append(name.lstrip('-'))
+        return self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*columns)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Standard list action, answering conditional requests and served from the
+         response cache when it's enabled.
+        """
+
+        if self.get_values_serializer() is not None:
+            view_action = self.list_values
+        else:
+            view_action = super(DynamicFieldsViewSet, self).list
+        return self.conditional_response(view_action, request, *args, **kwargs)
+
+    def list_values(self, request, *args, **kwargs):
+        """
+        List action on the .values() fast path.
+        :param request: Request object from django rest framework.
+        :return: Response object.
+        """
+
+        values_serializer = self.get_values_serializer()
+        queryset = self.get_values_queryset(values_serializer)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.serialize(page))
+        return Response(values_serializer.serialize(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Standard retrieve action, answering conditional requests and served from the
+         response cache when it's enabled.
+        """
+
+        return self.conditional_response(
+            super(DynamicFieldsViewSet, self).retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, view_action, request, *args, **kwargs):
+        """
+        Answers If-None-Match/If-Modified-Since with a 304 before anything is serialized,
+         and adds ETag and Last-Modified headers to full responses.
+        :param view_action: Action to run when the client's copy is stale.
+        :param request: Request object from django rest framework.
+        :return: Response object.
+        """
+
+        validators = self.get_validators()
+        if validators is None:
+            return self.cached_response(view_action, request, *args, **kwargs)
+        etag, last_modified = validators
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified, response=None
+        )
+        if not_modified is not None:
+            return not_modified
+        response = self.cached_response(view_action, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_validators(self):
+        """
+        Works out the ETag and Last-Modified time of the current response from the
+         rows it returns: the id and updated_at of the object being retrieved, or of
+         every row on the requested page, plus the updated_at of every embedded
+         relation.  Pages are read from the paginator's index range, so this costs
+         one narrow query of page size rows however large the table is.
+        Lists get no Last-Modified: a delete doesn't move any updated_at, so a list
+         could be wrongly reported unchanged.  Their ETag includes the ids on the page.
+        :return: Tuple of the quoted ETag and a Last-Modified timestamp (or None), or
+         None when the object being retrieved doesn't exist, the list isn't paginated
+         or the response embeds a reverse relation.
+        """
+
+        model = self.queryset.model
+        queryset = self.filter_queryset(self.queryset.all())
+        relations = self.get_embedded_relations()
+        if any(field.one_to_many for _, field in relations):
+            # Reverse relations would have to join every child of every row.
+            return None
+        columns = ['pk', 'updated_at'] + ['{}__updated_at'.format(path) for path, _ in relations]
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is not None:
+            try:
+                queryset = queryset.filter(pk=model._meta.pk.to_python(lookup))
+            except ValidationError:
+                return None
+            rows = list(queryset.values_list(*columns)[:1])
+            if not rows:
+                return None
+            last_modified = max(value for value in rows[0][1:] if value)
+            state = []
+        else:
+            if self.pagination_class is None:
+                return None
+            paginator = self.pagination_class()
+            rows = paginator.paginate_queryset(queryset.values_list(*columns), self.request, self)
+            if rows is None:
+                return None
+            last_modified = None
+            state = [paginator.has_next, paginator.has_previous]
+
+        raw = '|'.join(
+            [self.request.build_absolute_uri(), self.request.accepted_media_type or ''] +
+            [str(value) for value in state] +
+            [','.join(str(value) for value in row) for row in rows]
+        )
+        etag = quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+        return etag, timegm(last_modified.utctimetuple()) if last_modified else None
+
+    def cached_response(self, view_action, request, *args, **kwargs):
+        """
+        Serves a read action from the response cache, running and caching it on a miss.
+        :param view_action: Action to run on a miss.
+        :param request: Request object from django rest framework.
+        :return: Response object, with an X-Cache header saying if it was a hit.
+        """
+
+        tags = self.get_cache_tags() if self.cache_responses else None
+        if tags is None:
+            return view_action(request, *args, **kwargs)
+        key, ttl = response_cache.key(request.build_absolute_uri(), tags)
+        data = response_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = view_action(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.set(key, response.data, ttl)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_cache_tags(self):
+        """
+        Lists what the current response depends on: the object being retrieved (or
+         the whole model for a list) and every model embedded in it.
+        :return: List of cache tags, or None if the response shouldn't be cached.
+        """
+
+        model = self.queryset.model
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is None:
+            tags = [model_tag(model)]
+        else:
+            try:
+                tags = [model_tag(model, model._meta.pk.to_python(lookup))]
+            except ValidationError:
+                return None
+        tags.extend(model_tag(field.related_model) for _, field in self.get_embedded_relations())
+        return tags
+
+    def get_embedded_relations(self):
+        """
+        Lists the relations that are embedded in the current response, at every level
+         of the embed tree.
+        :return: List of (lookup path, relation field) tuples, sorted by path.
+        """
+
+        plan = request_field_plan(self.get_serializer_class(), self.request)
+        relations = []
+        pending = [(self.queryset.model, '', plan.embeds)]
+        while pending:
+            model, prefix, embeds = pending.pop()
+            for name, _, subtree in embeds:
+                field = model._meta.get_field(name)
+                relations.append((prefix + name, field))
+                pending.append((field.related_model, prefix + name + '__', subtree))
+        return sorted(relations, key=lambda relation: relation[0])
+
+    @action(detail=False, renderer_classes=[NDJSONRenderer, StreamingJSONRenderer])
+    def export(self, request):
+        """
+        Streams every object matching the request as newline-delimited JSON, or as a
+         JSON array with ?format=json.
+        Rows are read from a server-side iterator in chunks and serialized as they're
+         sent, so memory use doesn't grow with the size of the export.
+        Honors the same include_fields/exclude_fields/embed_fields params as list.
+        :param request: Request object from django rest framework.
+        :return: StreamingHttpResponse of the serialized rows.
+        """
+
+        values_serializer = self.get_values_serializer()
+        if values_serializer is not None:
+            queryset = self.get_values_queryset(values_serializer)
+            serializer = values_serializer
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+            serializer = self.get_serializer()
+        ordering = getattr(self.paginator, 'ordering', None)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        rows = self.serialize_chunks(
+            serializer, queryset.iterator(chunk_size=self.export_chunk_size)
+        )
+        renderer = request.accepted_renderer
+        return StreamingHttpResponse(
+            renderer.render_stream(rows),
+            content_type=renderer.media_type
+        )
+
+
+    def serialize_chunks(self, serializer, rows):
+        """
+        Serializes rows as they're read, loading the embedded relations of each chunk
+         of export_chunk_size rows in one go.
+        :param serializer: Serializer, or ValuesSerializer, of the request.
+        :param rows: Iterator of model instances, or .values() dicts.
+        :return: Generator of serialized rows.
+        """
+
+        load_embeds = getattr(serializer, 'load_embeds', None)
+        rows = iter(rows)
+        chunk = list(islice(rows, self.export_chunk_size))
+        while chunk:
+            if load_embeds:
+                load_embeds(chunk)
+            for row in chunk:
+                yield serializer.to_representation(row)
+            chunk = list(islice(rows, self.export_chunk_size))
+
+
+class NameSearchMixin(object):
+    """
+    Adds a search action matching names against the name search index, e.g.
+     /api/customer/search?q=jam+bow.
+    Results come best match first, take the viewset's filters and field params, and
+     are paginated by offset.
+    """
+
+    search_query_param = 'q'
+    search_min_length = 2
+
+    @action(detail=False, pagination_class=SearchPagination)
+    def search(self, request):
+        """
+        Searches by name.
+        :param request: Request object from django rest framework.
+        :return: Response with a page of the matches.
+        """
+
+        term = request.query_params.get(self.search_query_param, '').strip()
+        if len(term) < self.search_min_length:
+            raise exceptions.ValidationError({self.search_query_param: [
+                'Enter at least {} characters to search for.'.format(self.search_min_length)
+            ]})
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = search_names(queryset, term, connections[queryset.db])
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class ClientViewSet(NameSearchMixin, DynamicFieldsViewSet):
     """
     Standard Django REST Framework viewset for Client objects.
     """
 
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
+    cache_responses = True
+    query_filters = {'name': 'name', 'name_prefix': 'name__prefix'}
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        """
+        Sales stats across all of a client's events, summed from the per-event sales
+         rollups and seat counters rather than from the tickets.
+        :param request: Request object from django rest framework.
+        :param pk: ID of the client.
+        :return: Response with the client's stats.
+        """
 
-class EventViewSet(viewsets.ModelViewSet):
+        client_object = get_object_or_404(Client.objects.only('id'), pk=pk)
+        totals = Event.objects.filter(client_id=client_object.id).aggregate(
+            events=Count('id'),
+            capacity=Sum('venue_capacity'),
+            seats_sold=Sum('tickets_sold'),
+            tickets_sold=Sum('sales__tickets_sold'),
+            gross_revenue=Sum('sales__gross_revenue'),
+        )
+        return Response(ClientStatsSerializer({
+            'id': client_object.id,
+            'events': totals['events'],
+            'tickets_sold': totals['tickets_sold'] or 0,
+            'remaining_capacity': (totals['capacity'] or 0) - (totals['seats_sold'] or 0),
+            'gross_revenue': totals['gross_revenue'] or 0,
+        }).data)
+
+class EventViewSet(NameSearchMixin, DynamicFieldsViewSet):
     """
     Standard Django REST Framework viewset for Client objects.
     """
 
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    cache_responses = True
+    fast_serialization = True
+    query_filters = {'client': 'client', 'name': 'name', 'name_prefix': 'name__prefix'}
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        """
+        Sales stats for an event, read from its sales rollup and seat counter with a
+         single primary key lookup instead of aggregating its tickets.
+        :param request: Request object from django rest framework.
+        :param pk: ID of the event.
+        :return: Response with the event's stats.
+        """
+
+        event = get_object_or_404(Event.objects.values(
+            'id', 'venue_capacity', 'tickets_sold', 'sales__tickets_sold', 'sales__gross_revenue'
+        ), pk=pk)
+        return Response(EventStatsSerializer({
+            'id': event['id'],
+            'tickets_sold': event['sales__tickets_sold'] or 0,
+            'remaining_capacity': event['venue_capacity'] - event['tickets_sold'],
+            'gross_revenue': event['sales__gross_revenue'] or 0,
+        }).data)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(NameSearchMixin, DynamicFieldsViewSet):
     """
     Standard Django REST Framework viewset for Client objects.
     """
 
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    query_filters = {'name': 'name', 'name_prefix': 'name__prefix'}
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(DynamicFieldsViewSet):
     """
     Standard Django REST Framework viewset for Client objects.
     """
 
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
+    fast_serialization = True
+    query_filters = {'event': 'event', 'customer': 'customer'}
+    bulk_max_items = 10000
+    bulk_batch_size = 500
+
+    @action(detail=False, methods=['post'])
+    def purchase(self, request):
+        """
+        Purchases one or more tickets for a customer without overselling the event.
+        The seats are reserved with a single conditional update of the event's
+         tickets_sold counter, in the same transaction as the ticket inserts.
+        With TICKETS_COALESCE_PURCHASES on, the purchase is committed together with
+         any others arriving at the same time by the purchase queue's writer thread.
+        :param request: Request object from django rest framework.
+        :return: Response with the purchased tickets.
+        """
+
+        purchase = PurchaseSerializer(data=request.data)
+        purchase.is_valid(raise_exception=True)
+        coalesce = getattr(settings, 'TICKETS_COALESCE_PURCHASES', False)
+        try:
+            tickets = (purchase_queue if coalesce else Ticket.objects).purchase(
+                purchase.validated_data['event'],
+                purchase.validated_data['customer'],
+                price=purchase.validated_data['price'],
+                quantity=purchase.validated_data['quantity']
+            )
+        except SoldOutError:
+            if not Event.objects.filter(pk=purchase.validated_data['event']).exists():
+                raise exceptions.ValidationError({'event': ['Event does not exist.']})
+            raise SoldOut()
+        serializer = self.get_serializer(tickets, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Issues a list of tickets in one request.
+        The whole batch is validated up front, every referenced event and customer is
+         looked up with one query per model, seats are reserved per event for the
+         whole batch and the tickets are written with bulk_create in chunks.
+        :param request: Request object from django rest framework.
+        :return: Response with a result for each item, in the order they were sent.
+        """
+
+        if not isinstance(request.data, list):
+            raise exceptions.ValidationError({'non_field_errors': ['Expected a list of tickets.']})
+        if len(request.data) > self.bulk_max_items:
+            raise exceptions.ValidationError({'non_field_errors': [
+                'Cannot issue more than {} tickets in one request.'.format(self.bulk_max_items)
+            ]})
+
+        results = [None] * len(request.data)
+        valid = {}
+        child = TicketIssueSerializer()
+        for index, item in enumerate(request.data):
+            try:
+                valid[index] = child.run_validation(item)
+            except exceptions.ValidationError as error:
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': error.detail}
+
+        events = set(Event.objects.filter(
+            pk__in=set(item['event'] for item in valid.values())
+        ).values_list('pk', flat=True))
+        customers = set(Customer.objects.filter(
+            pk__in=set(item['customer'] for item in valid.values())
+        ).values_list('pk', flat=True))
+
+        tickets = {}
+        for index, item in valid.items():
+            errors = {}
+            if item['event'] not in events:
+                errors['event'] = ['Event {} does not exist.'.format(item['event'])]
+            if item['customer'] not in customers:
+                errors['customer'] = ['Customer {} does not exist.'.format(item['customer'])]
+            if errors:
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+            else:
+                tickets[index] = Ticket(
+                    event_id=item['event'], customer_id=item['customer'], price=item['price']
+                )
+
+        issued, sold_out = Ticket.objects.bulk_issue(
+            list(tickets.values()), batch_size=self.bulk_batch_size
+        )
+        serializer = self.get_serializer()
+        for index, ticket in tickets.items():
+            if ticket.event_id in sold_out:
+                results[index] = {
+                    'status': status.HTTP_409_CONFLICT,
+                    'errors': {'event': [SoldOut.default_detail]},
+                }
+            else:
+                results[index] = {
+                    'status': status.HTTP_201_CREATED,
+                    'ticket': serializer.to_representation(ticket),
+                }
+
+        complete = len(issued) == len(results)
+        return Response(
+            results,
+            status=status.HTTP_201_CREATED if complete else status.HTTP_207_MULTI_STATUS
+        )
+
+
+class NestedViewSetMixin(object):
+    """
+    Restricts a viewset to the children of the parent object in the URL, e.g. the
+     tickets of /api/event/<parent_pk>/tickets.
+    The filter is applied in filter_queryset, so pages, exports and ETags all use the
+     child's (parent, created_at, id) index, and an unknown parent is a 404.
+    """
+
+    parent_model = None
+    parent_lookup = None
+
+    def filter_queryset(self, queryset):
+        """
+        Applies the standard filters and the parent's foreign key.
+        :param queryset: QuerySet to filter.
+        :return: Filtered QuerySet.
+        """
+
+        queryset = super(NestedViewSetMixin, self).filter_queryset(queryset)
+        return queryset.filter(**{self.parent_lookup: self.kwargs['parent_pk']})
+
+    def paginate_queryset(self, queryset):
+        """
+        Standard pagination, looking up the parent when a page comes back empty.
+        :param queryset: QuerySet to paginate.
+        :return: List of the rows on the page.
+        """
+
+        page = super(NestedViewSetMixin, self).paginate_queryset(queryset)
+        if not page and not self.parent_model.objects.filter(pk=self.kwargs['parent_pk']).exists():
+            raise Http404('{} not found.'.format(self.parent_model._meta.verbose_name.capitalize()))
+        return page
+
+
+class ClientEventViewSet(NestedViewSetMixin, EventViewSet):
+    """
+    Events of a client.
+    """
+
+    parent_model = Client
+    parent_lookup = 'client'
+
+
+class EventTicketViewSet(NestedViewSetMixin, TicketViewSet):
+    """
+    Tickets of an event.
+    """
+
+    parent_model = Event
+    parent_lookup = 'event'
+
+
+class CustomerTicketViewSet(NestedViewSetMixin, TicketViewSet):
+    """
+    Tickets of a customer.
+    """
+
+    parent_model = Customer
+    parent_lookup = 'customer'
@@ -0,0 +1,122 @@
+"""
+ Write coalescing for ticket purchases.
+ SQLite only allows one writer at a time, so concurrent purchases mostly wait on
+  each other's locks and commits.  The purchase queue hands them to a single writer
+  thread instead, which runs whatever has queued up in one transaction with one
+  commit, so a burst of purchases costs a handful of fsyncs instead of one each.
+"""
+
+#pylint: disable=E1101
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from .models import Ticket
+
+
+class PurchaseQueue(object):
+    """
+     Queue of ticket purchases written in batches by a background thread.
+     Each purchase still gets its own savepoint, so one that's sold out or fails
+      doesn't affect the rest of its batch.
+    """
+
+    def __init__(self, max_batch=200, max_wait=0.002):
+        """
+        :param max_batch: Most purchases written in one transaction.
+        :param max_wait: Seconds the writer waits for more purchases to join a batch.
+        """
+
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def purchase(self, event_id, customer_id, price=0, quantity=1):
+        """
+        Purchases tickets through the queue, waiting for the batch to commit.
+        Takes the same arguments as TicketManager.purchase.
+        Callers already inside a transaction purchase inline instead: the writer
+         couldn't see their uncommitted rows, and on SQLite it would wait on their lock.
+        :return: List of the new tickets.
+        """
+
+        if connection.in_atomic_block:
+            return Ticket.objects.purchase(event_id, customer_id, price=price, quantity=quantity)
+        return self.submit(event_id, customer_id, price, quantity).result()
+
+    def submit(self, event_id, customer_id, price=0, quantity=1):
+        """
+        Queues a purchase, starting the writer thread if it isn't running.
+        :return: Future resolving to the list of new tickets, or raising the
+         purchase's error, e.g. SoldOutError.
+        """
+
+        future = Future()
+        self.requests.put((future, (event_id, customer_id, price, quantity)))
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='ticket-purchase-writer', daemon=True)
+                self.thread.start()
+        return future
+
+    def run(self):
+        """
+        Writer thread loop, collecting purchases into batches and writing them.
+        :return: None
+        """
+
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.requests.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            close_old_connections()
+            try:
+                self.process(batch)
+            except Exception as error:  #pylint: disable=W0703
+                # Keeps the writer alive and never leaves a caller waiting forever.
+                for future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def process(self, batch):
+        """
+        Writes a batch of purchases in one transaction and resolves their futures
+         once it has committed.
+        If the commit itself fails, the purchases are retried one per transaction so
+         only the ones at fault fail.
+        :param batch: List of (future, purchase arguments) tuples.
+        :return: None
+        """
+
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, arguments in batch:
+                    try:
+                        outcomes.append((future, Ticket.objects.purchase(*arguments), None))
+                    except Exception as error:  #pylint: disable=W0703
+                        outcomes.append((future, None, error))
+        except DatabaseError as error:
+            if len(batch) == 1:
+                batch[0][0].set_exception(error)
+                return
+            for item in batch:
+                self.process([item])
+            return
+        for future, tickets, error in outcomes:
+            if error is None:
+                future.set_result(tickets)
+            else:
+                future.set_exception(error)
+
+
+purchase_queue = PurchaseQueue()
@@ -20,6 +20,8 @@ from django.contrib import admin
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from ticketstore.tickets.views import ClientViewSet, EventViewSet, CustomerViewSet, TicketViewSet
+from ticketstore.tickets.views import ClientEventViewSet, EventTicketViewSet, CustomerTicketViewSet
+from ticketstore.tickets.views import ChangeFeedView, metrics
 
 api_router = DefaultRouter(trailing_slash=False)
 api_router.register(r'client', ClientViewSet)
@@ -27,7 +29,18 @@ api_router.register(r'event', EventViewSet)
 api_router.register(r'customer', CustomerViewSet)
 api_router.register(r'ticket', TicketViewSet)
 
+nested_routes = [
+    path('client/<uuid:parent_pk>/events', ClientEventViewSet.as_view({'get': 'list'}),
+         name='client-events'),
+    path('event/<uuid:parent_pk>/tickets', EventTicketViewSet.as_view({'get': 'list'}),
+         name='event-tickets'),
+    path('customer/<uuid:parent_pk>/tickets', CustomerTicketViewSet.as_view({'get': 'list'}),
+         name='customer-tickets'),
+]
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include(api_router.urls)),
+    path('api/changes', ChangeFeedView.as_view(), name='changes'),
+    path('api/', include(nested_routes + api_router.urls)),
+    path('metrics', metrics, name='metrics'),
 ]